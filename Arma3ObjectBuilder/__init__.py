@@ -18,11 +18,13 @@ if "bpy" in locals():
     importlib.reload(props)
     importlib.reload(ui)
     importlib.reload(flagutils)
+    importlib.reload(parse_cache)
 
 else:
     from . import props
     from . import ui
     from .utilities import flags as flagutils
+    from .io import parse_cache
 
 import bpy
 
@@ -36,6 +38,33 @@ def outliner_enable_update(self, context):
         context.scene.a3ob_outliner.clear()
 
 
+# The cache is stored in the Blender user data directory by default, not in the shared system temporary directory.
+def parse_cache_update(self, context):
+    path = bpy.path.abspath(self.parse_cache_path)
+    if not self.parse_cache_path:
+        path = bpy.utils.user_resource('DATAFILES', path="a3ob_parse_cache")
+    
+    parse_cache.configure(path, self.parse_cache_size * 1024 * 1024)
+
+
+class A3OB_OT_prefs_clear_parse_cache(bpy.types.Operator):
+    """Remove all entries from the parse cache"""
+    
+    bl_idname = "a3ob.prefs_clear_parse_cache"
+    bl_label = "Clear Parse Cache"
+    bl_options = {'REGISTER'}
+    
+    @classmethod
+    def poll(cls, context):
+        return True
+    
+    def execute(self, context):
+        parse_cache.clear()
+        self.report({'INFO'}, "Cleared parse cache")
+        
+        return {'FINISHED'}
+
+
 class A3OB_OT_prefs_find_a3_tools(bpy.types.Operator):
     """Find the Arma 3 Tools installation through the Windows registry"""
     
@@ -229,6 +258,14 @@ class A3OB_AT_preferences(bpy.types.AddonPreferences):
         default = 'ENABLED',
         update = outliner_enable_update
     )
+    parse_cache_size: bpy.props.IntProperty(
+        name = "Parse Cache Size",
+        description = "Size limit of the on-disk cache of parsed P3D and RTM files in MB, the least recently used files are removed when the limit is exceeded (0 disables the cache)",
+        default = 0,
+        min = 0,
+        subtype = 'UNSIGNED',
+        update = parse_cache_update
+    )
     # Paths
     a3_tools: bpy.props.StringProperty(
         name = "Arma 3 Tools",
@@ -246,6 +283,12 @@ class A3OB_AT_preferences(bpy.types.AddonPreferences):
         description = "Path to JSON file containing data for custom preset list items (common named properties and proxies)",
         subtype = 'FILE_PATH'
     )
+    parse_cache_path: bpy.props.StringProperty(
+        name = "Parse Cache",
+        description = "Directory of the parse cache (the Blender user data directory is used if not set)",
+        subtype = 'DIR_PATH',
+        update = parse_cache_update
+    )
     # Defaults
     flag_vertex: bpy.props.IntProperty(name="Vertex Flag", default=0x02000000)
     flag_face: bpy.props.IntProperty(name="Face Flag")
@@ -288,6 +331,9 @@ class A3OB_AT_preferences(bpy.types.AddonPreferences):
             row_theme.prop(self, "icon_theme", expand=True)
             row_outliner = box.row(align=True)
             row_outliner.prop(self, "outliner", expand=True)
+            row_cache = box.row(align=True)
+            row_cache.prop(self, "parse_cache_size")
+            row_cache.operator("a3ob.prefs_clear_parse_cache", text="", icon='TRASH')
             
         elif self.tabs == 'PATHS':
             row_a3_tools = box.row(align=True)
@@ -295,6 +341,7 @@ class A3OB_AT_preferences(bpy.types.AddonPreferences):
             row_a3_tools.operator("a3ob.prefs_find_a3_tools", text="", icon='VIEWZOOM')
             box.prop(self, "project_root", icon='DISK_DRIVE')
             box.prop(self, "custom_data", icon='PRESET')
+            box.prop(self, "parse_cache_path", icon='FILE_FOLDER')
         
         elif self.tabs == 'DEFAULTS':
             row_vertex = box.row(align=True)
@@ -311,6 +358,7 @@ class A3OB_AT_preferences(bpy.types.AddonPreferences):
 
 
 classes = (
+    A3OB_OT_prefs_clear_parse_cache,
     A3OB_OT_prefs_find_a3_tools,
     A3OB_OT_prefs_edit_flag_vertex,
     A3OB_OT_prefs_edit_flag_face,
@@ -359,6 +407,8 @@ def register():
     
     generic.register_icons()
     
+    parse_cache_update(generic.get_addon_preferences(), bpy.context)
+    
     print("Register done")
 
 
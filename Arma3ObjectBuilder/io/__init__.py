@@ -1,3 +1,4 @@
+from . import asset_index
 from . import binary_handler
 from . import data_asc
 from . import data_p3d
@@ -13,3 +14,5 @@ from . import import_asc
 from . import import_mcfg
 from . import import_p3d
 from . import import_rtm
+from . import parse_cache
+from . import process_pool
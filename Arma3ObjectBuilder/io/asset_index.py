@@ -0,0 +1,294 @@
+# Searchable index of the metadata of P3D files in an asset library.
+# The files under a library directory are scanned in parallel worker processes,
+# and the extracted metadata (LOD signatures and counts, texture and material paths,
+# proxies, named properties and selections) is stored in a local SQLite database.
+# Rescanning a library only processes the files that changed since the last scan
+# (based on their size and modification time), and removes the deleted files.
+
+
+import os
+import re
+import sqlite3
+
+from . import binary_handler as binary
+from . import data_p3d as p3d
+from . import process_pool
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    version INTEGER,
+    count_lods INTEGER,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS lods (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    lod_index INTEGER NOT NULL,
+    signature REAL NOT NULL,
+    lod INTEGER NOT NULL,
+    resolution INTEGER NOT NULL,
+    count_verts INTEGER NOT NULL,
+    count_faces INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS materials (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    lod_index INTEGER NOT NULL,
+    texture TEXT NOT NULL,
+    material TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS proxies (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    lod_index INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    proxy_index INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS properties (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    lod_index INTEGER NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS selections (
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    lod_index INTEGER NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lods_file ON lods(file_id);
+CREATE INDEX IF NOT EXISTS lods_lod ON lods(lod);
+CREATE INDEX IF NOT EXISTS materials_file ON materials(file_id);
+CREATE INDEX IF NOT EXISTS materials_texture ON materials(texture COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS materials_material ON materials(material COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS proxies_file ON proxies(file_id);
+CREATE INDEX IF NOT EXISTS proxies_path ON proxies(path COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS properties_file ON properties(file_id);
+CREATE INDEX IF NOT EXISTS properties_key ON properties(key COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS selections_file ON selections(file_id);
+CREATE INDEX IF NOT EXISTS selections_name ON selections(name COLLATE NOCASE);
+"""
+
+
+class AssetIndex_Error(Exception):
+    def __str__(self):
+        return "Asset index - %s" % super().__str__()
+
+
+# Extract the metadata of a single P3D file. Runs in the worker processes,
+# so the result only contains plain Python values. Only the LOD index of the
+# file is read (with the metadata), the LOD data itself is not decoded.
+def scan_file(filepath):
+    regex_proxy = re.compile(r"proxy:(.*)\.(\d+)$")
+    with binary.MappedReader(filepath) as file:
+        version, count_lods = p3d.P3D_MLOD.read_header(file)
+        file.seek(0)
+        index = p3d.P3D_MLOD.read_index(file, True)
+
+    lods = []
+    materials = []
+    proxies = []
+    properties = []
+    selections = []
+    for i, entry in enumerate(index):
+        lod_type, resolution = entry.resolution.get()
+        lods.append((i, float(entry.resolution), lod_type, resolution, entry.count_verts, entry.count_faces))
+        materials.extend([(i, texture, material) for texture, material in entry.materials if texture or material])
+        properties.extend([(i, key, value) for key, value in entry.properties])
+
+        for name in entry.taggs:
+            if name.startswith("#") or name.endswith("#"):
+                continue
+
+            selections.append((i, name))
+            match = regex_proxy.match(name)
+            if match:
+                proxies.append((i, match.group(1), int(match.group(2))))
+
+    return {
+        "version": version,
+        "lods": lods,
+        "materials": materials,
+        "proxies": proxies,
+        "properties": properties,
+        "selections": selections
+    }
+
+
+# Worker entry point, errors are returned instead of raised, so a single broken
+# file does not abort the whole scan.
+def scan_file_safe(filepath):
+    try:
+        return scan_file(filepath), None
+    except Exception as ex:
+        return None, "%s: %s" % (type(ex).__name__, ex)
+
+
+# Glob style patterns (* and ?) are translated to SQL LIKE patterns.
+def get_like_pattern(pattern):
+    pattern = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return pattern.replace("*", "%").replace("?", "_")
+
+
+class AssetIndex():
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.connection = sqlite3.connect(filepath)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    @staticmethod
+    def normalize_path(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def list_files(root):
+        for directory, subdirectories, files in os.walk(root):
+            for name in files:
+                if os.path.splitext(name)[1].lower() == ".p3d":
+                    yield os.path.join(directory, name)
+
+    # Returns the files that need to be (re)scanned, and the IDs of the indexed
+    # files that no longer exist in the library.
+    def get_changes(self, root):
+        root = self.normalize_path(root)
+        indexed = {}
+        rows = self.connection.execute("SELECT id, path, size, mtime FROM files WHERE path LIKE ? ESCAPE '\\'", (get_like_pattern(os.path.join(root, "*")), ))
+        for file_id, path, size, mtime in rows:
+            indexed[path] = (file_id, size, mtime)
+
+        changed = []
+        for path in self.list_files(root):
+            path = self.normalize_path(path)
+            try:
+                filestat = os.stat(path)
+            except OSError:
+                continue
+
+            stamp = (filestat.st_size, filestat.st_mtime_ns)
+            entry = indexed.pop(path, None)
+            if entry is None or entry[1:] != stamp:
+                changed.append((path, stamp))
+
+        removed = [entry[0] for entry in indexed.values()]
+
+        return changed, removed
+
+    def store(self, path, stamp, result, error):
+        cursor = self.connection.cursor()
+        cursor.execute("DELETE FROM files WHERE path = ?", (path, ))
+        if error:
+            cursor.execute("INSERT INTO files (path, size, mtime, error) VALUES (?, ?, ?, ?)", (path, *stamp, error))
+            return
+
+        cursor.execute(
+            "INSERT INTO files (path, size, mtime, version, count_lods) VALUES (?, ?, ?, ?, ?)",
+            (path, *stamp, result["version"], len(result["lods"]))
+        )
+        file_id = cursor.lastrowid
+        cursor.executemany("INSERT INTO lods VALUES (?, ?, ?, ?, ?, ?, ?)", [(file_id, *row) for row in result["lods"]])
+        cursor.executemany("INSERT INTO materials VALUES (?, ?, ?, ?)", [(file_id, *row) for row in result["materials"]])
+        cursor.executemany("INSERT INTO proxies VALUES (?, ?, ?, ?)", [(file_id, *row) for row in result["proxies"]])
+        cursor.executemany("INSERT INTO properties VALUES (?, ?, ?, ?)", [(file_id, *row) for row in result["properties"]])
+        cursor.executemany("INSERT INTO selections VALUES (?, ?, ?)", [(file_id, *row) for row in result["selections"]])
+
+    # Scan the library directory, and update the index with the changed files.
+    # Returns the number of scanned, removed and failed files.
+    def scan(self, root, workers = 0, logger = None):
+        if not os.path.isdir(root):
+            raise AssetIndex_Error("Library directory does not exist: %s" % root)
+
+        changed, removed = self.get_changes(root)
+        if logger:
+            logger.log("Changed files: %d, removed files: %d" % (len(changed), len(removed)))
+
+        with self.connection:
+            self.connection.executemany("DELETE FROM files WHERE id = ?", [(file_id, ) for file_id in removed])
+
+        count_failed = 0
+        if len(changed) == 0:
+            return 0, len(removed), 0
+
+        with process_pool.create_pool(process_pool.get_worker_count(len(changed), workers)) as pool:
+            results = pool.map(scan_file_safe, [path for path, stamp in changed], chunksize = 16)
+            for i, ((path, stamp), (result, error)) in enumerate(zip(changed, results)):
+                if error:
+                    count_failed += 1
+                    if logger:
+                        logger.log("Failed to scan %s (%s)" % (path, error))
+
+                self.store(path, stamp, result, error)
+
+                # Commit periodically, so an interrupted scan keeps most of its progress.
+                if (i + 1) % 500 == 0:
+                    self.connection.commit()
+                    if logger:
+                        logger.log("Scanned %d/%d files" % (i + 1, len(changed)))
+
+        self.connection.commit()
+
+        return len(changed), len(removed), count_failed
+
+    # Queries
+    # The path patterns are case insensitive, and support the * and ? wildcards.
+
+    def query(self, sql, args = ()):
+        return [row[0] for row in self.connection.execute(sql, args)]
+
+    def find_material(self, pattern):
+        pattern = get_like_pattern(pattern)
+        return self.query(
+            "SELECT DISTINCT f.path FROM files f JOIN materials m ON m.file_id = f.id "
+            "WHERE m.material LIKE ? ESCAPE '\\' OR m.texture LIKE ? ESCAPE '\\' ORDER BY f.path",
+            (pattern, pattern)
+        )
+
+    def find_proxy(self, pattern):
+        return self.query(
+            "SELECT DISTINCT f.path FROM files f JOIN proxies p ON p.file_id = f.id "
+            "WHERE p.path LIKE ? ESCAPE '\\' ORDER BY f.path",
+            (get_like_pattern(pattern), )
+        )
+
+    def find_property(self, key, value = "*"):
+        return self.query(
+            "SELECT DISTINCT f.path FROM files f JOIN properties p ON p.file_id = f.id "
+            "WHERE p.key LIKE ? ESCAPE '\\' AND p.value LIKE ? ESCAPE '\\' ORDER BY f.path",
+            (get_like_pattern(key), get_like_pattern(value))
+        )
+
+    def find_selection(self, pattern):
+        return self.query(
+            "SELECT DISTINCT f.path FROM files f JOIN selections s ON s.file_id = f.id "
+            "WHERE s.name LIKE ? ESCAPE '\\' ORDER BY f.path",
+            (get_like_pattern(pattern), )
+        )
+
+    def find_lod(self, lod_type):
+        return self.query(
+            "SELECT DISTINCT f.path FROM files f JOIN lods l ON l.file_id = f.id WHERE l.lod = ? ORDER BY f.path",
+            (lod_type, )
+        )
+
+    def find_missing_lod(self, lod_type):
+        return self.query(
+            "SELECT f.path FROM files f WHERE f.error IS NULL AND NOT EXISTS "
+            "(SELECT 1 FROM lods l WHERE l.file_id = f.id AND l.lod = ?) ORDER BY f.path",
+            (lod_type, )
+        )
+
+    def find_failed(self):
+        return self.query("SELECT path FROM files WHERE error IS NOT NULL ORDER BY path")
@@ -4,6 +4,86 @@
 
 
 import struct
+import mmap
+
+import numpy as np
+
+
+# File-like reader backed by a memory mapped file. Reads are served straight from the
+# mapped memory (without system calls or intermediate buffering for every small read),
+# and data blocks can be accessed without copying through the read_view() method.
+# The reader can be passed to all read functions, and the format classes in place of
+# a regular file object.
+class MappedReader():
+    PEEK_SIZE = 4096
+
+    def __init__(self, filepath):
+        self.name = filepath
+        self.pos = 0
+        self.file = open(filepath, "rb")
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError: # empty files cannot be mapped
+            self.data = b""
+        
+        self.view = memoryview(self.data)
+        self.size = len(self.data)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    # The mapping can only be closed if no views of it are alive anymore.
+    # If there are, the mapping is left to be released by the garbage collector.
+    def close(self):
+        try:
+            self.view.release()
+            if type(self.data) is mmap.mmap:
+                self.data.close()
+        except BufferError:
+            pass
+        
+        self.view = None
+        self.data = None
+        self.file.close()
+    
+    def tell(self):
+        return self.pos
+    
+    def seek(self, offset, whence = 0):
+        if whence == 1:
+            offset += self.pos
+        elif whence == 2:
+            offset += self.size
+        
+        if offset < 0:
+            raise ValueError("Negative seek position %d" % offset)
+        
+        self.pos = offset
+        return self.pos
+    
+    def seekable(self):
+        return True
+    
+    def read(self, size = -1):
+        start = self.pos
+        end = self.size if size is None or size < 0 else min(start + size, self.size)
+        self.pos = max(start, end)
+        
+        return self.data[start:end]
+    
+    # Zero-copy read, the returned memoryview is only valid while the reader is open.
+    def read_view(self, size = -1):
+        start = self.pos
+        end = self.size if size is None or size < 0 else min(start + size, self.size)
+        self.pos = max(start, end)
+
+        return self.view[start:end]
+    
+    def peek(self, size = 1):
+        return self.data[self.pos:(self.pos + max(size, self.PEEK_SIZE))]
 
 
 def read_byte(file):
@@ -69,6 +149,21 @@ def read_double(file):
 def read_doubles(file, count = 1):
     return struct.unpack('<%dd' % count, file.read(8 * count))
     
+# Read a block of fixed size records directly into a NumPy array.
+# The returned array shares memory with the read buffer (or the mapped file), and is read-only.
+def read_array(file, dtype, count = 1):
+    dtype = np.dtype(dtype)
+    length = dtype.itemsize * count
+    if isinstance(file, MappedReader):
+        data = file.read_view(length)
+    else:
+        data = file.read(length)
+    
+    if len(data) != length:
+        raise EOFError("Array data ran into unexpected EOF")
+    
+    return np.frombuffer(data, dtype=dtype, count=count)
+    
 def read_char(file, count = 1):
     chars = struct.unpack('%ds' % count, file.read(count))[0]
     return chars.decode('ascii')
@@ -76,17 +171,44 @@ def read_char(file, count = 1):
 # In theory all strings in BI files should be strictly ASCII,
 # but on the off chance that a corrupt character is present, the method would fail.
 # Therefore using UTF-8 decoding is more robust, and gives the same result for valid ASCII values.
-def read_asciiz(file):
-    res = b''
-    
-    while True:
-        a = file.read(1)
-        if a == b'\x00' or a == b'':
-            break
+# If the stream supports peeking, the terminator is searched for in the buffered data
+# instead of reading the stream byte by byte. Frequently repeated strings can be interned
+# by passing a lookup dictionary, that is shared between the calls.
+def read_asciiz(file, lookup = None):
+    if hasattr(file, "peek"):
+        chunks = []
+        while True:
+            buffer = file.peek(1)
+            if not buffer:
+                break
+            
+            idx = buffer.find(b'\x00')
+            if idx != -1:
+                chunks.append(file.read(idx + 1)[:-1])
+                break
+            
+            chunks.append(file.read(len(buffer)))
+        
+        res = b''.join(chunks)
+    else:
+        res = bytearray()
+        while True:
+            a = file.read(1)
+            if a == b'\x00' or a == b'':
+                break
             
-        res += a
+            res += a
+        
+        res = bytes(res)
+    
+    if lookup is None:
+        return res.decode('utf8', errors="replace")
+    
+    value = lookup.get(res)
+    if value is None:
+        value = lookup[res] = res.decode('utf8', errors="replace")
     
-    return res.decode('utf8', errors="replace")
+    return value
 
 def read_asciiz_field(file, field_len):
     field = file.read(field_len)
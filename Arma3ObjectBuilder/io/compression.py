@@ -1,14 +1,16 @@
 # Algorithms for handling compressed data blocks in Arma 3 file formats.
 
 
-import struct
-
-
 class LZO_Error(Exception):
     def __str__(self):
         return "LZO - %s" % super().__str__()
 
 
+# Match length and distance components of the most common (M2) instructions, indexed by the instruction byte.
+M2_LENGTH = [0] * 64 + [3 + ((x >> 5) & 1) for x in range(64, 128)] + [5 + ((x >> 5) & 3) for x in range(128, 256)]
+M2_DISTANCE = [((x >> 2) & 7) + 1 for x in range(256)]
+
+
 # Decompression algorithm for bit streams compressed with the LZO1X algorithm.
 # Implementation is based on the LZO stream format documentation included in the Linux kernel documentations:
 # https://docs.kernel.org/staging/lzo.html
@@ -16,123 +18,437 @@ class LZO_Error(Exception):
 # https://github.com/FFmpeg/FFmpeg/blob/master/libavutil/lzo.c
 # The original LZO implementations as defined by Markus F.X.J. Oberhumer:
 # https://www.oberhumer.com/opensource/lzo/
-def lzo1x_decompress(file, expected):
-    state = 0
-    start = file.tell()
-    output = bytearray()
-
-    def check_free_space(length):
-        free_space = expected - len(output)
-        if free_space < length:
-            raise LZO_Error("Output overrun (free buffer: %d, match length: %d)" % (free_space, length))
-
-    def read1():
-        return struct.unpack('B', file.read(1))[0]
-
-    def read(size):
-        return struct.unpack('%dB' % size, file.read(size))
+# The stream is decoded from an in-memory buffer into a preallocated output of the expected size
+# (optionally a writable buffer provided by the caller, eg.: a slice of a larger array).
+# Returns the number of bytes consumed from the input, and the output.
+def lzo1x_decompress_buffer(data, expected, output = None):
+    if output is not None and len(output) != expected:
+        raise LZO_Error("Output buffer size mismatch (expected: %d, got: %d)" % (expected, len(output)))
     
-    def read_le16():
-        return struct.unpack('<H', file.read(2))[0]
+    try:
+        consumed, result = lzo1x_decompress_fast(data, expected)
+    except (IndexError, ValueError):
+        # The stream is invalid, it is decoded again with every check in place to report the exact error.
+        return lzo1x_decompress_checked(data, expected, output)
     
-    def extend(items):
-        nonlocal output
-        output.extend(items)
-
-    def copy_literal(length):
-        check_free_space(length)
-        extend(read(length))
+    if output is None:
+        return consumed, result
     
-    def copy_match(distance, length):
-        output_length = len(output)
+    output[:] = result
+    return consumed, output
 
-        if output_length < distance:
-            raise LZO_Error("Invalid back pointer (buffer: %d, pointer: %d)" % (output_length, -distance))
-        
-        check_free_space(length)
-        
-        # It is valid to have length that is longer than the back pointer distance, which creates a repeating pattern,
-        # copying the same bytes that were copied in this same command.
-        # For this reason, we cannot simply take a slice of the output at the given point with the given length, as
-        # some of the bytes might not yet be there. We have to copy in chunks with size of the backpointer distance.
-        start = output_length - distance
-        extend(output[start:] * (length // distance)) # copy as many whole chunks as possible
-        extend(output[start:(start + (length % distance))]) # copy remainder
-    
-    def get_length(x, mask):
-        length = x & mask
-        if not length:
-            while True:
-                x = read1()
-                if x:
-                    break
-                
-                length += 255
-            length += mask + x
-        return length
-    
-    # # First byte is handled separately, as the output buffer is empty at this point.
-    x = read1()
+
+# Decoding without the bounds checks, for valid streams. The output is appended to a growing
+# buffer, and the instruction fields are kept in local variables. Reading past the end of
+# the input raises IndexError, and every other violation (invalid back pointer, invalid
+# End Of Stream, output length mismatch) raises ValueError.
+# Matches are checked against the expected length, so the output of an invalid stream cannot grow unbounded.
+def lzo1x_decompress_fast(data, expected):
+    src = bytes(data)
+    out = bytearray()
+    m2_length = M2_LENGTH
+    m2_distance = M2_DISTANCE
+    ip = 1
+    op = 0
+    state = 0
+
+    x = src[0]
     if x > 17:
         length = x - 17
-        copy_literal(length)
+        out += src[1:(1 + length)]
+        op = length
+        ip = 1 + length
         state = min(4, length)
-        x = read1()
+        x = src[ip]
+        ip += 1
     
     while True:
-        if x <= 15:
-            if not state:
-                length = 3 + get_length(x, 15)
-                copy_literal(length)
-                state = 4
-            elif state < 4:
-                length = 2
-                state = x & 3
-                distance = (read1() << 2) + (x >> 2) + 1
-                copy_match(distance, length)
-                copy_literal(state)
-            elif state == 4:
-                length = 3
-                state = x & 3
-                distance = (read1() << 2) + (x >> 2) + 2049
-                copy_match(distance, length)
-                copy_literal(state)
-        elif x > 127:
+        if x > 63:
             state = x & 3
-            length = 5 + ((x >> 5) & 3)
-            distance = (read1() << 3) + ((x >> 2) & 7) + 1
-            copy_match(distance, length)
-            copy_literal(state)
-        elif x > 63:
-            state = x & 3
-            length = 3 + ((x >> 5) & 1)
-            distance = (read1() << 3) + ((x >> 2) & 7) + 1
-            copy_match(distance, length)
-            copy_literal(state)
+            length = m2_length[x]
+            distance = (src[ip] << 3) + m2_distance[x]
+            ip += 1
         elif x > 31:
-            length = 2 + get_length(x, 31)
-            extra = read_le16()
+            length = x & 31
+            if not length:
+                while not src[ip]:
+                    length += 255
+                    ip += 1
+                
+                length += 31 + src[ip]
+                ip += 1
+            
+            length += 2
+            extra = src[ip] | (src[ip + 1] << 8)
+            ip += 2
             distance = (extra >> 2) + 1
             state = extra & 3
-            copy_match(distance, length)
-            copy_literal(state)
-        else:
-            length = 2 + get_length(x, 7)
-            extra = read_le16()
+        elif x > 15:
+            length = x & 7
+            if not length:
+                while not src[ip]:
+                    length += 255
+                    ip += 1
+                
+                length += 7 + src[ip]
+                ip += 1
+            
+            length += 2
+            extra = src[ip] | (src[ip + 1] << 8)
+            ip += 2
             distance = 16384 + ((x & 8) << 11) + (extra >> 2)
             state = extra & 3
             if distance == 16384:
                 if length != 3:
-                    raise LZO_Error("Invalid End Of Stream (expected match length: 3, got: %s)" % length)
+                    raise ValueError()
                 # End of Stream reached
                 break
+        elif not state:
+            length = x
+            if not length:
+                while not src[ip]:
+                    length += 255
+                    ip += 1
+                
+                length += 15 + src[ip]
+                ip += 1
+            
+            # A literal run cut short by the end of the input is caught by the next instruction read.
+            length += 3
+            out += src[ip:(ip + length)]
+            op += length
+            ip += length
+            state = 4
+            x = src[ip]
+            ip += 1
+            continue
+        elif state < 4:
+            length = 2
+            state = x & 3
+            distance = (src[ip] << 2) + (x >> 2) + 1
+            ip += 1
+        else:
+            length = 3
+            state = x & 3
+            distance = (src[ip] << 2) + (x >> 2) + 2049
+            ip += 1
+        
+        start = op - distance
+        if start < 0:
+            raise ValueError()
+        
+        if distance >= length:
+            out += out[start:(start + length)]
+        else:
+            out += (out[start:op] * (length // distance + 1))[:length]
+        
+        op += length
+        if op > expected:
+            raise ValueError()
+        
+        if state:
+            out += src[ip:(ip + state)]
+            op += state
+            ip += state
+        
+        x = src[ip]
+        ip += 1
+    
+    if op != expected:
+        raise ValueError()
+    
+    return ip, out
+
+
+# Decoding with every bounds check, to report the exact errors of invalid streams.
+def lzo1x_decompress_checked(data, expected, output = None):
+    if output is None:
+        output = bytearray(expected)
+
+    with memoryview(data) as src, memoryview(output) as out:
+        end = len(src)
+        ip = 0
+        op = 0
+        state = 0
+
+        try:
+            # First byte is handled separately, as the output buffer is empty at this point.
+            x = src[ip]
+            ip += 1
+            if x > 17:
+                length = x - 17
+                if expected - op < length:
+                    raise LZO_Error("Output overrun (free buffer: %d, match length: %d)" % (expected - op, length))
+                if ip + length > end:
+                    raise IndexError()
+                
+                out[op:(op + length)] = src[ip:(ip + length)]
+                op += length
+                ip += length
+                state = min(4, length)
+                x = src[ip]
+                ip += 1
+            
+            while True:
+                if x > 63:
+                    state = x & 3
+                    length = M2_LENGTH[x]
+                    distance = (src[ip] << 3) + M2_DISTANCE[x]
+                    ip += 1
+                elif x <= 15:
+                    if not state:
+                        length = x
+                        if not length:
+                            while not src[ip]:
+                                length += 255
+                                ip += 1
+                            
+                            length += 15 + src[ip]
+                            ip += 1
+                        
+                        length += 3
+                        if expected - op < length:
+                            raise LZO_Error("Output overrun (free buffer: %d, match length: %d)" % (expected - op, length))
+                        if ip + length > end:
+                            raise IndexError()
+                        
+                        out[op:(op + length)] = src[ip:(ip + length)]
+                        op += length
+                        ip += length
+                        state = 4
+                        x = src[ip]
+                        ip += 1
+                        continue
+                    elif state < 4:
+                        length = 2
+                        state = x & 3
+                        distance = (src[ip] << 2) + (x >> 2) + 1
+                        ip += 1
+                    else:
+                        length = 3
+                        state = x & 3
+                        distance = (src[ip] << 2) + (x >> 2) + 2049
+                        ip += 1
+                elif x > 31:
+                    length = x & 31
+                    if not length:
+                        while not src[ip]:
+                            length += 255
+                            ip += 1
+                        
+                        length += 31 + src[ip]
+                        ip += 1
+                    
+                    length += 2
+                    extra = src[ip] | (src[ip + 1] << 8)
+                    ip += 2
+                    distance = (extra >> 2) + 1
+                    state = extra & 3
+                else:
+                    length = x & 7
+                    if not length:
+                        while not src[ip]:
+                            length += 255
+                            ip += 1
+                        
+                        length += 7 + src[ip]
+                        ip += 1
+                    
+                    length += 2
+                    extra = src[ip] | (src[ip + 1] << 8)
+                    ip += 2
+                    distance = 16384 + ((x & 8) << 11) + (extra >> 2)
+                    state = extra & 3
+                    if distance == 16384:
+                        if length != 3:
+                            raise LZO_Error("Invalid End Of Stream (expected match length: 3, got: %s)" % length)
+                        # End of Stream reached
+                        break
+                
+                if op < distance:
+                    raise LZO_Error("Invalid back pointer (buffer: %d, pointer: %d)" % (op, -distance))
+                if expected - op < length:
+                    raise LZO_Error("Output overrun (free buffer: %d, match length: %d)" % (expected - op, length))
+                
+                # It is valid to have length that is longer than the back pointer distance, which creates a repeating pattern,
+                # copying the same bytes that were copied in this same command.
+                # For this reason, overlapping matches are assembled from repeats of the referenced chunk.
+                start = op - distance
+                if distance >= length:
+                    out[op:(op + length)] = out[start:(start + length)]
+                else:
+                    out[op:(op + length)] = (bytes(out[start:op]) * (length // distance + 1))[:length]
+                
+                op += length
+
+                if state:
+                    if expected - op < state:
+                        raise LZO_Error("Output overrun (free buffer: %d, match length: %d)" % (expected - op, state))
+                    if ip + state > end:
+                        raise IndexError()
+                    
+                    out[op:(op + state)] = src[ip:(ip + state)]
+                    op += state
+                    ip += state
+                
+                x = src[ip]
+                ip += 1
+
+        except IndexError:
+            raise LZO_Error("Input overrun (stream ended without End Of Stream)")
+
+    if expected - op:
+        raise LZO_Error("Stream provided shorter output than expected (expected: %d, got: %d)" % (expected, op))
+    
+    return ip, output
+
+
+# Decompresses the stream at the current position of the file. Only the worst case length of
+# the compressed stream is read into memory (or accessed directly, if the file supports
+# zero-copy reads), and the file is positioned to the end of the stream afterwards.
+def lzo1x_decompress(file, expected, output = None):
+    start = file.tell()
+    bound = expected + expected // 16 + 64 + 3
+    read = getattr(file, "read_view", file.read)
+
+    data = read(bound)
+    try:
+        consumed, output = lzo1x_decompress_buffer(data, expected, output)
+    except LZO_Error:
+        if len(data) < bound:
+            raise
+        
+        # Streams produced by conforming compressors are never longer than the bound,
+        # but it is still not a requirement of the format.
+        file.seek(start)
+        data = read()
+        consumed, output = lzo1x_decompress_buffer(data, expected, output)
+    
+    file.seek(start + consumed)
+
+    return consumed, output
+
+
+# Length of the common prefix of two positions in the data (the first 4 bytes are known to match).
+# The matching chunk is extended in growing steps, then the end is narrowed down with shrinking steps.
+def get_match_length(data, candidate, position, limit):
+    length = 4
+    step = 4
+    while step:
+        step = min(step, limit - length)
+        if step and data[(candidate + length):(candidate + length + step)] == data[(position + length):(position + length + step)]:
+            length += step
+            step *= 2
+        else:
+            step //= 2
+    
+    return length
+
+
+def lzo1x_write_count(output, count):
+    while count > 255:
+        count -= 255
+        output.append(0)
+    
+    output.append(count)
+
+
+def lzo1x_write_literals(output, data, start, end, state_offset):
+    count = end - start
+    if count == 0:
+        return
+    
+    if len(output) == 0 and count <= 238:
+        output.append(17 + count)
+    elif count <= 3:
+        output[state_offset] |= count
+    elif count <= 18:
+        output.append(count - 3)
+    else:
+        output.append(0)
+        lzo1x_write_count(output, count - 18)
+    
+    output += data[start:end]
+
+
+def lzo1x_write_match(output, length, distance):
+    if length <= 8 and distance <= 2048:
+        distance -= 1
+        output.append(((length - 1) << 5) | ((distance & 7) << 2))
+        output.append(distance >> 3)
+        return
+
+    if distance <= 16384:
+        distance -= 1
+        if length <= 33:
+            output.append(32 | (length - 2))
+        else:
+            output.append(32)
+            lzo1x_write_count(output, length - 33)
+    else:
+        distance -= 16384
+        if length <= 9:
+            output.append(16 | ((distance >> 11) & 8) | (length - 2))
+        else:
+            output.append(16 | ((distance >> 11) & 8))
+            lzo1x_write_count(output, length - 9)
+    
+    output.append((distance << 2) & 255)
+    output.append((distance >> 6) & 255)
+
+
+# Compression algorithm producing LZO1X-1 compatible bit streams, that can be decompressed
+# with the lzo1x_decompress function (or any other LZO1X decompressor).
+# Matches of at least 4 bytes are searched with hash chains keyed by the next 4 bytes of the data,
+# only checking the most recent occurrences (up to max_chain), within the maximum distance
+# supported by the format. Positions inside matches are not indexed, and the search gradually
+# skips ahead in long runs of incompressible data, like the reference LZO1X-1 compressor does.
+# The encoding of the instructions follows the LZO stream format documentation:
+# https://docs.kernel.org/staging/lzo.html
+def lzo1x_compress(data, max_chain = 16):
+    data = bytes(data)
+    size = len(data)
+    output = bytearray()
+    heads = {}
+    chain = [None] * size
+
+    start = 0 # start of the pending literals
+    position = 0
+    state_offset = 0 # the last 2 bits of the byte at this offset store the number of short literals after a match
+    while position <= size - 4:
+        key = data[position:(position + 4)]
+        candidate = heads.get(key)
+        heads[key] = position
+        chain[position] = candidate
+
+        best_length = 0
+        best_distance = 0
+        count = max_chain
+        while candidate is not None and count:
+            distance = position - candidate
+            if distance > 49151:
+                break
+            
+            length = get_match_length(data, candidate, position, size - position)
+            if length > best_length:
+                best_length = length
+                best_distance = distance
             
-            copy_match(distance, length)
-            copy_literal(state)
+            candidate = chain[candidate]
+            count -= 1
+        
+        if not best_length:
+            position += 1 + ((position - start) >> 5)
+            continue
 
-        x = read1()
+        lzo1x_write_literals(output, data, start, position, state_offset)
+        lzo1x_write_match(output, best_length, best_distance)
+        state_offset = len(output) - 2
 
-    if expected - len(output):
-        raise LZO_Error("Stream provided shorter output than expected (expected: %d, got: %d)" % (expected, len(output)))
+        position += best_length
+        start = position
     
-    return file.tell() - start, output
+    lzo1x_write_literals(output, data, start, size, state_offset)
+    output += b"\x11\x00\x00" # End Of Stream
+
+    return bytes(output)
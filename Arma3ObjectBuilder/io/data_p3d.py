@@ -4,12 +4,16 @@
 # https://community.bistudio.com/wiki/P3D_File_Format_-_MLOD
 
 
-import struct
-import math
+import io
 import re
-from decimal import Decimal, Context
+from collections.abc import Mapping, Sequence
+from types import MappingProxyType
+
+import numpy as np
 
 from . import binary_handler as binary
+from . import parse_cache
+from . import process_pool
 
 
 class P3D_Error(Exception):
@@ -17,9 +21,74 @@ class P3D_Error(Exception):
         return "P3D - %s" % super().__str__()
 
 
+# Read-only dictionary-like view of array-backed LOD data. The view keeps
+# the {index: item} access pattern of the original dictionary based API
+# available, without creating Python objects for every element up front.
+class P3D_ArrayView(Mapping):
+    __slots__ = ("count", "getter")
+
+    def __init__(self, count, getter):
+        self.count = count
+        self.getter = getter
+    
+    def __getitem__(self, key):
+        if not 0 <= key < self.count:
+            raise KeyError(key)
+        
+        return self.getter(key)
+    
+    def __iter__(self):
+        return iter(range(self.count))
+    
+    def __len__(self):
+        return self.count
+
+
+# Assign a group index to every item (or row if an axis is given) of an array,
+# with the groups numbered in the order of the first occurence of their values.
+# Returns the array of unique values, and the array of group indices.
+def unique_by_first_occurence(values, axis = None):
+    unique, first, inverse = np.unique(values, return_index=True, return_inverse=True, axis=axis)
+    order = np.argsort(first)
+    groups = np.empty_like(order)
+    groups[order] = np.arange(len(order))
+
+    return unique[order], groups[inverse.reshape(-1)]
+
+
+# Same as above, but the results are returned as lists.
+def group_by_first_occurence(values):
+    unique, groups = unique_by_first_occurence(values)
+
+    return unique.tolist(), groups.tolist()
+
+
+# Concatenate variable length items into a single array for columnar storage,
+# and split them back by their item counts.
+def concatenate_items(items, dtype, shape = ()):
+    return np.concatenate([np.empty((0, *shape), dtype=dtype)] + [np.asarray(item, dtype=dtype).reshape((-1, *shape)) for item in items])
+
+
+def split_items(data, counts):
+    ends = np.cumsum(counts).tolist()
+    
+    return [data[start:end] for start, end in zip([0] + ends, ends)]
+
+
+# Convert UV coordinates between the Blender and the file conventions
+# (the V axis is flipped). The subtraction is done in double precision.
+def flip_uvs(uvs):
+    output = np.array(uvs, dtype=np.float64).reshape((-1, 2))
+    output[:, 1] = 1 - output[:, 1]
+
+    return output.astype(np.float32)
+
+
 # Generic class to consume unneeded TAGG types (eg.: #Hidden#, #Selected#).
 # The class is needed because the data field of the TAGG object must not be none.
 class P3D_TAGG_DataEmpty():
+    __slots__ = ()
+
     @classmethod
     def read(cls, file, length):
         file.read(length)
@@ -33,6 +102,8 @@ class P3D_TAGG_DataEmpty():
 
 
 class P3D_TAGG_DataSharpEdges():
+    __slots__ = ("edges",)
+
     def __init__(self):
         self.edges = []
     
@@ -62,6 +133,8 @@ class P3D_TAGG_DataSharpEdges():
 
 
 class P3D_TAGG_DataProperty():
+    __slots__ = ("key", "value")
+
     def __init__(self):
         self.key = ""
         self.value = ""
@@ -84,13 +157,15 @@ class P3D_TAGG_DataProperty():
 
 
 class P3D_TAGG_DataMass():
+    __slots__ = ("masses",)
+
     def __init__(self):
-        self.masses = {}
+        self.masses = np.empty(0, dtype=np.float32)
     
     @classmethod
     def read(cls, file, count_verts):
         output = cls()
-        output.masses = {i: value for i, value in enumerate(binary.read_floats(file, count_verts))}
+        output.masses = binary.read_array(file, "<f4", count_verts).copy()
         
         return output
     
@@ -98,22 +173,24 @@ class P3D_TAGG_DataMass():
         return len(self.masses) * 4
     
     def write(self, file):
-        for value in self.masses.values():
-            binary.write_float(file, value)
+        file.write(np.asarray(self.masses, dtype="<f4").tobytes())
 
 
 class P3D_TAGG_DataUVSet():
+    __slots__ = ("id", "uvs")
+
     def __init__(self):
         self.id = 0
-        self.uvs = {}
+        # UV coordinates are stored as in the file (V axis flipped compared to Blender)
+        self.uvs = np.empty((0, 2), dtype=np.float32)
     
     @classmethod
     def read(cls, file, length = 0):
         output = cls()
         count_values = (length - 4) // 4
         output.id = binary.read_ulong(file)
-        data = binary.read_floats(file, count_values)
-        output.uvs = {i: (data[i * 2], 1 - data[i * 2 + 1]) for i in range(count_values // 2)}
+        data = binary.read_array(file, "<f4", count_values)
+        output.uvs = data[:count_values // 2 * 2].reshape((-1, 2)).copy()
 
         return output
     
@@ -122,16 +199,62 @@ class P3D_TAGG_DataUVSet():
     
     def write(self, file):
         binary.write_ulong(file, self.id)
-        for value in self.uvs.values():
-            binary.write_float(file, value[0], 1 - value[1])
+        file.write(np.asarray(self.uvs, dtype="<f4").tobytes())
 
 
+# The selection data is stored as the raw weight bytes of the vertices and faces.
+# The weights are decoded with a lookup table when needed, and the old dictionary
+# interface is kept as read-only views for compatibility.
 class P3D_TAGG_DataSelection():
+    # Decoded weight of each possible byte value (0: not selected, 1: full weight)
+    WEIGHTS = np.concatenate(([0, 1], (256 - np.arange(2, 256)) / 255)).astype(np.float32)
+
+    __slots__ = ("data_verts", "data_faces")
+
     def __init__(self):
-        self.count_verts = 0
-        self.count_faces = 0
-        self.weight_verts = {}
-        self.weight_faces = {}
+        self.data_verts = np.zeros(0, dtype=np.uint8)
+        self.data_faces = np.zeros(0, dtype=np.uint8)
+    
+    # Changing the counts resizes the data arrays (new items are not selected).
+    @staticmethod
+    def resized(data, count):
+        output = np.zeros(count, dtype=np.uint8)
+        size = min(count, len(data))
+        output[:size] = data[:size]
+
+        return output
+    
+    @property
+    def count_verts(self):
+        return len(self.data_verts)
+    
+    @count_verts.setter
+    def count_verts(self, value):
+        self.data_verts = self.resized(self.data_verts, value)
+
+    @property
+    def count_faces(self):
+        return len(self.data_faces)
+    
+    @count_faces.setter
+    def count_faces(self, value):
+        self.data_faces = self.resized(self.data_faces, value)
+    
+    @property
+    def weight_verts(self):
+        return MappingProxyType(dict(zip(*[item.tolist() for item in self.get_weights_verts()])))
+    
+    @weight_verts.setter
+    def weight_verts(self, value):
+        self.set_weights_verts(list(value.keys()), list(value.values()))
+    
+    @property
+    def weight_faces(self):
+        return MappingProxyType(dict(zip(*[item.tolist() for item in self.get_weights_faces()])))
+    
+    @weight_faces.setter
+    def weight_faces(self, value):
+        self.set_weights_faces(list(value.keys()), list(value.values()))
     
     @classmethod
     def decode_weight(cls, weight):
@@ -157,37 +280,62 @@ class P3D_TAGG_DataSelection():
             
         return value
     
+    # Vectorized version of encode_weight (weights are clamped to the 0-1 range).
+    @classmethod
+    def encode_weights(cls, weights):
+        weights = np.clip(np.asarray(weights, dtype=np.float64), 0, 1)
+
+        return (np.round(256 - 255 * weights) % 256).astype(np.uint8)
+    
+    # Returns the indices of the selected items, and their decoded weights.
+    def get_weights_verts(self):
+        indices = np.flatnonzero(self.data_verts)
+        return indices, self.WEIGHTS[self.data_verts[indices]]
+    
+    def get_weights_faces(self):
+        indices = np.flatnonzero(self.data_faces)
+        return indices, self.WEIGHTS[self.data_faces[indices]]
+    
+    # Raw weight data of the given items and weights. The data is extended if an
+    # item is beyond the current count (eg.: when the counts were not set yet).
+    @classmethod
+    def build_weights(cls, indices, weights, count):
+        indices = np.asarray(indices, dtype=np.int64)
+        if np.any(indices < 0):
+            raise P3D_Error("Invalid negative selection index")
+        
+        output = np.zeros(max(count, int(indices.max(initial=-1)) + 1), dtype=np.uint8)
+        output[indices] = cls.encode_weights(weights)
+
+        return output
+    
+    # Replaces the selection with the given items and weights.
+    def set_weights_verts(self, indices, weights):
+        self.data_verts = self.build_weights(indices, weights, self.count_verts)
+    
+    def set_weights_faces(self, indices, weights):
+        self.data_faces = self.build_weights(indices, weights, self.count_faces)
+    
     @classmethod
     def read(cls, file, count_verts, count_faces):
         output = cls()
         
-        output.count_verts = count_verts
-        output.count_faces = count_faces
-        
-        data_verts = bytearray(file.read(count_verts))
-
-        output.weight_verts = {i: cls.decode_weight(value) for i, value in enumerate(data_verts) if value > 0}
-        file.read(count_faces)
+        output.data_verts = binary.read_array(file, np.uint8, count_verts).copy()
+        output.data_faces = binary.read_array(file, np.uint8, count_faces).copy()
 
         return output
     
     def length(self):
         return self.count_verts + self.count_faces
     
-    def write(self, file):        
-        bytes_verts = bytearray(self.count_verts)
-        for idx in self.weight_verts:
-            bytes_verts[idx] = self.encode_weight(self.weight_verts[idx])
-        
-        bytes_faces = bytearray(self.count_faces)
-        for idx in self.weight_faces:
-            bytes_faces[idx] = self.encode_weight(self.weight_faces[idx])
-        
-        file.write(bytes_verts)
-        file.write(bytes_faces)
+    def write(self, file):
+        file.write(self.data_verts.tobytes())
+        file.write(self.data_faces.tobytes())
 
 
 class P3D_TAGG():
+    __slots__ = ("active", "name", "data")
+
     def __init__(self):
         self.active = True
         self.name = ""
@@ -202,11 +350,11 @@ class P3D_TAGG():
     # Read
 
     @classmethod
-    def read(cls, file, count_verts, count_faces):
+    def read(cls, file, count_verts, count_faces, names = None):
         output = cls()
         
         output.active = binary.read_bool(file)
-        output.name = binary.read_asciiz(file)
+        output.name = binary.read_asciiz(file, names)
         length = binary.read_ulong(file)
         
         
@@ -343,6 +491,18 @@ class P3D_LOD_Resolution():
         SHADOW_VIEW_CARGO: 3
     }
 
+    # Reverse lookup of the signature components of the LOD types
+    INDEX_MAP_INVERSE = {v: k for k, v in INDEX_MAP.items()}
+    # Exponents of the LOD types that have signatures above the visual resolution range
+    EXPONENTS = frozenset(exp for coef, exp in INDEX_MAP if exp > 0)
+    # Exponents of the LOD types that are distinguished by their first decimal place
+    EXPONENTS_DECIMAL = frozenset((3, 4, 16))
+    # Previously decoded signatures (files only use a handful of distinct signatures)
+    DECODED = {}
+    DECODED_LIMIT = 4096
+
+    __slots__ = ("lod", "res", "source")
+
     def __init__(self, lod = 0, res = 0):
         self.lod = lod
         self.res = res
@@ -359,27 +519,53 @@ class P3D_LOD_Resolution():
         if lod == cls.VISUAL or lod == cls.UNKNOWN:
             return resolution 
         
-        lookup = {v: k for k, v in cls.INDEX_MAP.items()}
-
-        coef, exp = lookup[lod]
+        coef, exp = cls.INDEX_MAP_INVERSE[lod]
         pos = cls.RESOLUTION_POS.get(lod, None)
 
         resolution_sign = (resolution * 10**(exp - pos)) if pos is not None else 0
         
         return coef * 10**exp + resolution_sign
+    
+    # Decimal exponent of the signature, after rounding it to 2 significant digits.
+    # Only called for signatures above 1e3, where the integer part of the value
+    # determines the number of digits, and the rounding threshold (9.95 * 10**exp)
+    # can be compared exactly as an integer.
+    @staticmethod
+    def get_exponent(signature):
+        exp = len(str(int(signature))) - 1
+        if signature >= 995 * 10**(exp - 2):
+            exp += 1
+        
+        return exp
 
     @classmethod
     def decode(cls, signature):
+        output = cls.DECODED.get(signature)
+        if output is not None:
+            return output
+        
+        output = cls.decode_signature(signature)
+        if len(cls.DECODED) >= cls.DECODED_LIMIT:
+            cls.DECODED.clear()
+        
+        cls.DECODED[signature] = output
+
+        return output
+
+    @classmethod
+    def decode_signature(cls, signature):
         if signature < 1e3:
             return cls.VISUAL, round(signature)
         elif 1e4 <= signature < 1.2e4:
             return cls.SHADOW, round(signature - 1e4)
         
-        num = Decimal(signature)
-        exp = num.normalize(Context(2)).adjusted()
+        exp = cls.get_exponent(signature)
+        if exp not in cls.EXPONENTS:
+            return cls.UNKNOWN, round(signature)
         
-        coef = float((num / 10**exp))
-        base = round(coef, 1) if exp in (3, 4, 16) else round(coef)
+        # Both operands are exact, so the division is correctly rounded.
+        coef = signature / 10**exp
+        base = round(coef, 1) if exp in cls.EXPONENTS_DECIMAL else round(coef)
 
         lod = cls.INDEX_MAP.get((base, exp), cls.UNKNOWN)
         pos = cls.RESOLUTION_POS.get(lod, None)
@@ -410,66 +596,202 @@ class P3D_LOD_Resolution():
 
 
 class P3D_LOD():
+    # Vertex records as stored in the file (X, Z, Y coordinates and flag)
+    DTYPE_VERT = np.dtype([("co", "<f4", 3), ("flag", "<u4")])
+    # Fixed size part of the face records (the texture and material strings follow)
+    DTYPE_FACE = np.dtype([
+        ("sides", "<u4"),
+        ("points", [("vert", "<u4"), ("normal", "<u4"), ("uv", "<f4", 2)], 4),
+        ("flag", "<u4")
+    ])
+    # TAGG data types in the order of their codes in the columnar representation
+    TAGG_TYPES = (P3D_TAGG_DataSelection, P3D_TAGG_DataProperty, P3D_TAGG_DataMass, P3D_TAGG_DataUVSet, P3D_TAGG_DataSharpEdges, P3D_TAGG_DataEmpty)
+
     def __init__(self):
         self.signature = b"P3DM"
         self.version = (28, 256)
         self.flags = 0x00000000
         self.resolution = P3D_LOD_Resolution()
 
-        self.verts = {}
-        self.normals = {}
-        self.faces = {}
+        # Vertex and normal data is stored in columnar arrays, already
+        # converted to the Blender coordinate system.
+        self.vert_coords = np.empty((0, 3), dtype=np.float32)
+        self.vert_flags = np.empty(0, dtype=np.uint32)
+        self.normal_vectors = np.empty((0, 3), dtype=np.float32)
+        # Face data is stored in an indexed table. The point arrays are padded to 4 points,
+        # UV coordinates are stored as in the file (V axis flipped compared to Blender),
+        # and the texture-material pairs are referenced by their index in the materials list.
+        self.face_sides = np.empty(0, dtype=np.uint32)
+        self.face_verts = np.empty((0, 4), dtype=np.uint32)
+        self.face_normals = np.empty((0, 4), dtype=np.uint32)
+        self.face_uvs = np.empty((0, 4, 2), dtype=np.float32)
+        self.face_flags = np.empty(0, dtype=np.uint32)
+        self.face_materials = np.empty(0, dtype=np.uint32)
+        self.materials = []
         self.taggs = []
     
     def __eq__(self, other):
         return type(other) is type(self) and other.resolution == self.resolution
     
-    # Reading
+    # Dictionary views for backwards compatibility
+    # {idx 0: (x, y, z, flag), ...: (..., ..., ..., ...), ...}
 
-    @staticmethod
-    def read_vert(file):
-        x, z, y, flag = struct.unpack('<fffI', file.read(16))
-        return x, y, z, flag
+    def get_vert(self, idx):
+        return (*self.vert_coords[idx].tolist(), int(self.vert_flags[idx]))
+
+    @property
+    def verts(self):
+        return P3D_ArrayView(len(self.vert_flags), self.get_vert)
     
-    def read_verts(self, file, count_verts):
-        self.verts = {i: self.read_vert(file) for i in range(count_verts)}
+    @verts.setter
+    def verts(self, value):
+        values = list(value.values())
+        self.vert_coords = np.array([item[0:3] for item in values], dtype=np.float32).reshape(-1, 3)
+        self.vert_flags = np.array([item[3] for item in values], dtype=np.int64).astype(np.uint32)
+    
+    # {idx 0: (x, y, z), ...: (..., ..., ...), ...}
 
-    @staticmethod
-    def read_normal(file):
-        x, z, y = struct.unpack('<fff', file.read(12))
-        return -x, -y, -z
+    def get_normal(self, idx):
+        return tuple(self.normal_vectors[idx].tolist())
+
+    @property
+    def normals(self):
+        return P3D_ArrayView(len(self.normal_vectors), self.get_normal)
     
-    def read_normals(self, file, count_normals):
-        self.normals = {i: self.read_normal(file) for i in range(count_normals)}
+    @normals.setter
+    def normals(self, value):
+        self.normal_vectors = np.array(list(value.values()), dtype=np.float32).reshape(-1, 3)
     
-    @staticmethod
-    def read_face(file):
-        count_sides = binary.read_ulong(file)
-        vertices = []
-        normals = []
-        uvs = []
+    # {face 0: [[vert 0, vert 1, vert 2], [normal 0, normal 1, normal 2], [(u 0, v 0), (...), ...], texture, material, flag], ...}
+
+    def get_face(self, idx):
+        sides = int(self.face_sides[idx])
+        uvs = [(u, 1 - v) for u, v in self.face_uvs[idx, :sides].tolist()]
+        texture, material = self.materials[self.face_materials[idx]]
 
-        for i in range(count_sides):
-            vert, norm, u, v = struct.unpack('<IIff', file.read(16))
-            vertices.append(vert)
-            normals.append(norm)
-            uvs.append((u, 1 - v))
+        return [self.face_verts[idx, :sides].tolist(), self.face_normals[idx, :sides].tolist(), uvs, texture, material, int(self.face_flags[idx])]
 
-        if count_sides < 4:
-            file.read(16)
+    @property
+    def faces(self):
+        return P3D_ArrayView(len(self.face_sides), self.get_face)
+    
+    @faces.setter
+    def faces(self, value):
+        values = list(value.values())
+        padding = [[], [0], [0, 0], [0, 0, 0], [0, 0, 0, 0]]
+        padding_uv = [[], [(0, 1)], [(0, 1)] * 2, [(0, 1)] * 3, [(0, 1)] * 4]
+
+        self.face_sides = np.array([len(face[0]) for face in values], dtype=np.uint32)
+        self.face_verts = np.array([face[0] + padding[4 - len(face[0])] for face in values], dtype=np.uint32).reshape(-1, 4)
+        self.face_normals = np.array([face[1] + padding[4 - len(face[1])] for face in values], dtype=np.uint32).reshape(-1, 4)
+        uvs = np.array([list(face[2]) + padding_uv[4 - len(face[2])] for face in values], dtype=np.float64).reshape(-1, 4, 2)
+        uvs[:, :, 1] = 1 - uvs[:, :, 1]
+        self.face_uvs = uvs.astype(np.float32)
+        self.face_flags = np.array([face[5] for face in values], dtype=np.int64).astype(np.uint32)
+
+        lookup = {}
+        self.face_materials = np.array([lookup.setdefault((face[3], face[4]), len(lookup)) for face in values], dtype=np.uint32)
+        self.materials = list(lookup.keys())
+
+    # Mask of the used point slots in the padded face table.
+    def get_loops_mask(self):
+        return np.arange(4) < self.face_sides[:, None]
+    
+    # Reading
+
+    # The whole vertex and normal sections are read in one go, and the axes
+    # are swapped (and normals negated) in a vectorized manner.
+    def read_verts(self, file, count_verts):
+        data = binary.read_array(file, self.DTYPE_VERT, count_verts)
+        self.vert_coords = data["co"][:, (0, 2, 1)]
+        self.vert_flags = data["flag"].copy()
+    
+    def read_normals(self, file, count_normals):
+        data = binary.read_array(file, "<f4", count_normals * 3).reshape(-1, 3)
+        self.normal_vectors = -data[:, (0, 2, 1)]
+    
+    # The face records consist of a fixed size part followed by the texture and material
+    # strings, so the length of the section is not known in advance. The data is read in
+    # large chunks, and the string terminators are located with bytes.find. The file position
+    # is reset to the end of the section after the scan, and the end offset is returned.
+    # If a lookup dictionary is passed, the string pairs are interned in the lookup (and the
+    # indices of the pairs are returned). If a records list is passed, the fixed size parts of
+    # the records are collected in it.
+    @classmethod
+    def scan_faces(cls, file, count_faces, lookup = None, records = None):
+        size_fixed = cls.DTYPE_FACE.itemsize
+        size_chunk = count_faces * (size_fixed + 16) + 4096
+        indices = []
         
-        flag = binary.read_ulong(file)
-        texture = binary.read_asciiz(file)
-        material = binary.read_asciiz(file)
+        data = b""
+        pos = 0
+        for i in range(count_faces):
+            start = pos + size_fixed
+            split = data.find(b"\x00", start)
+            end = data.find(b"\x00", split + 1) if split != -1 else -1
+            while end == -1:
+                chunk = file.read(size_chunk)
+                if not chunk:
+                    raise P3D_Error("Face data ran into unexpected EOF")
+                
+                data = data[pos:] + chunk
+                pos = 0
+                start = size_fixed
+                split = data.find(b"\x00", start)
+                end = data.find(b"\x00", split + 1) if split != -1 else -1
+            
+            if records is not None:
+                records.append(data[pos:start])
+            
+            if lookup is not None:
+                key = data[start:end]
+                idx = lookup.get(key)
+                if idx is None:
+                    idx = lookup[key] = len(lookup)
+                
+                indices.append(idx)
+            
+            pos = end + 1
 
-        return [vertices, normals, uvs, texture, material, flag]
+        return file.seek(pos - len(data), 1), indices
 
+    # The fixed size parts of the records are converted to arrays in a single pass.
     def read_faces(self, file, count_faces):
-        self.faces = {i: self.read_face(file) for i in range(count_faces)}
+        lookup = {}
+        records = []
+        end, materials = self.scan_faces(file, count_faces, lookup, records)
+
+        table = np.frombuffer(b"".join(records), dtype=self.DTYPE_FACE)
+        self.face_sides = table["sides"].copy()
+        if np.any(self.face_sides > 4):
+            raise P3D_Error("Invalid face with more than 4 sides")
+        
+        self.face_verts = table["points"]["vert"].copy()
+        self.face_normals = table["points"]["normal"].copy()
+        self.face_uvs = table["points"]["uv"].copy()
+        self.face_flags = table["flag"].copy()
+        self.face_materials = np.array(materials, dtype=np.uint32)
+        self.materials = self.decode_materials(lookup)
+
+        # Values in the padding slots of triangles are ignored
+        padding = ~self.get_loops_mask()
+        self.face_verts[padding] = 0
+        self.face_normals[padding] = 0
+        self.face_uvs[padding] = 0
 
     @classmethod
-    def read(cls, file):
+    def skip_faces(cls, file, count_faces):
+        return cls.scan_faces(file, count_faces)[0]
 
+    # Texture-material pairs from the string pairs interned by scan_faces.
+    @staticmethod
+    def decode_materials(lookup):
+        return [tuple(key.decode('utf8', errors="replace").split("\x00")) for key in lookup]
+
+    # The names dictionary is used to intern the TAGG names
+    # (that are often repeated between LODs).
+    @classmethod
+    def read_header(cls, file):
         signature = file.read(4)
         if signature != b"P3DM":
             raise P3D_Error("Unsupported LOD type: %s" % str(signature))
@@ -477,83 +799,197 @@ class P3D_LOD():
         version = binary.read_ulongs(file, 2)
         if version != (0x1c, 0x100):
             raise P3D_Error("Unsupported LOD version: %d.%d" % (version[0], version[1]))
-
+        
+        return (version, *binary.read_ulongs(file, 4))
+    
+    @classmethod
+    def read(cls, file, names = None):
         output = cls()
+        version, count_verts, count_normals, count_faces, flags = cls.read_header(file)
         output.version = version
-        
-        count_verts, count_normals, count_faces, flags = binary.read_ulongs(file, 4)
         output.flags = flags
 
         output.read_verts(file, count_verts)
         output.read_normals(file, count_normals)
         output.renormalize_normals()
         output.read_faces(file, count_faces)
-
+        output.read_taggs(file, count_verts, count_faces, names)
+        output.resolution.set_from_float(binary.read_float(file))
+        
+        return output
+    
+    def read_taggs(self, file, count_verts, count_faces, names = None):
         tagg_signature = binary.read_char(file, 4)
         if tagg_signature != "TAGG":
             raise P3D_Error("Invalid TAGG section signature: %s" % tagg_signature)
         
         while True:
-            tagg = P3D_TAGG.read(file, count_verts, count_faces)
+            tagg = P3D_TAGG.read(file, count_verts, count_faces, names)
             if tagg.name == "#EndOfFile#":
                 break
             
             if tagg.active:
-                output.taggs.append(tagg)
-        
-        output.resolution.set_from_float(binary.read_float(file))
+                self.taggs.append(tagg)
+    
+    # Columnar representation of the TAGGs for the parse cache. The data of each TAGG
+    # type is concatenated into a single array, with the item counts stored beside it.
+    def get_tagg_arrays(self):
+        taggs = [tagg for tagg in self.taggs if tagg.active]
+        kinds = [self.TAGG_TYPES.index(type(tagg.data)) for tagg in taggs]
+        selections, properties, masses, uvsets, edges = [[tagg.data for tagg, kind in zip(taggs, kinds) if kind == i] for i in range(5)]
+
+        return {
+            "tagg_names": np.array([tagg.name for tagg in taggs], dtype=str),
+            "tagg_kinds": np.array(kinds, dtype=np.uint8),
+            "selection_counts": np.array([(data.count_verts, data.count_faces) for data in selections], dtype=np.int64).reshape((-1, 2)),
+            "selection_verts": concatenate_items([data.data_verts for data in selections], np.uint8),
+            "selection_faces": concatenate_items([data.data_faces for data in selections], np.uint8),
+            "properties": np.array([(data.key, data.value) for data in properties], dtype=str).reshape((-1, 2)),
+            "mass_counts": np.array([len(data.masses) for data in masses], dtype=np.int64),
+            "masses": concatenate_items([data.masses for data in masses], np.float32),
+            "uvset_ids": np.array([data.id for data in uvsets], dtype=np.uint32),
+            "uvset_counts": np.array([len(data.uvs) for data in uvsets], dtype=np.int64),
+            "uvsets": concatenate_items([data.uvs for data in uvsets], np.float32, (2, )),
+            "edge_counts": np.array([len(data.edges) for data in edges], dtype=np.int64),
+            "edges": concatenate_items([data.edges for data in edges], np.uint32, (2, ))
+        }
+    
+    def set_tagg_arrays(self, arrays, names = None):
+        counts = arrays["selection_counts"]
+        selections = zip(split_items(arrays["selection_verts"], counts[:, 0]), split_items(arrays["selection_faces"], counts[:, 1]))
+        properties = iter(arrays["properties"].tolist())
+        masses = iter(split_items(arrays["masses"], arrays["mass_counts"]))
+        uvsets = zip(arrays["uvset_ids"].tolist(), split_items(arrays["uvsets"], arrays["uvset_counts"]))
+        edges = iter(split_items(arrays["edges"], arrays["edge_counts"]))
+
+        if names is None:
+            names = {}
         
+        self.taggs = []
+        for name, kind in zip(arrays["tagg_names"].tolist(), arrays["tagg_kinds"].tolist()):
+            tagg = P3D_TAGG()
+            tagg.name = names.setdefault(name, name)
+            tagg.data = data = self.TAGG_TYPES[kind]()
+            if kind == 0:
+                data.data_verts, data.data_faces = next(selections)
+            elif kind == 1:
+                data.key, data.value = next(properties)
+            elif kind == 2:
+                data.masses = next(masses)
+            elif kind == 3:
+                data.id, data.uvs = next(uvsets)
+            elif kind == 4:
+                data.edges = [tuple(edge) for edge in next(edges).tolist()]
+            
+            self.taggs.append(tagg)
+
+    # Columnar representation of the LOD for the parse cache.
+    def get_arrays(self):
+        resolution = self.resolution.source
+        if resolution is None:
+            resolution = float(self.resolution)
+
+        return {
+            "header": np.array([*self.version, self.flags], dtype=np.uint32),
+            "resolution": np.array(resolution, dtype=np.float64),
+            "vert_coords": self.vert_coords,
+            "vert_flags": self.vert_flags,
+            "normal_vectors": self.normal_vectors,
+            "face_sides": self.face_sides,
+            "face_verts": self.face_verts,
+            "face_normals": self.face_normals,
+            "face_uvs": self.face_uvs,
+            "face_flags": self.face_flags,
+            "face_materials": self.face_materials,
+            "materials": np.array(self.materials, dtype=str).reshape((-1, 2)),
+            **self.get_tagg_arrays()
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays, names = None):
+        output = cls()
+        major, minor, flags = arrays["header"].tolist()
+        output.version = (major, minor)
+        output.flags = flags
+        output.resolution.set_from_float(float(arrays["resolution"]))
+
+        output.vert_coords = arrays["vert_coords"]
+        output.vert_flags = arrays["vert_flags"]
+        output.normal_vectors = arrays["normal_vectors"]
+        output.face_sides = arrays["face_sides"]
+        output.face_verts = arrays["face_verts"]
+        output.face_normals = arrays["face_normals"]
+        output.face_uvs = arrays["face_uvs"]
+        output.face_flags = arrays["face_flags"]
+        output.face_materials = arrays["face_materials"]
+        output.materials = [tuple(pair) for pair in arrays["materials"].tolist()]
+        output.set_tagg_arrays(arrays, names)
+
         return output
     
     # Writing
     
-    def write_vert(self, file, vert):
-        file.write(struct.pack('<fffI', vert[0], vert[2], vert[1], vert[3]))
-    
     def write_verts(self, file):
-        for i in self.verts:
-            self.write_vert(file, self.verts[i])
-    
-    def write_normal(self, file, normal):
-        file.write(struct.pack('<fff', -normal[0], -normal[2], -normal[1]))
+        data = np.empty(len(self.vert_coords), dtype=self.DTYPE_VERT)
+        data["co"] = self.vert_coords[:, (0, 2, 1)]
+        data["flag"] = self.vert_flags
+        file.write(data.tobytes())
     
     def write_normals(self, file):
-        for i in self.normals:
-            self.write_normal(file, self.normals[i])
+        file.write((-self.normal_vectors[:, (0, 2, 1)]).astype("<f4").tobytes())
     
-    def write_face(self, file, face):
-        count_sides = len(face[0])
-        binary.write_ulong(file, count_sides)
-
-        for i in range(count_sides):
-            file.write(struct.pack('<IIff', face[0][i], face[1][i], face[2][i][0], face[2][i][1]))
+    # The fixed size parts of the face records are built as a table, and the records
+    # are assembled in a preallocated buffer run by run, where a run is a sequence of
+    # faces with the same texture-material pair (so the records in it have the same size).
+    def write_faces(self, file):
+        count_faces = len(self.face_sides)
+        if count_faces == 0:
+            return
         
-        if count_sides < 4:
-            file.write(bytearray(16))
+        table = np.zeros(count_faces, dtype=self.DTYPE_FACE)
+        table["sides"] = self.face_sides
+        table["points"]["vert"] = self.face_verts
+        table["points"]["normal"] = self.face_normals
+        table["points"]["uv"] = self.face_uvs
+        table["flag"] = self.face_flags
+
+        size_fixed = self.DTYPE_FACE.itemsize
+        fixed = table.view(np.uint8).reshape((-1, size_fixed))
+        strings = [np.frombuffer(("%s\x00%s\x00" % pair).encode('ascii'), dtype=np.uint8) for pair in self.materials]
+        sizes = np.array([len(item) for item in strings], dtype=np.int64) + size_fixed
+
+        changes = np.flatnonzero(self.face_materials[1:] != self.face_materials[:-1]) + 1
+        starts = np.concatenate(([0], changes)).tolist()
+        ends = np.concatenate((changes, [count_faces])).tolist()
         
-        binary.write_ulong(file, face[5])
-        binary.write_asciiz(file, face[3])
-        binary.write_asciiz(file, face[4])
-    
-    def write_faces(self, file):
-        for i in self.faces:
-            self.write_face(file, self.faces[i])
-
+        buffer = np.empty(int(sizes[self.face_materials].sum()), dtype=np.uint8)
+        pos = 0
+        for start, end in zip(starts, ends):
+            string = strings[self.face_materials[start]]
+            block = buffer[pos:pos + (end - start) * (size_fixed + len(string))].reshape((end - start, -1))
+            block[:, :size_fixed] = fixed[start:end]
+            block[:, size_fixed:] = string
+            pos += block.nbytes
+        
+        file.write(buffer.tobytes())
 
     def write(self, file):
         file.write(self.signature)
         binary.write_ulong(file, *self.version)
         
-        count_verts = len(self.verts)
-        count_normals = len(self.normals)
-        count_faces = len(self.faces)
+        count_verts = len(self.vert_coords)
+        count_normals = len(self.normal_vectors)
+        count_faces = len(self.face_sides)
         
         binary.write_ulong(file, count_verts, count_normals, count_faces, self.flags)
 
         self.write_verts(file)
         self.write_normals(file)
         self.write_faces(file)
-        
+        self.write_taggs(file)
+        binary.write_float(file, float(self.resolution))
+    
+    def write_taggs(self, file):
         binary.write_chars(file, "TAGG")
         
         for tagg in self.taggs:
@@ -562,28 +998,34 @@ class P3D_LOD():
         eof = P3D_TAGG()
         eof.name = "#EndOfFile#"
         eof.write(file)
-            
-        binary.write_float(file, float(self.resolution))
     
     # Operations
 
     # The normals are stored as triplets of IEEE-754 32bit floating numbers,
     # which potentially result in a not normalized vector, which causes issues
     # in Blender, so the vectors need to be renormalized before usage.
+    # The calculation is done in double precision, and only the result is
+    # rounded back to single precision.
     def renormalize_normals(self):
-        for i in self.normals:
-            normal = self.normals[i]
-            length = math.sqrt(normal[0]**2 + normal[1]**2 + normal[2]**2)
-            
-            if length == 0:
-                continue
-                
-            coef = 1 / length
-            self.normals[i] = (normal[0] * coef, normal[1] * coef, normal[2] * coef)
+        normals = self.normal_vectors.astype(np.float64)
+        lengths = np.sqrt(normals[:, 0]**2 + normals[:, 1]**2 + normals[:, 2]**2)
+        valid = lengths != 0
+        normals[valid] *= (1 / lengths[valid])[:, None]
+
+        self.normal_vectors = normals.astype(np.float32)
+    
+    # Flat loop vertex indices, polygon loop starts and loop counts, that can be
+    # directly used with the foreach_set functions of the Blender API.
+    def loop_data(self):
+        loop_total = self.face_sides.astype(np.int32)
+        loop_start = np.zeros(len(loop_total), dtype=np.int32)
+        np.cumsum(loop_total[:-1], out=loop_start[1:])
+        
+        return self.face_verts[self.get_loops_mask()].astype(np.int32), loop_start, loop_total
     
     def pydata(self):
-        verts = [self.verts[i][0:3] for i in self.verts]
-        faces = [self.faces[idx][0] for idx in self.faces]
+        verts = self.vert_coords.tolist()
+        faces = [face[:sides] for face, sides in zip(self.face_verts.tolist(), self.face_sides.tolist())]
 
         return verts, [], faces
     
@@ -594,60 +1036,33 @@ class P3D_LOD():
     # from the parent MLOD object, so the dictionary is edited in place, not 
     # returned.
     def get_materials(self, materials = {}):
-        for item in self.faces:
-            face = self.faces[item]
-            texture = face[3]
-            material = face[4]
-
-            if (texture, material) not in materials:
-                materials[(texture, material)] = len(materials)
+        for pair in self.materials:
+            if pair not in materials:
+                materials[pair] = len(materials)
     
+    # Map the texture-material pair of each face to its index in
+    # the given lookup dictionary.
+    def get_face_material_indices(self, materials):
+        lookup = np.array([materials[pair] for pair in self.materials] or [0], dtype=np.int64)
+        return lookup[self.face_materials]
+
     # Generate the necessary material index for each face, as well
     # as the indices of the used materials in each material slot.
     def get_sections(self, materials):
-        slot_indices = []
-        slot_material_indices = []
-
-        last_idx = None
-        face_idx = 0
-
-        for i in self.faces:
-            face = self.faces[i]
-            texture = face[3]
-            material = face[4]
-            
-            idx = materials[(texture, material)]
-            if last_idx is None:
-                last_idx = idx
-                slot_material_indices.append(idx)
-
-            if idx != last_idx:
-                slot_material_indices.append(idx)
-                face_idx += 1
-                last_idx = idx
-
-            slot_indices.append(face_idx)
-
-        return slot_indices, slot_material_indices
+        indices = self.get_face_material_indices(materials)
+        if len(indices) == 0:
+            return [], []
+        
+        changes = np.flatnonzero(indices[1:] != indices[:-1]) + 1
+        slot_indices = np.zeros(len(indices), dtype=np.int64)
+        slot_indices[changes] = 1
+        
+        return np.cumsum(slot_indices).tolist(), indices[np.concatenate(([0], changes))].tolist()
     
     def get_sections_merged(self, materials):
-        slot_indices = []
-        material_slot_indices = {}
-
-        for i in self.faces:
-            face = self.faces[i]
-            texture = face[3]
-            material = face[4]
-
-            material_idx = materials[(texture, material)]
-            slot_idx = material_slot_indices.get(material_idx)
-            if slot_idx is None:
-                slot_idx = len(material_slot_indices)
-                material_slot_indices[material_idx] = slot_idx
-            
-            slot_indices.append(slot_idx)
+        material_indices, slot_indices = group_by_first_occurence(self.get_face_material_indices(materials))
 
-        return slot_indices, list(material_slot_indices.keys())
+        return slot_indices, material_indices
 
     def renumber_components(self):
         counter = 1
@@ -701,66 +1116,159 @@ class P3D_LOD():
     # of all UVSets, unique by ID. If UVSet 0 is also found as a TAGG, the TAGG
     # data takes precedence over the embedded values.
     def uvsets(self):
-        sets = {0: [uv for idx in self.faces for uv in self.faces[idx][2]]}
+        sets = {0: flip_uvs(self.face_uvs[self.get_loops_mask()])}
         for tagg in self.taggs:
             if tagg.name != "#UVSet#":
                 continue
 
-            sets[tagg.data.id] = tagg.data.uvs
+            sets[tagg.data.id] = flip_uvs(tagg.data.uvs)
 
         return sets
 
     # Generate loop normals list that can be directly used by the Blender API
     # mesh.normals_split_custom_set() function
     def loop_normals(self):
-        return [self.normals[item] for face in self.faces.values() for item in face[1]]
+        return self.normal_vectors[self.face_normals[self.get_loops_mask()]].tolist()
     
     # Collect and group the used vertex flag values for setting up
-    # the flag data layer and flag groups object data.
+    # the flag data layer and flag groups object data. Groups are numbered
+    # in the order of their first occurence.
     def flag_groups_vertex(self):
-        groups = {}
-        values = {}
-
-        for idx in self.verts:
-            flag = self.verts[idx][3]
-            group = groups.get(flag)
-            if group is None:
-                group = len(groups)
-                groups[flag] = group
-            
-            values[idx] = group
-        
-        return list(groups.keys()), values
+        return group_by_first_occurence(self.vert_flags)
     
     # Collect and group the used face flag values for setting up
     # the flag data layer and flag groups object data.
     def flag_groups_face(self):
-        groups = {}
-        values = {}
-
-        for idx in self.faces:
-            flag = self.faces[idx][5]
-            group = groups.get(flag)
-            if group is None:
-                group = len(groups)
-                groups[flag] = group
-            
-            values[idx] = group
-
-        return list(groups.keys()), values
+        return group_by_first_occurence(self.face_flags)
     
     # Change every file path, and selection name to lower case for a uniform output.
     def force_lowercase(self):
-        for idx in self.faces:
-            face = self.faces[idx]
-            face[3] = face[3].lower()
-            face[4] = face[4].lower()
+        self.materials = [(texture.lower(), material.lower()) for texture, material in self.materials]
         
         for tagg in self.taggs:
             if tagg.is_selection():
                 tagg.name = tagg.name.lower()
 
 
+# Summary of a LOD in an MLOD file, that can be collected without
+# reading the geometry data. The offset points to the start of the
+# LOD data in the file, and can be used to read the full LOD later.
+class P3D_LOD_Index():
+    __slots__ = ("offset", "length", "flags", "resolution", "count_verts", "count_normals", "count_faces", "taggs", "materials", "properties")
+
+    def __init__(self):
+        self.offset = 0
+        self.length = 0
+        self.flags = 0
+        self.resolution = P3D_LOD_Resolution()
+        self.count_verts = 0
+        self.count_normals = 0
+        self.count_faces = 0
+        self.taggs = []
+        self.materials = []
+        self.properties = []
+    
+    def __repr__(self):
+        return "<P3D_LOD_Index %s @%d>" % (str(self.resolution.get()), self.offset)
+    
+    # The vertex and normal data have fixed record sizes, so they are
+    # skipped with a seek. The face records are only scanned for the
+    # end of their strings, and the TAGG data is skipped by its length.
+    # Optionally the texture-material pairs of the faces, and the named
+    # properties are collected as well.
+    @classmethod
+    def read(cls, file, names = None, metadata = False):
+        output = cls()
+        output.offset = file.tell()
+
+        version, count_verts, count_normals, count_faces, flags = P3D_LOD.read_header(file)
+        output.count_verts = count_verts
+        output.count_normals = count_normals
+        output.count_faces = count_faces
+        output.flags = flags
+
+        file.seek(count_verts * P3D_LOD.DTYPE_VERT.itemsize + count_normals * 12, 1)
+        if metadata:
+            lookup = {}
+            P3D_LOD.scan_faces(file, count_faces, lookup)
+            output.materials = P3D_LOD.decode_materials(lookup)
+        else:
+            P3D_LOD.skip_faces(file, count_faces)
+
+        tagg_signature = binary.read_char(file, 4)
+        if tagg_signature != "TAGG":
+            raise P3D_Error("Invalid TAGG section signature: %s" % tagg_signature)
+        
+        while True:
+            active = binary.read_bool(file)
+            name = binary.read_asciiz(file, names)
+            length = binary.read_ulong(file)
+            if name == "#EndOfFile#":
+                break
+            
+            if metadata and active and name == "#Property#":
+                if length != 128:
+                    raise P3D_Error("Invalid name property length: %d" % length)
+                
+                prop = P3D_TAGG_DataProperty.read(file)
+                output.properties.append((prop.key, prop.value))
+            else:
+                file.seek(length, 1)
+            
+            if active:
+                output.taggs.append(name)
+        
+        output.resolution.set_from_float(binary.read_float(file))
+        output.length = file.tell() - output.offset
+
+        return output
+
+
+# Sequence of LODs that are only read from the source file when they
+# are first accessed, based on the LOD index of the file.
+class P3D_LOD_LazyList(Sequence):
+    def __init__(self, filepath, index):
+        self.filepath = filepath
+        self.index = index
+        self.lods = [None] * len(index)
+        self.names = {}
+    
+    def __len__(self):
+        return len(self.index)
+    
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        
+        lod = self.lods[idx]
+        if lod is None:
+            with binary.MappedReader(self.filepath) as file:
+                file.seek(self.index[idx].offset)
+                lod = self.lods[idx] = P3D_LOD.read(file, self.names)
+        
+        return lod
+    
+    def is_loaded(self, idx):
+        return self.lods[idx] is not None
+
+
+# Read a single LOD from the file, starting at the given offset. Used by the
+# worker processes of the parallel reading, the LOD object is returned to the
+# main process by pickling.
+def read_lod_at(filepath, offset):
+    with binary.MappedReader(filepath) as file:
+        file.seek(offset)
+        return P3D_LOD.read(file)
+
+
+# Serialize a single LOD into bytes. Used by the streamed export.
+def serialize_lod(lod):
+    buffer = io.BytesIO()
+    lod.write(buffer)
+
+    return buffer.getvalue()
+
+
 class P3D_MLOD():
     def __init__(self):
         self.source = ""
@@ -770,8 +1278,7 @@ class P3D_MLOD():
         self.lods = []
     
     @classmethod
-    def read(cls, file, first_lod_only = False):
-        
+    def read_header(cls, file):
         signature = file.read(4)
         if signature != b"MLOD":
             raise P3D_Error("Invalid MLOD signature: %s" % str(signature))
@@ -779,35 +1286,161 @@ class P3D_MLOD():
         version = binary.read_ulong(file)
         if version != 257:
             raise P3D_Error("Unsupported MLOD version: %d" % version)
-
+        
+        return version, binary.read_ulong(file)
+    
+    # The LOD filter is a callable that takes the resolution of a LOD, and
+    # returns whether the LOD should be read. Since the resolution is stored
+    # at the end of the LOD data, the LODs are indexed first, and only the
+    # matching ones are read.
+    @classmethod
+    def read(cls, file, first_lod_only = False, lod_filter = None):
         output = cls()
-        output.version = version
+        output.version, count_lods = cls.read_header(file)
 
-        count_lods = binary.read_ulong(file)
         if first_lod_only:
             count_lods = 1
         
-        output.lods = [P3D_LOD.read(file) for i in range(count_lods)]
+        names = {}
+        if lod_filter is None:
+            output.lods = [P3D_LOD.read(file, names) for i in range(count_lods)]
+            return output
+        
+        for i in range(count_lods):
+            entry = P3D_LOD_Index.read(file, names)
+            if not lod_filter(entry.resolution):
+                continue
+            
+            file.seek(entry.offset)
+            output.lods.append(P3D_LOD.read(file, names))
         
         return output
     
     @classmethod
-    def read_file(cls, filepath, first_lod_only = False):
-        output = None
-        with open(filepath, "br") as  file:
-            output = cls.read(file, first_lod_only)
+    def read_index(cls, file, metadata = False):
+        version, count_lods = cls.read_header(file)
+        names = {}
+
+        return [P3D_LOD_Index.read(file, names, metadata) for i in range(count_lods)]
+    
+    # The LODs are indexed first, then decoded in worker processes. The largest LODs
+    # are submitted first to balance the load, and the results are reassembled in
+    # the original order.
+    @classmethod
+    def read_parallel(cls, filepath, first_lod_only = False, lod_filter = None, workers = 0):
+        output = cls()
+        with binary.MappedReader(filepath) as file:
+            output.version, _ = cls.read_header(file)
+            file.seek(0)
+            index = cls.read_index(file)
+        
+        if first_lod_only:
+            index = index[:1]
+        
+        if lod_filter is not None:
+            index = [entry for entry in index if lod_filter(entry.resolution)]
+        
+        if len(index) < 2:
+            output.lods = [read_lod_at(filepath, entry.offset) for entry in index]
+            return output
+        
+        with process_pool.create_pool(process_pool.get_worker_count(len(index), workers)) as pool:
+            tasks = {}
+            for i in sorted(range(len(index)), key=lambda i: index[i].length, reverse=True):
+                tasks[i] = pool.submit(read_lod_at, filepath, index[i].offset)
+            
+            output.lods = [tasks[i].result() for i in range(len(index))]
+        
+        return output
+    
+    @classmethod
+    def read_file(cls, filepath, first_lod_only = False, lazy = False, lod_filter = None, parallel = False):
+        arrays = parse_cache.load("P3D", filepath, lambda payload: cls.select_arrays(payload, first_lod_only, lod_filter))
+        if arrays is not None:
+            output = cls.from_arrays(arrays)
+            output.source = filepath
+
+            return output
+        
+        # Only complete reads are stored in the parse cache.
+        is_complete = not (first_lod_only or lazy or lod_filter)
+        
+        if parallel and not lazy:
+            output = cls.read_parallel(filepath, first_lod_only, lod_filter)
+        else:
+            with binary.MappedReader(filepath) as file:
+                if lazy:
+                    output = cls()
+                    output.lods = P3D_LOD_LazyList(filepath, cls.read_index(file))
+                else:
+                    output = cls.read(file, first_lod_only, lod_filter)
+        
+        if is_complete and parse_cache.is_enabled():
+            parse_cache.store("P3D", filepath, output.get_arrays())
         
         output.source = filepath
         
         return output
     
+    # The arrays of the LODs are stored with the index of the LOD as prefix.
+    def get_arrays(self):
+        arrays = {
+            "version": np.array(self.version, dtype=np.uint32),
+            "count_lods": np.array(len(self.lods), dtype=np.uint32)
+        }
+        resolutions = []
+        for i, lod in enumerate(self.lods):
+            lod_arrays = lod.get_arrays()
+            resolutions.append(lod_arrays["resolution"])
+            arrays.update({"%d_%s" % (i, key): value for key, value in lod_arrays.items()})
+        
+        arrays["resolutions"] = np.array(resolutions, dtype=np.float64)
+        
+        return arrays
+    
+    # Names of the arrays of the LODs that would have been read with the given settings
+    # (the arrays of the other LODs do not have to be loaded from the cache at all).
+    @staticmethod
+    def select_arrays(payload, first_lod_only = False, lod_filter = None):
+        indices = list(range(int(payload["count_lods"])))
+        if first_lod_only:
+            indices = indices[:1]
+        
+        if lod_filter is not None:
+            resolutions = payload["resolutions"].tolist()
+            indices = [i for i in indices if lod_filter(P3D_LOD_Resolution.from_float(resolutions[i]))]
+        
+        prefixes = tuple(["%d_" % i for i in indices])
+
+        return ["version"] + [name for name in payload.files if name.startswith(prefixes)]
+    
+    # Only the LODs with arrays present are restored.
+    @classmethod
+    def from_arrays(cls, arrays):
+        output = cls()
+        output.version = int(arrays["version"])
+
+        lods = {}
+        for key, value in arrays.items():
+            idx, sep, name = key.partition("_")
+            if sep and idx.isdigit():
+                lods.setdefault(int(idx), {})[name] = value
+
+        names = {}
+        output.lods = [P3D_LOD.from_arrays(lods[i], names) for i in sorted(lods)]
+        
+        return output
+    
+    def write_header(self, file, count_lods):
+        file.write(self.signature)
+        binary.write_ulong(file, self.version)
+        binary.write_ulong(file, count_lods)
+    
     def write(self, file):
         if len(self.lods) == 0:
             raise P3D_Error("Cannot write file with no LODs")
         
-        file.write(self.signature)
-        binary.write_ulong(file, self.version)
-        binary.write_ulong(file, len(self.lods))
+        self.write_header(file, len(self.lods))
         for lod in self.lods:
             lod.write(file)
     
@@ -829,10 +1462,18 @@ class P3D_MLOD():
         for lod in self.lods:
             lod.force_lowercase()
     
+    # The resolutions of lazily read LODs are taken from the index,
+    # so looking them up does not require reading the LOD data.
+    def get_resolutions(self):
+        if isinstance(self.lods, P3D_LOD_LazyList):
+            return [entry.resolution for entry in self.lods.index]
+        
+        return [lod.resolution for lod in self.lods]
+    
     def find_lod(self, index = 0, resolution = 0):
-        for lod in self.lods:
-            if lod.resolution.get() == (index, resolution):
-                return lod
+        for i, res in enumerate(self.get_resolutions()):
+            if res.get() == (index, resolution):
+                return self.lods[i]
         
         return None
     
@@ -840,11 +1481,42 @@ class P3D_MLOD():
         signatures = set()
         duplicates = []
 
-        for i, lod in enumerate(self.lods):
-            sign = float(lod.resolution)
+        for i, res in enumerate(self.get_resolutions()):
+            sign = float(res)
             if sign in signatures:
                 duplicates.append(i)
             else:
                 signatures.add(sign)
 
         return duplicates
+
+
+# Streamed writing of MLOD files, without having to keep all LODs in memory.
+# The header is written with a placeholder LOD count, that is patched when the
+# writing is finished. The serialized LODs are appended to the file as they are
+# added, so they have to be added in their final order (sorted by signature).
+class P3D_MLOD_Writer():
+    def __init__(self, file, mlod = None):
+        self.file = file
+        self.mlod = mlod or P3D_MLOD()
+        self.offset_header = file.tell()
+        self.mlod.write_header(file, 0)
+        self.count = 0
+    
+    def __len__(self):
+        return self.count
+    
+    def add(self, data):
+        self.file.write(data)
+        self.count += 1
+    
+    def finish(self):
+        if self.count == 0:
+            raise P3D_Error("Cannot write file with no LODs")
+        
+        offset_end = self.file.tell()
+        self.file.seek(self.offset_header)
+        self.mlod.write_header(self.file, self.count)
+        self.file.seek(offset_end)
+
+        return self.count
@@ -398,7 +398,7 @@ class RAP_Reader():
     def read_file(cls, filepath):
         output = RAP.Root()
         
-        with open(filepath, "rb") as file:
+        with binary.MappedReader(filepath) as file:
             try:
                 signature = file.read(4)
                 if signature != b"\x00raP":
@@ -6,11 +6,11 @@
 
 
 import struct
-from io import BytesIO, BufferedReader
 import numpy as np
 
 from . import binary_handler as binary
-from .compression import lzo1x_decompress, LZO_Error
+from . import parse_cache
+from .compression import lzo1x_compress, lzo1x_decompress, LZO_Error
 
 
 class RTM_Error(Exception):
@@ -114,11 +114,129 @@ class RTM_MDAT():
 
 class RTM_0101():
     signature = b"RTM_0101"
+    # Transformation matrices are stored as 4 rows of 3 values in the file,
+    # the rows and the components in each row are in XZY order.
+    # Element [i][j] of the matrix is stored at index MATRIX_LAYOUT[i][j] of the 12 values.
+    MATRIX_LAYOUT = np.array([[0, 6, 3, 9], [2, 8, 5, 11], [1, 7, 4, 10]])
 
     def __init__(self):
         self.motion = (0, 0, 0)
-        self.frames = []
         self.bones = []
+        self.phases = np.zeros(0, dtype=np.float32) # (frames, )
+        self.matrices = np.zeros((0, 0, 4, 4), dtype=np.float32) # (frames, bones, 4, 4)
+        # Bone names of the transforms in each frame as raw ASCII fields (frames, bones),
+        # None means that the transforms follow the order of the bone list in every frame.
+        self.frame_bones = None
+    
+    @property
+    def count_frames(self):
+        return len(self.phases)
+
+    # Compatibility view of the frame data as RTM_Frame and RTM_Transform objects.
+    # The objects are created on every access, so modifying them has no effect,
+    # the updated list has to be assigned back to the property.
+    @property
+    def frames(self):
+        output = []
+        for phase, bones, matrices in zip(self.phases.tolist(), self.get_frame_bones(), self.matrices.tolist()):
+            frame = RTM_Frame()
+            frame.phase = phase
+            for bone, matrix in zip(bones, matrices):
+                transform = RTM_Transform()
+                transform.bone = bone
+                transform.matrix = matrix
+                frame.transforms.append(transform)
+
+            output.append(frame)
+
+        return output
+    
+    @frames.setter
+    def frames(self, frames):
+        count_bones = len(frames[0].transforms) if len(frames) > 0 else len(self.bones)
+        for frame in frames:
+            if len(frame.transforms) != count_bones:
+                raise RTM_Error("Frames have different number of transforms (expected: %d, got: %d)" % (count_bones, len(frame.transforms)))
+        
+        self.phases = np.array([frame.phase for frame in frames], dtype=np.float32)
+        self.matrices = np.zeros((len(frames), count_bones, 4, 4), dtype=np.float32)
+        for i, frame in enumerate(frames):
+            for j, transform in enumerate(frame.transforms):
+                self.matrices[i, j] = transform.matrix
+
+        self.frame_bones = self.encode_bones([[transform.bone for transform in frame.transforms] for frame in frames], (len(frames), count_bones))
+    
+    @staticmethod
+    def encode_bones(names, shape):
+        output = np.zeros(shape, dtype="S32")
+        for index, name in np.ndenumerate(np.array(names, dtype=object).reshape(shape)):
+            if (len(name) + 1) > 32:
+                raise ValueError("ASCIIZ value is longer (%d + 1) than field length (32)" % len(name))
+            
+            output[index] = name.encode('ascii')
+        
+        return output
+
+    # Bone names of the transforms in each frame, as lists of strings.
+    def get_frame_bones(self):
+        if self.frame_bones is None:
+            return [self.bones] * self.count_frames
+        
+        # Transforms usually follow the same order in every frame, so only the unique names are decoded.
+        unique, inverse = np.unique(self.frame_bones, return_inverse=True)
+        names = np.array([name.decode('utf8', errors="replace") for name in unique.tolist()], dtype=object)
+
+        return names[inverse.reshape(self.frame_bones.shape)].tolist()
+    
+    def get_dtype_frame(self, count_bones):
+        return np.dtype([
+            ("phase", "<f4"),
+            ("transforms", [("bone", "S32"), ("data", "<f4", 12)], (count_bones, ))
+        ])
+    
+    @classmethod
+    def decode_matrices(cls, data):
+        output = np.zeros(data.shape[:-1] + (4, 4), dtype=np.float32)
+        output[..., :3, :] = data[..., cls.MATRIX_LAYOUT]
+        output[..., 3, 3] = 1
+
+        return output
+    
+    @classmethod
+    def encode_matrices(cls, matrices):
+        output = np.zeros(matrices.shape[:-2] + (12, ), dtype=np.float32)
+        output[..., cls.MATRIX_LAYOUT] = matrices[..., :3, :]
+
+        return output
+    
+    # The ASCIIZ name fields may contain garbage after the terminator,
+    # that has to be cleared before the fields can be compared.
+    @staticmethod
+    def clear_bone_fields(fields):
+        raw = fields.copy().view(np.uint8).reshape(fields.shape + (32, ))
+        terminated = raw == 0
+        if not np.all(np.any(terminated, axis=-1)):
+            raise ValueError("ASCIIZ field length overflow")
+        
+        raw[np.logical_or.accumulate(terminated, axis=-1)] = 0
+
+        return raw.view("S32").reshape(fields.shape)
+    
+    # In most files the transforms follow the order of the bone list in every frame,
+    # in which case the names are not stored separately.
+    def decode_bone_fields(self, fields):
+        if fields.size == 0:
+            return None
+        
+        fields = np.ascontiguousarray(fields)
+        if not np.all(fields.view(np.uint64) == fields[:1].view(np.uint64)):
+            return self.clear_bone_fields(fields)
+        
+        names = self.clear_bone_fields(fields[0])
+        if [name.decode('utf8', errors="replace") for name in names.tolist()] == self.bones:
+            return None
+        
+        return np.broadcast_to(names, fields.shape).copy()
     
     @classmethod
     def read(cls, file, skip_signature = False):
@@ -133,7 +251,12 @@ class RTM_0101():
         count_frames, count_bones = binary.read_ulongs(file, 2)
         
         output.bones = [binary.read_asciiz_field(file, 32) for i in range(count_bones)]
-        output.frames = [RTM_Frame.read(file, count_bones) for i in range(count_frames)]
+
+        # The frames are fixed length records, so they can be read in one go.
+        records = binary.read_array(file, output.get_dtype_frame(count_bones), count_frames)
+        output.phases = records["phase"].copy()
+        output.matrices = cls.decode_matrices(records["transforms"]["data"])
+        output.frame_bones = output.decode_bone_fields(records["transforms"]["bone"])
 
         return output
     
@@ -141,16 +264,27 @@ class RTM_0101():
         file.write(self.signature)
         binary.write_float(file, self.motion[0], self.motion[2], self.motion[1])
 
-        count_frames = len(self.frames)
+        count_frames = self.count_frames
         count_bones = len(self.bones)
+        matrices = np.asarray(self.matrices, dtype=np.float32)
+        if count_frames > 0 and matrices.shape[:2] != (count_frames, count_bones):
+            raise RTM_Error("Transform data does not match the frame and bone counts (expected: %s, got: %s)" % ((count_frames, count_bones), matrices.shape[:2]))
 
         binary.write_ulong(file, count_frames, count_bones)
 
         for item in self.bones:
             binary.write_asciiz_field(file, item, 32)
         
-        for item in self.frames:
-            item.write(file)
+        records = np.zeros(count_frames, dtype=self.get_dtype_frame(count_bones))
+        records["phase"] = self.phases
+        if self.frame_bones is None:
+            records["transforms"]["bone"] = self.encode_bones(self.bones, (count_bones, ))
+        else:
+            records["transforms"]["bone"] = self.frame_bones
+        
+        records["transforms"]["data"] = self.encode_matrices(matrices)
+
+        file.write(records.view(np.uint8))
     
     # While the game engine itself seems to be not case sensitive,
     # some tools (eg.: animation preview in Object Builder, the preview would
@@ -160,9 +294,21 @@ class RTM_0101():
     def force_lowercase(self):
         self.bones = [bone.lower() for bone in self.bones]
 
-        for frame in self.frames:
-            for trans in frame.transforms:
-                trans.bone = trans.bone.lower()
+        if self.frame_bones is not None:
+            self.frame_bones = np.char.lower(self.frame_bones)
+
+
+# Columnar representation of the animation properties (phase, name, value) for the parse cache.
+def get_props_arrays(items):
+    return {
+        "prop_phases": np.array([item[0] for item in items], dtype=np.float64),
+        "prop_names": np.array([item[1] for item in items], dtype=str),
+        "prop_values": np.array([item[2] for item in items], dtype=str)
+    }
+
+
+def get_props_items(arrays):
+    return list(zip(arrays["prop_phases"].tolist(), arrays["prop_names"].tolist(), arrays["prop_values"].tolist()))
 
 
 class RTM_File():
@@ -189,11 +335,43 @@ class RTM_File():
     @classmethod
     def read_file(cls, filepath):
         output = None
-        with open(filepath, "br") as file:
+        with binary.MappedReader(filepath) as file:
             output = cls.read(file)
 
         return output
     
+    def get_arrays(self):
+        rtm_0101 = self.anim
+        arrays = {
+            "format": np.array("RTM"),
+            "has_props": np.array(self.props is not None),
+            "motion": np.array(rtm_0101.motion, dtype=np.float64),
+            "bones": np.array(rtm_0101.bones, dtype=str),
+            "phases": rtm_0101.phases,
+            "matrices": rtm_0101.matrices,
+            **get_props_arrays(self.props.items if self.props else [])
+        }
+        if rtm_0101.frame_bones is not None:
+            arrays["frame_bones"] = rtm_0101.frame_bones
+
+        return arrays
+    
+    @classmethod
+    def from_arrays(cls, arrays):
+        output = cls()
+        if arrays["has_props"]:
+            output.props = RTM_MDAT()
+            output.props.items = get_props_items(arrays)
+        
+        rtm_0101 = output.anim
+        rtm_0101.motion = tuple(arrays["motion"].tolist())
+        rtm_0101.bones = arrays["bones"].tolist()
+        rtm_0101.phases = arrays["phases"]
+        rtm_0101.matrices = arrays["matrices"]
+        rtm_0101.frame_bones = arrays.get("frame_bones")
+
+        return output
+    
     def write(self, file):
         if self.props:
             self.props.write(file)
@@ -230,8 +408,145 @@ class BMTR_Prop:
 
         return output
 
+    def write(self, file):
+        binary.write_ulong(file, 0)
+        binary.write_asciiz(file, self.name)
+        binary.write_float(file, self.phase)
+        binary.write_asciiz(file, self.value)
+
     def as_rtm(self):
         return (self.phase, self.name, self.value)
+    
+    @classmethod
+    def from_rtm(cls, item):
+        output = cls()
+        output.phase, output.name, output.value = item
+
+        return output
+
+
+# The BMTR format stores quaternions and offsets instead of full transformation matrices,
+# so the matrices need to be reconstructed. Since the Arma 3 uses a left handed coordinate system
+# with Y axis up, the order of some components, and some signs need to be swapped around.
+# Formulas to convert a right-handed quaternion to matrix representation:
+# https://www.euclideanspace.com/maths/geometry/rotations/conversions/quaternionToMatrix/index.htm
+# The conversion is done for arbitrary shaped arrays of transforms at once (eg.: frames x bones).
+def bmtr_to_matrices(quaternions, locations):
+    qx, qz, qy, qw = np.moveaxis(np.asarray(quaternions, dtype=np.float64), -1, 0)
+    x, y, z = np.moveaxis(np.asarray(locations, dtype=np.float64), -1, 0)
+
+    tx, ty, tz = 2*qx, 2*qy, 2*qz
+    xx, yy, zz = tx*qx, ty*qy, tz*qz
+    xy, xz, yz = tx*qy, tx*qz, ty*qz
+    xw, yw, zw = tx*qw, ty*qw, tz*qw
+
+    output = np.zeros(qx.shape + (4, 4))
+    output[..., 0, 0] = 1 - yy - zz
+    output[..., 0, 1] = xy - zw
+    output[..., 0, 2] = -(xz + yw)
+    output[..., 0, 3] = x
+
+    output[..., 1, 0] = xy + zw
+    output[..., 1, 1] = 1 - xx - zz
+    output[..., 1, 2] = -(yz - xw)
+    output[..., 1, 3] = y
+
+    output[..., 2, 0] = -(xz - yw)
+    output[..., 2, 1] = -(yz + xw)
+    output[..., 2, 2] = 1 - xx - yy
+    output[..., 2, 3] = z
+
+    output[..., 3, 3] = 1
+
+    return output
+
+
+# Groups the bones into hierarchy levels. Bones without a known parent are on the first level,
+# their children on the second, and so on. Each level is returned as a pair of bone and parent index arrays.
+def bmtr_bone_levels(bones, bone_parents):
+    lookup = {bone: i for i, bone in enumerate(bones)}
+    parents = {}
+    for bone, parent in bone_parents.items():
+        index = lookup.get(bone)
+        if index is not None:
+            parents[index] = lookup.get(parent)
+
+    depths = {}
+    for index in parents:
+        chain = []
+        current = index
+        while current is not None and current not in depths and current not in chain:
+            chain.append(current)
+            current = parents.get(current)
+        
+        # Broken (cyclic) hierarchies are cut where the cycle closes.
+        depth = depths.get(current, -1)
+        for item in reversed(chain):
+            depth += 1
+            depths[item] = depth
+
+    levels = [([], []) for i in range(max(depths.values(), default=0) + 1)]
+    for index, depth in depths.items():
+        if depth > 0:
+            levels[depth][0].append(index)
+            levels[depth][1].append(parents[index])
+    
+    return [(np.array(children, dtype=np.int64), np.array(parents, dtype=np.int64)) for children, parents in levels[1:]]
+
+
+# The transformations stored in the BMTR format are not absolute like in plain RTM, but relative to the parent
+# bones instead. To get the absolute transformation, the matrix of each bone has to be multiplied with the matrix
+# of its parent. To get the correct results, the multiplication must be done in hierarchical order.
+# All bones of a hierarchy level are processed together, for all frames at once (matrices: frames x bones x 4 x 4).
+def bmtr_compose_hierarchy(matrices, bones, bone_parents):
+    for children, parents in bmtr_bone_levels(bones, bone_parents):
+        matrices[:, children] = matrices[:, parents] @ matrices[:, children]
+
+    return matrices
+
+
+# Inverse of the hierarchy composition, the absolute transformations are made relative to the parent bones.
+def bmtr_decompose_hierarchy(matrices, bones, bone_parents):
+    output = matrices.copy()
+    for children, parents in bmtr_bone_levels(bones, bone_parents):
+        output[:, children] = np.linalg.inv(matrices[:, parents]) @ matrices[:, children]
+
+    return output
+
+
+# Inverse of the matrix reconstruction. The rotation is extracted from the normalized
+# basis vectors (BMTR cannot store scaling), and converted to a quaternion with the
+# numerically stable method, choosing the formula by the largest diagonal component.
+# https://www.euclideanspace.com/maths/geometry/rotations/conversions/matrixToQuaternion/index.htm
+def matrices_to_bmtr(matrices):
+    rotation = matrices[..., :3, :3] * np.array([[1, 1, -1], [1, 1, -1], [-1, -1, 1]])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rotation = rotation / np.linalg.norm(rotation, axis=-2, keepdims=True)
+    
+    rotation = np.nan_to_num(rotation)
+    r00, r01, r02 = np.moveaxis(rotation[..., 0, :], -1, 0)
+    r10, r11, r12 = np.moveaxis(rotation[..., 1, :], -1, 0)
+    r20, r21, r22 = np.moveaxis(rotation[..., 2, :], -1, 0)
+
+    candidates = np.zeros((4, ) + r00.shape + (4, ))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = np.sqrt(np.maximum(1 + r00 + r11 + r22, 0)) * 2
+        candidates[0] = np.stack(((r21 - r12) / s, (r02 - r20) / s, (r10 - r01) / s, s / 4), axis=-1)
+        s = np.sqrt(np.maximum(1 + r00 - r11 - r22, 0)) * 2
+        candidates[1] = np.stack((s / 4, (r01 + r10) / s, (r02 + r20) / s, (r21 - r12) / s), axis=-1)
+        s = np.sqrt(np.maximum(1 + r11 - r00 - r22, 0)) * 2
+        candidates[2] = np.stack(((r01 + r10) / s, s / 4, (r12 + r21) / s, (r02 - r20) / s), axis=-1)
+        s = np.sqrt(np.maximum(1 + r22 - r00 - r11, 0)) * 2
+        candidates[3] = np.stack(((r02 + r20) / s, (r12 + r21) / s, s / 4, (r10 - r01) / s), axis=-1)
+
+    choice = np.argmax(np.stack((r00 + r11 + r22, r00, r11, r22)), axis=0)
+    qx, qy, qz, qw = np.moveaxis(np.take_along_axis(candidates, choice[None, ..., None], axis=0)[0], -1, 0)
+    
+    # Quaternions q and -q represent the same rotation, the one with positive W is kept.
+    sign = np.where(qw < 0, -1, 1)
+    quaternions = np.stack((qx, qz, qy, qw), axis=-1) * sign[..., None]
+
+    return quaternions, matrices[..., :3, 3].copy()
 
 
 class BMTR_Transform:
@@ -249,35 +564,10 @@ class BMTR_Transform:
 
         return output
 
-    # The BMTR format stores quaternions and offsets instead of full transformation matrices,
-    # so the matrices need to be reconstructed. Since the Arma 3 uses a left handed coordinate system
-    # with Y axis up, the order of some components, and some signs need to be swapped around.
-    # Formulas to convert a right-handed quaternion to matrix representation:
-    # https://www.euclideanspace.com/maths/geometry/rotations/conversions/quaternionToMatrix/index.htm
     def as_rtm(self, bone):
         output = RTM_Transform()
         output.bone = bone
-        qx, qz, qy, qw = self.quaternion
-        x, y, z = self.location
-
-        r00 = 1 - 2*qy**2 - 2*qz**2
-        r01 = 2*qx*qy - 2*qz*qw
-        r02 = 2*qx*qz + 2*qy*qw
-
-        r10 = 2*qx*qy + 2*qz*qw
-        r11 = 1 - 2*qx**2 - 2*qz**2
-        r12 = 2*qy*qz - 2*qx*qw
-
-        r20 = 2*qx*qz - 2*qy*qw
-        r21 = 2*qy*qz + 2*qx*qw
-        r22 = 1 - 2*qx**2 - 2*qy**2
-        
-        output.matrix = [
-            [r00, r01, -r02, x],
-            [r10, r11, -r12, y],
-            [-r20, -r21, r22, z],
-            [0, 0, 0, 1]
-        ]
+        output.matrix = bmtr_to_matrices(self.quaternion, self.location).tolist()
 
         return output
 
@@ -297,23 +587,16 @@ class BMTR_Frame:
         output = RTM_Frame()
         output.phase = phase
 
-        transform_lookup = {}
-        for bone, transform in zip(bones, self.transforms):
-            rtm_transform = transform.as_rtm(bone)
-            output.transforms.append(rtm_transform)
-            transform_lookup[bone] = rtm_transform
-        
-        # The transformations stored in the BMTR format are not absolute like in plain RTM, but relative to the parent
-        # bones instead. To get the absolute transformation, the matrix of each bone has to be multiplied with the matrix
-        # of its parent. To get the correct results, the multiplication must be done in hierarchical order.
-        default = RTM_Transform()
-        for bone in bone_parents:
-            rtm_transform = transform_lookup.get(bone)
-            if not rtm_transform:
-                continue
-            rtm_transform_parent = transform_lookup.get(bone_parents[bone], default)
-            absolute_matrix = np.matrix(rtm_transform_parent.matrix) @ np.matrix(rtm_transform.matrix)
-            rtm_transform.matrix = absolute_matrix.tolist()
+        quaternions = np.reshape([transform.quaternion for transform in self.transforms], (1, -1, 4))
+        locations = np.reshape([transform.location for transform in self.transforms], (1, -1, 3))
+        matrices = bmtr_to_matrices(quaternions, locations)
+        bmtr_compose_hierarchy(matrices, bones[:matrices.shape[1]], bone_parents)
+
+        for bone, matrix in zip(bones, matrices[0].tolist()):
+            transform = RTM_Transform()
+            transform.bone = bone
+            transform.matrix = matrix
+            output.transforms.append(transform)
 
         return output
 
@@ -321,6 +604,8 @@ class BMTR_Frame:
 class BMTR_File:
     signature = b"BMTR"
     versions = {3, 4, 5}
+    # Transforms are stored as quaternions (normalized to 16384) and half precision offsets in XZY order.
+    dtype_transform = np.dtype([("quaternion", "<i2", 4), ("location", "<f2", 3)])
 
     def __init__(self):
         self.source = ""
@@ -328,55 +613,91 @@ class BMTR_File:
         self.motion = (0, 0, 0)
         self.bones = []
         self.props = []
-        self.phases = []
-        self.frames = []
+        self.phases = np.zeros(0, dtype=np.float32) # (frames, )
+        self.transforms = np.zeros((0, 0), dtype=self.dtype_transform) # (frames, bones) raw transform records
     
-    def read_frame_phases(self, file, count_frames):
-        expected = count_frames * 4
-        compressed = expected >= 1024
-        if self.version > 4:
-            compressed = binary.read_bool(file)
-        
+    @property
+    def count_frames(self):
+        return len(self.transforms)
+    
+    # Compatibility view of the transform data as BMTR_Frame and BMTR_Transform objects.
+    # The objects are created on every access, so modifying them has no effect,
+    # the updated list has to be assigned back to the property.
+    @property
+    def frames(self):
+        quaternions, locations = self.get_transform_arrays()
         output = []
+        for frame_quaternions, frame_locations in zip(quaternions.tolist(), locations.tolist()):
+            frame = BMTR_Frame()
+            for quaternion, location in zip(frame_quaternions, frame_locations):
+                transform = BMTR_Transform()
+                transform.quaternion = tuple(quaternion)
+                transform.location = tuple(location)
+                frame.transforms.append(transform)
+            
+            output.append(frame)
+
+        return output
+    
+    @frames.setter
+    def frames(self, frames):
+        count_bones = len(frames[0].transforms) if len(frames) > 0 else len(self.bones)
+        for i, frame in enumerate(frames):
+            if len(frame.transforms) != count_bones:
+                raise BMTR_Error("Transform count mismatch in frame %d (expected: %d, got: %d)" % (i, count_bones, len(frame.transforms)))
+        
+        quaternions = np.reshape([[transform.quaternion for transform in frame.transforms] for frame in frames], (len(frames), count_bones, 4))
+        locations = np.reshape([[transform.location for transform in frame.transforms] for frame in frames], (len(frames), count_bones, 3))
+        self.set_transform_arrays(quaternions, locations)
+    
+    # Compressed and uncompressed data blocks are read straight into the destination buffer.
+    def read_block(self, file, buffer, compressed):
+        expected = len(buffer)
         if compressed:
             try:
-                _, uncompressed = lzo1x_decompress(file, expected)
+                lzo1x_decompress(file, expected, buffer)
             except LZO_Error as ex:
                 raise BMTR_Error(str(ex))
             
-            buffer = BufferedReader(BytesIO(uncompressed))
-            output = [binary.read_float(buffer) for i in range(count_frames)]
-            if buffer.read() != b"":
-                raise BMTR_Error("Decompressed data is longer than expected")
-        else:
-            output = [binary.read_float(file) for i in range(count_frames)]
+            return
         
-        return output
+        data = file.read(expected)
+        if len(data) != expected:
+            raise EOFError("Data block ran into unexpected EOF")
+        
+        buffer[:] = data
+
+    def read_frame_phases(self, file, count_frames):
+        expected = count_frames * 4
+        compressed = expected >= 1024
+        if self.version > 4:
+            compressed = binary.read_bool(file)
+        
+        buffer = bytearray(expected)
+        self.read_block(file, memoryview(buffer), compressed)
+        
+        return np.frombuffer(buffer, dtype="<f4", count=count_frames)
 
+    # The transforms of all frames are decoded into a single preallocated buffer,
+    # that is interpreted as an array of transform records at the end.
     def read_frames(self, file, count_frames, count_bones):
-        output = []
+        stride = count_bones * self.dtype_transform.itemsize
+        buffer = bytearray(count_frames * stride)
+        view = memoryview(buffer)
         for i in range(count_frames):
-            count_bones = binary.read_ulong(file)
+            count_bones_frame = binary.read_ulong(file)
+            if count_bones_frame != count_bones:
+                raise BMTR_Error("Bone count mismatch in frame %d (expected: %d, got: %d)" % (i, count_bones, count_bones_frame))
 
-            expected = count_bones * 14
-            compressed = expected >= 1024
+            compressed = stride >= 1024
             if self.version > 4:
                 compressed = binary.read_bool(file)
+            
+            self.read_block(file, view[(i * stride):((i + 1) * stride)], compressed)
+        
+        view.release()
 
-            if compressed:
-                try:
-                    _, uncompressed = lzo1x_decompress(file, expected)
-                except LZO_Error as ex:
-                    raise BMTR_Error(str(ex))
-                
-                buffer = BufferedReader(BytesIO(uncompressed))
-                output.append(BMTR_Frame.read(buffer, count_bones))
-                if buffer.read() != b"":
-                    raise BMTR_Error("Decompressed data is longer than expected")
-            else:
-                output.append(BMTR_Frame.read(file, count_bones))
-
-        return output
+        return np.frombuffer(buffer, dtype=self.dtype_transform, count=count_frames * count_bones).reshape((count_frames, count_bones))
 
     @classmethod
     def read(cls, file):
@@ -413,7 +734,7 @@ class BMTR_File:
             raise BMTR_Error("Frame count mismatch (expected: %d, got: %d)" % (count_frames, count_frames_check))
         
         output.phases = output.read_frame_phases(file, count_frames)
-        output.frames = output.read_frames(file, count_frames, count_bones)
+        output.transforms = output.read_frames(file, count_frames, count_bones)
         
         remainder = file.read()
         if remainder != b"":
@@ -424,13 +745,50 @@ class BMTR_File:
     @classmethod
     def read_file(cls, filepath):
         output = None
-        with open(filepath, "br") as file:
+        with binary.MappedReader(filepath) as file:
             output = cls.read(file)
         
         output.source = filepath
         
         return  output
     
+    def get_arrays(self):
+        return {
+            "format": np.array("BMTR"),
+            "version": np.array(self.version, dtype=np.uint32),
+            "motion": np.array(self.motion, dtype=np.float64),
+            "bones": np.array(self.bones, dtype=str),
+            "phases": np.asarray(self.phases, dtype=np.float32),
+            "transforms": self.transforms,
+            **get_props_arrays([prop.as_rtm() for prop in self.props])
+        }
+    
+    @classmethod
+    def from_arrays(cls, arrays):
+        output = cls()
+        output.version = int(arrays["version"])
+        output.motion = tuple(arrays["motion"].tolist())
+        output.bones = arrays["bones"].tolist()
+        output.props = [BMTR_Prop.from_rtm(item) for item in get_props_items(arrays)]
+        output.phases = arrays["phases"]
+        output.transforms = arrays["transforms"]
+
+        return output
+    
+    # Transform data of all frames as (frames x bones x 4) quaternion and (frames x bones x 3) location arrays.
+    def get_transform_arrays(self):
+        quaternions = self.transforms["quaternion"] / 16384
+        x, z, y = np.moveaxis(self.transforms["location"].astype(np.float64), -1, 0)
+
+        return quaternions, np.stack((-x, -y, z), axis=-1)
+    
+    def set_transform_arrays(self, quaternions, locations):
+        x, y, z = np.moveaxis(locations, -1, 0)
+
+        self.transforms = np.zeros(quaternions.shape[:-1], dtype=self.dtype_transform)
+        self.transforms["quaternion"] = np.clip(np.round(quaternions * 16384), -32768, 32767)
+        self.transforms["location"] = np.stack((-x, z, -y), axis=-1)
+
     def as_rtm(self, bone_parents):
         output = RTM_File()
         output.source = self.source
@@ -445,25 +803,130 @@ class BMTR_File:
         case_lookup = {bone.lower(): bone for bone in bone_parents}
         rtm_0101.bones = [case_lookup.get(bone.lower(), bone) for bone in self.bones]
 
-        for phase, frame in zip(self.phases, self.frames):
-            rtm_0101.frames.append(frame.as_rtm(phase, rtm_0101.bones, bone_parents))
+        quaternions, locations = self.get_transform_arrays()
+        matrices = bmtr_to_matrices(quaternions, locations)
+        bmtr_compose_hierarchy(matrices, rtm_0101.bones, bone_parents)
+
+        rtm_0101.phases = np.array(self.phases, dtype=np.float32)
+        rtm_0101.matrices = matrices.astype(np.float32)
+
+        return output
+
+    # Plain RTM animations can be binarized with the same bone hierarchy that is used to convert BMTR to RTM.
+    @classmethod
+    def from_rtm(cls, rtm_data, bone_parents, version = 5):
+        output = cls()
+        output.source = rtm_data.source
+        output.version = version
+
+        rtm_0101 = rtm_data.anim
+        output.motion = tuple(rtm_0101.motion)
+        output.bones = list(rtm_0101.bones)
+        if rtm_data.props:
+            output.props = [BMTR_Prop.from_rtm(item) for item in rtm_data.props.items]
+        
+        output.phases = np.array(rtm_0101.phases, dtype=np.float32)
+        matrices = np.array(rtm_0101.matrices, dtype=np.float64)
+
+        # BMTR frames always follow the order of the bone list.
+        if rtm_0101.frame_bones is not None:
+            lookup = {bone.lower(): i for i, bone in enumerate(output.bones)}
+            ordered = np.zeros_like(matrices)
+            for i, bones in enumerate(rtm_0101.get_frame_bones()):
+                try:
+                    order = [lookup[bone.lower()] for bone in bones]
+                except KeyError as ex:
+                    raise BMTR_Error("Unknown bone in frame %d: %s" % (i, ex.args[0]))
+                
+                ordered[i, order] = matrices[i]
+            
+            matrices = ordered
+
+        case_lookup = {bone.lower(): bone for bone in bone_parents}
+        bones = [case_lookup.get(bone.lower(), bone) for bone in output.bones]
+        
+        quaternions, locations = matrices_to_bmtr(bmtr_decompose_hierarchy(matrices, bones, bone_parents))
+        output.set_transform_arrays(quaternions, locations)
 
         return output
+    
+    # Blocks above the size threshold are compressed (in version 5 the compression is flagged explicitly,
+    # in version 4 it is implied by the size of the block).
+    def write_block(self, file, data):
+        compressed = len(data) >= 1024
+        if self.version > 4:
+            binary.write_bool(file, compressed)
+        
+        if compressed:
+            data = lzo1x_compress(data)
+        
+        file.write(data)
 
+    # The purpose of the unknown fields is not known, they are written as zeros.
+    # Version 4 files do not store the properties.
     def write(self, file):
-        raise BMTR_Error("BMTR output is not supported, use plain RTM instead")
+        if self.version not in {4, 5}:
+            raise BMTR_Error("Unsupported output version: %s" % self.version)
+        
+        count_frames, count_bones = self.transforms.shape
+        if count_bones != len(self.bones) and count_frames > 0:
+            raise BMTR_Error("Bone count mismatch (expected: %d, got: %d)" % (len(self.bones), count_bones))
+        if len(self.phases) != count_frames:
+            raise BMTR_Error("Frame count mismatch (expected: %d, got: %d)" % (count_frames, len(self.phases)))
+        
+        count_bones = len(self.bones)
+
+        file.write(self.signature)
+        binary.write_ulong(file, self.version)
+        binary.write_byte(file, 0)
+        binary.write_float(file, self.motion[0], self.motion[2], self.motion[1])
+        binary.write_ulong(file, count_frames, 0, count_bones, count_bones)
+
+        for bone in self.bones:
+            binary.write_asciiz(file, bone)
+        
+        if self.version > 4:
+            binary.write_ulong(file, 0, len(self.props))
+            for prop in self.props:
+                prop.write(file)
+        
+        binary.write_ulong(file, count_frames)
+        self.write_block(file, np.asarray(self.phases, dtype="<f4").tobytes())
+
+        for frame in self.transforms:
+            binary.write_ulong(file, count_bones)
+            self.write_block(file, frame.tobytes())
 
     def write_file(self, filepath):
-        self.write(None)
+        with open(filepath, "wb") as file:
+            self.write(file)
 
 
 def read_rtm_universal(file):
+    # Files opened from disk can be looked up in the parse cache.
+    filepath = getattr(file, "name", None)
+    if not isinstance(filepath, str):
+        filepath = None
+    
+    if filepath:
+        arrays = parse_cache.load("RTM", filepath)
+        if arrays is not None:
+            if str(arrays["format"]) == "BMTR":
+                return BMTR_File.from_arrays(arrays)
+            
+            return RTM_File.from_arrays(arrays)
+
     signature = file.read(4)
     file.seek(0)
 
     if signature == b"BMTR":
-        return BMTR_File.read(file)
+        output = BMTR_File.read(file)
     elif signature == b"RTM_":
-        return RTM_File.read(file)
+        output = RTM_File.read(file)
     else:
         raise ValueError("File is not a valid RTM file.")
+    
+    if filepath and parse_cache.is_enabled():
+        parse_cache.store("RTM", filepath, output.get_arrays())
+    
+    return output
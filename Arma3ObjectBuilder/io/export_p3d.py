@@ -5,12 +5,15 @@
 
 import time
 import re
+import hashlib
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 import bpy
-import bmesh
+import numpy as np
 
 from . import data_p3d as p3d
+from . import parse_cache
 from ..utilities import generic as utils
 from ..utilities import flags as flagutils
 from ..utilities import compat as computils
@@ -20,6 +23,10 @@ from ..utilities.logger import ProcessLogger, ProcessLoggerNull
 from ..utilities.validator import Validator
 
 
+# Serialized LODs of the previously exported objects, keyed by their fingerprints.
+lod_cache = parse_cache.MemoryCache(256 * 1024 * 1024)
+
+
 # Simple check to not even start the export if there are
 # no LOD objects in the scene.
 def can_export(operator, context):
@@ -318,23 +325,168 @@ def temporary_component(operator, obj):
             obj.vertex_groups.remove(temporary_component)
 
 
+# Top level LOD objects to export.
+def get_export_objects(operator, context):
+    export_objects = context.scene.objects
+
+    if operator.use_selection:
+        export_objects = context.selected_objects
+    
+    objects = []
+    for obj in export_objects:
+        if operator.visible_only and not obj.visible_get():
+            continue
+
+        if obj.type != 'MESH' or not obj.a3ob_properties_object.is_a3_lod or obj.parent != None:
+            continue
+
+        objects.append(obj)
+    
+    return objects
+
+
+# Export settings that affect the produced LOD data.
+FINGERPRINT_SETTINGS = (
+    "relative_paths",
+    "preserve_normals",
+    "validate_meshes",
+    "apply_transforms",
+    "apply_modifiers",
+    "sort_sections",
+    "validate_lods",
+    "validate_lods_warning_errors",
+    "renumber_components",
+    "force_lowercase",
+    "translate_selections",
+    "generate_components"
+)
+# Add-on preferences that affect the produced LOD data.
+FINGERPRINT_PREFERENCES = (
+    "project_root",
+    "flag_vertex",
+    "flag_face"
+)
+
+
+def hash_array(hasher, collection, attribute, count, dtype):
+    values = np.empty(count, dtype=dtype)
+    collection.foreach_get(attribute, values)
+    hasher.update(values.tobytes())
+
+
+# Custom property groups are hashed generically through their RNA definitions,
+# so new properties are automatically taken into account.
+def hash_properties(hasher, props):
+    for prop in props.bl_rna.properties:
+        if prop.identifier == "rna_type":
+            continue
+
+        value = getattr(props, prop.identifier)
+        if prop.type == 'COLLECTION':
+            hasher.update(b"[%d]" % len(value))
+            for item in value:
+                hash_properties(hasher, item)
+        elif prop.type == 'POINTER':
+            if isinstance(value, bpy.types.PropertyGroup):
+                hash_properties(hasher, value)
+            else:
+                hasher.update(repr(getattr(value, "name", None)).encode())
+        elif getattr(prop, "array_length", 0) > 0:
+            hasher.update(repr(tuple(value)).encode())
+        elif isinstance(value, set):
+            hasher.update(repr(sorted(value)).encode())
+        else:
+            hasher.update(repr(value).encode())
+
+
+def hash_mesh(hasher, mesh, count_groups):
+    count_verts = len(mesh.vertices)
+    count_edges = len(mesh.edges)
+    count_loops = len(mesh.loops)
+    count_faces = len(mesh.polygons)
+    hasher.update(b"%d %d %d %d" % (count_verts, count_edges, count_loops, count_faces))
+
+    hash_array(hasher, mesh.vertices, "co", count_verts * 3, np.float32)
+    hash_array(hasher, mesh.edges, "vertices", count_edges * 2, np.int32)
+    hash_array(hasher, mesh.edges, "use_edge_sharp", count_edges, bool)
+    hash_array(hasher, mesh.loops, "vertex_index", count_loops, np.int32)
+    hash_array(hasher, mesh.polygons, "loop_start", count_faces, np.int32)
+    hash_array(hasher, mesh.polygons, "material_index", count_faces, np.int32)
+    hash_array(hasher, mesh.polygons, "use_smooth", count_faces, bool)
+
+    for layer in mesh.uv_layers:
+        hasher.update(layer.name.encode())
+        hash_array(hasher, layer.data, "uv", count_loops * 2, np.float32)
+
+    if mesh.has_custom_normals:
+        hasher.update(computils.mesh_loop_normals(mesh).tobytes())
+    
+    hasher.update(flagutils.get_values_flags_vertex(mesh).tobytes())
+    hasher.update(flagutils.get_values_flags_face(mesh).tobytes())
+
+    masses = computils.mesh_get_attribute(mesh, "a3ob_mass", 'FLOAT', 'POINT')
+    if masses is not None:
+        hasher.update(masses.tobytes())
+    
+    hasher.update(b"groups")
+    for values in get_vertex_weights(mesh, count_groups):
+        hasher.update(values.tobytes())
+
+
+def hash_object(hasher, obj, depsgraph, relative):
+    hasher.update(repr([tuple(row) for row in obj.matrix_world]).encode())
+    hasher.update(repr([group.name for group in obj.vertex_groups]).encode())
+
+    for slot in obj.material_slots:
+        mat = slot.material
+        hasher.update(repr(mat.a3ob_properties_material.to_p3d(relative) if mat else None).encode())
+
+    hash_properties(hasher, obj.a3ob_properties_object)
+    hash_properties(hasher, obj.a3ob_properties_object_flags)
+    hash_properties(hasher, obj.a3ob_properties_object_proxy)
+    hasher.update(repr(obj.a3ob_selection_mass).encode())
+
+    if depsgraph and obj.modifiers:
+        obj_eval = obj.evaluated_get(depsgraph)
+        hash_mesh(hasher, obj_eval.to_mesh(), len(obj.vertex_groups))
+        obj_eval.to_mesh_clear()
+    else:
+        hash_mesh(hasher, obj.data, len(obj.vertex_groups))
+
+
+# Fingerprint of all the data that goes into the LODs produced from a top level
+# LOD object (including its sub-objects, proxies and LOD copies). If the fingerprint
+# of an object did not change since the last export, the previously serialized
+# LODs can be reused.
+def get_fingerprint(operator, context, obj):
+    hasher = hashlib.sha1()
+    hasher.update(repr([getattr(operator, name) for name in FINGERPRINT_SETTINGS]).encode())
+    addon_prefs = utils.get_addon_preferences()
+    hasher.update(repr([getattr(addon_prefs, name) for name in FINGERPRINT_PREFERENCES]).encode())
+
+    depsgraph = context.evaluated_depsgraph_get() if operator.apply_modifiers else None
+    hash_object(hasher, obj, depsgraph, operator.relative_paths)
+    for child in obj.children:
+        if child.type != 'MESH':
+            continue
+        
+        hasher.update(b"child")
+        hash_object(hasher, child, depsgraph, operator.relative_paths)
+    
+    return hasher.hexdigest()
+
+
 # Huge monolith function to produce the final object and mesh data that can be written to the 
 # P3D file. Merges the sub-objects and proxies into the main objects, applies transformations,
 # runs mesh validation and sorts sections if necessary. Also processes the LOD copy directives.
 # [(LOD object 0, proxy lookup 0), (..., ....), ....]
-def get_lod_data(operator, context, validator, temp_collection):
-    scene = context.scene
-    export_objects = scene.objects
-
-    if operator.use_selection:
-        export_objects = context.selected_objects
+def get_lod_data(operator, context, validator, temp_collection, objects = None):
+    if objects is None:
+        objects = get_export_objects(operator, context)
 
     lod_list = []
 
-    for obj in [obj for obj in export_objects if not operator.visible_only or obj.visible_get()]:       
-        if obj.type != 'MESH' or not obj.a3ob_properties_object.is_a3_lod or obj.parent != None:
-            continue
-            
+    for obj in objects:
         # Some operator polls fail later if an object is in edit mode.
         if not obj.mode == 'OBJECT':
             computils.call_operator_ctx(bpy.ops.object.mode_set, {"active_object": obj}, mode='OBJECT')
@@ -393,36 +545,22 @@ def get_lod_data(operator, context, validator, temp_collection):
     return lod_list
 
 
-# Produce the vertex dictionary from the bmesh data.
-# {idx 0: (x, y, z, flag), ...: (..., ..., ..., ...), ...}
-def process_vertices(bm):
-    layer = flagutils.get_layer_flags_vertex(bm)
-
-    output = {}
+# Produce the vertex coordinate and flag arrays from the mesh data.
+def process_vertices(mesh):
+    coords = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", coords)
+    flags = flagutils.get_values_flags_vertex(mesh)
 
-    for vert in bm.verts:
-        output[vert.index] = (*vert.co, vert[layer])
-
-    return output
+    return coords.reshape((-1, 3)), flags.astype(np.uint32)
 
 
-# Produce the unique vertex normal dictionary from the bmesh data, as well as a mapping
-# dictionary.
-# {idx 0: (x, y, z), ...: (..., ..., ...), ....}
-# {loop idx 0: normal idx X, loop idx 1: normal idx Y, ...}
+# Produce the unique vertex normal array from the mesh data, as well as the
+# normal index of every loop. Normals are numbered in the order of their
+# first occurence (adding 0 merges the negative zero components).
 def process_normals(mesh):
-    output = {}
-    normals_index = {}
-    normals_lookup_dict = {}
-    
-    for i, normal in computils.mesh_static_normals_iterator(mesh):
-        if normal not in normals_index:
-            normals_index[normal] = len(normals_index)
-            output[len(output)] = normal
-        
-        normals_lookup_dict[i] = normals_index[normal]
+    normals = computils.mesh_loop_normals(mesh) + np.float32(0)
 
-    return output, normals_lookup_dict
+    return p3d.unique_by_first_occurence(normals, axis=0)
 
 
 # Produce material lookup dictionary from the materials assigned to the object.
@@ -440,59 +578,85 @@ def process_materials(obj, relative):
     return output
 
 
-# Produce the face data dictionary from the obj and  bmesh data.
-# {face 0: ([vert 0, vert 1, vert 2], [normal 0, normal 1, normal 2], [(uv 0 0, uv 0 1), (...), ...], texture, material, flag), ...}
-def process_faces(obj, bm, normals_lookup, relative):
-    output = {}
-    # Materials need to be precompiled to speed up the face access.
-    materials = process_materials(obj, relative)
+# Fill the face table of the LOD from the mesh data. The loop data is gathered
+# into the padded 4 point per face layout with the loops mask.
+def process_faces(lod, obj, mesh, loop_normals, relative):
+    count_faces = len(mesh.polygons)
+    loop_start = np.empty(count_faces, dtype=np.int32)
+    loop_total = np.empty(count_faces, dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    mesh.polygons.foreach_get("loop_total", loop_total)
 
-    uv_layer = None
-    if len(bm.loops.layers.uv.values()) > 0: # 1st UV set needs to be written into the face data section too
-        uv_layer = bm.loops.layers.uv.values()[0]
+    if np.any(loop_total > 4):
+        raise p3d.P3D_Error("Cannot export faces with more than 4 sides")
     
-    flag_layer = flagutils.get_layer_flags_face(bm)
-    
-    for face in bm.faces:
-        verts = []
-        normals = []
-        uvs = []
-
-        for loop in face.loops:
-            verts.append(loop.vert.index)
-            normals.append(normals_lookup[loop.index])
-            uvs.append((loop[uv_layer].uv[0], 1 - loop[uv_layer].uv[1]) if uv_layer else (0, 0))
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
 
-        output[face.index] = [verts, normals, uvs, *materials[face.material_index], face[flag_layer]]
+    lod.face_sides = loop_total.astype(np.uint32)
+    mask = lod.get_loops_mask()
+    loops = (loop_start[:, None] + np.arange(4))[mask]
 
-    return output
+    lod.face_verts = np.zeros((count_faces, 4), dtype=np.uint32)
+    lod.face_verts[mask] = loop_verts[loops]
+    lod.face_normals = np.zeros((count_faces, 4), dtype=np.uint32)
+    lod.face_normals[mask] = loop_normals[loops]
+    
+    # 1st UV set needs to be written into the face data section too
+    lod.face_uvs = np.zeros((count_faces, 4, 2), dtype=np.float32)
+    if len(mesh.uv_layers) > 0:
+        uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        mesh.uv_layers[0].data.foreach_get("uv", uvs)
+        lod.face_uvs[mask] = p3d.flip_uvs(uvs.reshape((-1, 2))[loops])
+    
+    lod.face_flags = flagutils.get_values_flags_face(mesh).astype(np.uint32)
 
+    # Materials are precompiled per slot, faces with invalid slot indices get the empty material.
+    lookup = {}
+    slot_materials = np.array([lookup.setdefault(pair, len(lookup)) for pair in process_materials(obj, relative).values()], dtype=np.uint32)
+    slot_indices = np.empty(count_faces, dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", slot_indices)
+    slot_indices[slot_indices >= len(slot_materials)] = 0
 
-def is_flat_shaded(bm):
-    for face in bm.faces:
-        if face.smooth:
-            return False
-    
-    return True
+    lod.materials = list(lookup)
+    lod.face_materials = slot_materials[slot_indices]
 
 
-def process_tagg_sharp(bm):
+# An edge is contiguous if it is shared by exactly 2 faces with the same winding,
+# meaning the loops of the 2 faces start from different vertices of the edge.
+def process_tagg_sharp(mesh):
     output = p3d.P3D_TAGG()
     output.name = "#SharpEdges#"
     output.data = p3d.P3D_TAGG_DataSharpEdges()
 
+    count_edges = len(mesh.edges)
+    edges = np.empty(count_edges * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    edges = edges.reshape((-1, 2))
+
+    loop_edges = np.empty(len(mesh.loops), dtype=np.int32)
+    loop_verts = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", loop_edges)
+    mesh.loops.foreach_get("vertex_index", loop_verts)
+
+    count_loops = np.bincount(loop_edges, minlength=count_edges)
+    count_starts = np.bincount(loop_edges, weights=loop_verts == edges[loop_edges, 0], minlength=count_edges)
+    contiguous = (count_loops == 2) & (count_starts == 1)
+
+    smooth = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", smooth)
+
     # For ease of use, the edges of flat shaded faces need to be exported as sharp as well.
     # Technically this creates fertile ground for mistakes, maybe it should be only done
     # if the whole mesh is flat shaded.
-    if is_flat_shaded(bm):
-        flat_face_edges = set()
-        for face in bm.faces:
-            if not face.smooth:
-                flat_face_edges.update({edge for edge in face.edges if edge.is_contiguous})
-        
-        output.data.edges = [(edge.verts[0].index, edge.verts[1].index) for edge in flat_face_edges]
+    if not np.any(smooth):
+        selected = contiguous
     else:
-        output.data.edges = [(edge.verts[0].index, edge.verts[1].index) for edge in bm.edges if not edge.smooth and edge.is_contiguous]
+        sharp = np.empty(count_edges, dtype=bool)
+        mesh.edges.foreach_get("use_edge_sharp", sharp)
+        selected = sharp & contiguous
+    
+    output.data.edges = [tuple(edge) for edge in edges[selected].tolist()]
 
     if len(output.data.edges) == 0:
         output.active = False
@@ -500,17 +664,14 @@ def process_tagg_sharp(bm):
     return output
 
 
-def process_tagg_uvset(bm, layer):
+def process_tagg_uvset(layer):
     output = p3d.P3D_TAGG()
     output.name = "#UVSet#"
     output.data = p3d.P3D_TAGG_DataUVSet()
-    uvs = {}
-
-    for face in bm.faces:
-        for loop in face.loops:
-            uvs[loop.index] = (loop[layer].uv[0], loop[layer].uv[1])
-
-    output.data.uvs = dict(sorted(uvs.items()))
+    
+    uvs = np.empty(len(layer.data) * 2, dtype=np.float32)
+    layer.data.foreach_get("uv", uvs)
+    output.data.uvs = p3d.flip_uvs(uvs)
 
     return output
 
@@ -525,56 +686,100 @@ def process_tagg_property(prop):
     return output
 
 
-def process_tagg_mass(bm, layer):
+def process_tagg_mass(masses):
     output = p3d.P3D_TAGG()
     output.name = "#Mass#"
     output.data = p3d.P3D_TAGG_DataMass()
-
-    for vert in bm.verts:
-        output.data.masses[vert.index] = vert[layer]
+    output.data.masses = masses
 
     return output
 
 
-def process_taggs_selections(obj, bm):
-    output = {}
+# Face membership of all selections in a single pass. The vertex-group membership
+# is given in CSR form (the groups of vertex i are groups[indptr[i]:indptr[i + 1]]).
+# Every loop is expanded to the groups of its vertex, and the (face, group) pairs
+# are counted: if all vertices of a face belong to a selection, then the face belongs
+# to the selection as well.
+# Returns the array of face indices for every group.
+def get_face_memberships(indptr, groups, face_verts, face_sides, count_groups):
+    mask = np.arange(4) < face_sides[:, None]
+    loop_faces = np.repeat(np.arange(len(face_sides), dtype=np.int64), face_sides)
+    loop_verts = face_verts[mask].astype(np.int64)
+
+    degrees = (indptr[1:] - indptr[:-1])[loop_verts]
+    total = int(degrees.sum())
+    offsets = np.repeat(indptr[loop_verts] - (np.cumsum(degrees) - degrees), degrees)
+    pair_groups = groups[offsets + np.arange(total, dtype=np.int64)]
+    pair_faces = np.repeat(loop_faces, degrees)
+
+    keys, counts = np.unique(pair_groups * len(face_sides) + pair_faces, return_counts=True)
+    keys = keys[counts == face_sides[keys % max(len(face_sides), 1)]]
+    
+    # Keys are sorted by group first, so the faces of each group form a contiguous block
+    bounds = np.searchsorted(keys, np.arange(count_groups + 1, dtype=np.int64) * len(face_sides))
+
+    return [keys[bounds[i]:bounds[i + 1]] % len(face_sides) for i in range(count_groups)]
+
+
+# The vertex group weights are not accessible in bulk (there is no foreach_get access to them),
+# so they are collected in a single pass over the vertices, into one flat list that is converted
+# to an array at once. The pass is skipped entirely if the object has no vertex groups.
+# Returns the vertex indices, group indices and weights of the assignments, in order of the vertices.
+def get_vertex_weights(mesh, count_groups):
+    if count_groups == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    
+    data = [value for vert in mesh.vertices for item in vert.groups for value in (vert.index, item.group, item.weight)]
+    data = np.array(data, dtype=np.float64).reshape((-1, 3))
+
+    return data[:, 0].astype(np.int64), data[:, 1].astype(np.int64), data[:, 2]
+
 
+# The vertex group weights are split up by group.
+def process_taggs_selections(obj, mesh, lod):
+    count_groups = len(obj.vertex_groups)
+    count_verts = len(mesh.vertices)
+    indices_vert, indices_group, weights = get_vertex_weights(mesh, count_groups)
+
+    valid = indices_group < count_groups
+    indices_vert = indices_vert[valid]
+    indices_group = indices_group[valid]
+    weights = weights[valid]
+
+    # The vertices are iterated in order, so the collected data is already in CSR form.
+    indptr = np.zeros(count_verts + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices_vert, minlength=count_verts), out=indptr[1:])
+    faces = get_face_memberships(indptr, indices_group, lod.face_verts, lod.face_sides.astype(np.int64), count_groups)
+
+    order = np.argsort(indices_group, kind="stable")
+    bounds = np.searchsorted(indices_group[order], np.arange(count_groups + 1))
+    
+    output = []
     for i, group in enumerate(obj.vertex_groups):
         new_tagg = p3d.P3D_TAGG()
         new_tagg.name = group.name
         new_tagg.data = p3d.P3D_TAGG_DataSelection()
-        new_tagg.data.count_verts = len(bm.verts)
-        new_tagg.data.count_faces = len(bm.faces)
-        output[i] = new_tagg
+        new_tagg.data.count_verts = count_verts
+        new_tagg.data.count_faces = len(mesh.polygons)
 
-    bm.verts.layers.deform.verify()
-    layer = bm.verts.layers.deform.active
+        members = order[bounds[i]:bounds[i + 1]]
+        new_tagg.data.set_weights_verts(indices_vert[members], weights[members])
+        new_tagg.data.set_weights_faces(faces[i], np.ones(len(faces[i])))
 
-    for vert in bm.verts:
-        for idx in vert[layer].keys():
-            output[idx].data.weight_verts[vert.index] = vert[layer][idx]
-    
-    # If all vertices of a face belong to a selection, then the face belongs to the 
-    # selection as well.
-    for face in bm.faces:
-        indices = [idx for vert in face.verts for idx in vert[layer].keys()]
-        unique = set(indices)
-        for idx in unique:
-            if indices.count(idx) == len(face.loops):
-                output[idx].data.weight_faces[face.index] = 1
+        output.append(new_tagg)
 
-    return output.values()
+    return output
 
 
-def process_taggs(obj, bm, logger):
+def process_taggs(obj, mesh, lod, logger):
     object_props = obj.a3ob_properties_object
-    taggs = [process_tagg_sharp(bm)]
+    taggs = [process_tagg_sharp(mesh)]
     if taggs[0].active:
         logger.log("Collected sharp edges")
 
     uv_index = 0
-    for layer in bm.loops.layers.uv.values():
-        uvset = process_tagg_uvset(bm, layer)
+    for layer in mesh.uv_layers:
+        uvset = process_tagg_uvset(layer)
         uvset.data.id = uv_index
         taggs.append(uvset)
         uv_index += 1
@@ -586,12 +791,12 @@ def process_taggs(obj, bm, logger):
 
     # Vertex mass should only be exported for the Geometry LOD
     if object_props.lod == str(p3d.P3D_LOD_Resolution.GEOMETRY):
-        layer = bm.verts.layers.float.get("a3ob_mass")
-        if layer:
-            taggs.append(process_tagg_mass(bm, layer))
+        masses = computils.mesh_get_attribute(mesh, "a3ob_mass", 'FLOAT', 'POINT')
+        if masses is not None:
+            taggs.append(process_tagg_mass(masses))
             logger.log("Collected vertex masses")
 
-    taggs.extend(process_taggs_selections(obj, bm))
+    taggs.extend(process_taggs_selections(obj, mesh, lod))
     logger.log("Collected selections")
 
     return taggs
@@ -602,6 +807,32 @@ def translate_selections(p3dm):
         tagg.name = data.translations_english_czech.get(tagg.name.lower(), tagg.name)
 
 
+def get_resolution(obj):
+    object_props = obj.a3ob_properties_object
+    resolution = p3d.P3D_LOD_Resolution()
+    lod_idx = int(object_props.lod)
+    if lod_idx != data.lod_unknown:
+        resolution.set(lod_idx, object_props.resolution)
+    else:
+        resolution.set(lod_idx, object_props.resolution_float)
+    
+    return resolution
+
+
+# LODs with the same signature are skipped or fail the export, depending on the settings.
+def is_duplicate(operator, signature, processed_signatures, logger):
+    if signature in processed_signatures and operator.lod_collisions != 'IGNORE':
+        if operator.lod_collisions == 'FAIL':
+            raise p3d.P3D_Error("Duplicate LODs detected")
+        
+        logger.log("Duplicate -> skipping LOD")
+        return True
+    
+    processed_signatures.add(signature)
+
+    return False
+
+
 def process_lod(operator, obj, proxy_lookup, is_valid, processed_signatures, logger):
     object_props = obj.a3ob_properties_object
     lod_name = object_props.get_name()
@@ -616,40 +847,22 @@ def process_lod(operator, obj, proxy_lookup, is_valid, processed_signatures, log
 
     logger.step("Processing data:")
     output = p3d.P3D_LOD()
-    lod_idx = int(object_props.lod)
-    if lod_idx != data.lod_unknown:
-        output.resolution.set(lod_idx, object_props.resolution)
-    else:
-        output.resolution.set(lod_idx, object_props.resolution_float)
+    output.resolution = get_resolution(obj)
     
-    signature = float(output.resolution)
-    if signature in processed_signatures and operator.lod_collisions != 'IGNORE':
-        if operator.lod_collisions == 'FAIL':
-            raise p3d.P3D_Error("Duplicate LODs detected")
-        logger.log("Duplicate -> skipping LOD")
+    if is_duplicate(operator, float(output.resolution), processed_signatures, logger):
         logger.level_down()
         return None
-    else:
-        processed_signatures.add(signature)
 
     mesh = obj.data
 
-    normals, normals_lookup_dict = process_normals(mesh)
-    output.normals = normals
+    output.normal_vectors, loop_normals = process_normals(mesh)
     logger.log("Collected vertex normals")
 
-    bm = bmesh.new()
-    bm.from_mesh(mesh)
-    bm.normal_update()
-    bm.verts.ensure_lookup_table()
-    bm.edges.ensure_lookup_table()
-    bm.faces.ensure_lookup_table()
-
-    output.verts = process_vertices(bm)
+    output.vert_coords, output.vert_flags = process_vertices(mesh)
     logger.log("Collected vertices")
-    output.faces = process_faces(obj, bm, normals_lookup_dict, operator.relative_paths)
+    process_faces(output, obj, mesh, loop_normals, operator.relative_paths)
     logger.log("Collected faces")
-    output.taggs = process_taggs(obj, bm, logger)
+    output.taggs = process_taggs(obj, mesh, output, logger)
 
     if operator.renumber_components:
         output.renumber_components()
@@ -659,8 +872,6 @@ def process_lod(operator, obj, proxy_lookup, is_valid, processed_signatures, log
         translate_selections(output)
         logger.log("Translated selections to czech")
 
-    bm.free()
-
     # The placeholder proxy selection names must be replaced with the actual names.
     output.placeholders_to_proxies(proxy_lookup)
     logger.log("Finalized proxy selection names")
@@ -693,48 +904,112 @@ def write_file(operator, context, file, temp_collection):
 
     time_file_start = time.time()
 
+    objects = get_export_objects(operator, context)
+
+    # The objects are identified by their index in the export order.
+    # With incremental export, the objects that did not change since the last export
+    # are not processed again, their previously serialized LODs are reused instead.
+    fingerprints = {}
+    cached = {}
+    if operator.incremental_export:
+        for index, obj in enumerate(objects):
+            fingerprint = get_fingerprint(operator, context, obj)
+            lods = lod_cache.get_item(fingerprint)
+            if lods is None:
+                fingerprints[index] = fingerprint
+            else:
+                cached[index] = lods
+        
+        logger.log("Reusing %d LODs of %d unchanged objects" % (sum([len(lods) for lods in cached.values()]), len(cached)))
+
     # Gather all exportable LOD objects, duplicate them, merge their components, and validate for LOD type.
     # Produce the final mesh data, proxy lookup table and validity for each LOD.
-    lod_list = get_lod_data(operator, context, validator, temp_collection)
+    # [(signature, object index, LOD index in object, LOD object, proxy lookup, is valid, cached data), ...]
+    lod_items = []
+    for index, obj in enumerate(objects):
+        if index in cached:
+            lod_items.extend([(signature, index, position, None, None, True, data) for signature, position, data in cached[index]])
+            continue
+        
+        lod_list = get_lod_data(operator, context, validator, temp_collection, [obj])
+        lod_items.extend([(float(get_resolution(lod)), index, position, lod, proxy_lookup, is_valid, None) for position, (lod, proxy_lookup, is_valid) in enumerate(lod_list)])
     
     logger.log("Preprocessing done in %f sec" % (time.time() - time_file_start))
-    logger.log("Detected %d LOD objects" % len(lod_list))
+    logger.log("Detected %d LOD objects" % len(lod_items))
 
-    mlod = p3d.P3D_MLOD()
+    # LODs should be sorted by their resolution signature. The LODs are sorted in advance,
+    # so they can be streamed into the file as soon as they are serialized. LODs with the same
+    # signature are kept in object order, so the same LOD is kept from the duplicates regardless
+    # of which objects were reused from the cache.
+    lod_items.sort(key=lambda item: item[0:3])
+    logger.log("Sorted LODs")
+
+    writer = p3d.P3D_MLOD_Writer(file)
     logger.log("File type: MLOD")
     logger.log("File version: %d" % 257)
 
     logger.log("Processing LOD data:")
     logger.level_up()
 
-    mlod_lods = []
+    # The LODs are serialized in a background thread, while the next LOD is being processed
+    # (the Blender API can only be used from the main thread). The serialized LODs are written
+    # to the file in order, so at most two LOD objects have to be kept in memory at a time.
+    # Serialized LODs of the processed objects, to be stored for later incremental exports.
+    # Objects that had LODs skipped are not stored.
+    exported = {index: [] for index in fingerprints}
     processed_signatures = set()
-    for i, (lod, proxy_lookup, is_valid) in enumerate(lod_list):
-        time_lod_start = time.time()
-        logger.step("LOD %d: %s" % (i + 1, lod["a3ob_original_object"]))
-
-        new_lod = process_lod(operator, lod, proxy_lookup, is_valid, processed_signatures, logger)
-        if new_lod:
-            mlod_lods.append(new_lod)
-
-        logger.log("Done in %f sec" % (time.time() - time_lod_start))
-        wm.progress_update(i + 1)
+    pending = [] # [(signature, object index, LOD index in object, serialization task)]
+
+    def write_pending():
+        for signature, index, position, task in pending:
+            data = task.result()
+            writer.add(data)
+            if index in exported:
+                exported[index].append((signature, position, data))
+        
+        pending.clear()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        for i, (signature, index, position, lod, proxy_lookup, is_valid, data) in enumerate(lod_items):
+            time_lod_start = time.time()
+            logger.step("LOD %d: %s" % (i + 1, objects[index].name))
+
+            if data is not None:
+                logger.level_up()
+                if not is_duplicate(operator, signature, processed_signatures, logger):
+                    write_pending()
+                    writer.add(data)
+                    logger.log("Reused unchanged LOD")
+                
+                logger.level_down()
+            
+            else:
+                new_lod = process_lod(operator, lod, proxy_lookup, is_valid, processed_signatures, logger)
+                if new_lod:
+                    if operator.force_lowercase:
+                        new_lod.force_lowercase()
+                        logger.log("Forced lowercase")
+                    
+                    write_pending()
+                    pending.append((signature, index, position, executor.submit(p3d.serialize_lod, new_lod)))
+                
+                else:
+                    exported.pop(index, None)
+
+            logger.log("Done in %f sec" % (time.time() - time_lod_start))
+            wm.progress_update(i + 1)
+        
+        write_pending()
 
-    if len(mlod_lods) == 0:
+    if len(writer) == 0:
         raise p3d.P3D_Error("All LODs failed validation, cannot write P3D with 0 LODs")
 
-    # LODs should be sorted by their resolution signature.
-    mlod_lods.sort(key=lambda lod: float(lod.resolution))
-    mlod.lods = mlod_lods
-    logger.step("Sorted LODs")
-
-    if operator.force_lowercase:
-        mlod.force_lowercase()
-        logger.step("Forced lowercase")
+    count_exported = writer.finish()
 
-    mlod.write(file)
+    for index, lods in exported.items():
+        lod_cache.put_item(fingerprints[index], lods)
     
     logger.level_down()
     logger.step("P3D export finished in %f sec" % (time.time() - time_file_start))
 
-    return len(lod_list), len(mlod_lods)
+    return len(lod_items), count_exported
@@ -4,6 +4,7 @@
 
 import time
 import mathutils
+import numpy as np
 
 from . import data_rtm as rtm
 from ..utilities.logger import ProcessLogger
@@ -75,28 +76,13 @@ def process_motion(context, obj, action, frame_start, frame_end):
     return tuple(motion_vector)
 
 
-def process_frame(context, obj, bones_map, frame, phase):
+# The bone map only contains existing pose bones, so the transforms
+# of every frame follow the order of the bone list.
+def process_frame(context, obj, bones_map, frame):
     context.scene.frame_set(frame)
-    output = rtm.RTM_Frame()
-    output.phase = phase
+    pose_bones = obj.pose.bones
 
-    transforms = []
-    for bone in bones_map:
-        pose_bone = obj.pose.bones.get(bone)
-        if not pose_bone:
-            continue
-
-        trans = rtm.RTM_Transform()
-        trans.bone = bones_map[bone]
-        matrix = pose_bone.matrix_channel.copy()
-
-        trans.matrix = matrix
-
-        transforms.append(trans)
-    
-    output.transforms = transforms
-
-    return output
+    return [pose_bones[bone].matrix_channel.copy() for bone in bones_map]
 
 
 def process_props(operator, action_props):
@@ -148,7 +134,9 @@ def write_file(operator, context, file, obj, action):
     bone_map = build_bone_map(operator, context, obj)
     rtm_0101.bones = list(bone_map.values())
     logger.log("Collected bones")
-    rtm_0101.frames = [process_frame(context, obj, bone_map, index, phase) for index, phase in frame_mapping]
+    rtm_0101.phases = np.array([phase for index, phase in frame_mapping], dtype=np.float32)
+    matrices = [process_frame(context, obj, bone_map, index) for index, phase in frame_mapping]
+    rtm_0101.matrices = np.array(matrices, dtype=np.float32).reshape((len(frame_mapping), len(bone_map), 4, 4))
     
     logger.log("Collected frames")
     logger.level_down()
@@ -173,7 +161,7 @@ def write_file(operator, context, file, obj, action):
     logger.level_up()
     logger.log("Motion: %f, %f, %f" %  tuple(rtm_0101.motion))
     logger.log("Bones: %d" % len(rtm_0101.bones))
-    logger.log("Frames: %d" % len(rtm_0101.frames))
+    logger.log("Frames: %d" % rtm_0101.count_frames)
     logger.level_down()
 
     logger.level_down()
@@ -187,4 +175,4 @@ def write_file(operator, context, file, obj, action):
 
     logger.step("RTM export finished in %f sec" % (time.time() - time_start))
 
-    return static_pose, len(rtm_0101.frames)
+    return static_pose, rtm_0101.count_frames
@@ -27,11 +27,11 @@ def extract_pivot_coords(lod):
         if not tagg.is_selection():
             continue
 
-        data = tagg.data
-        if len(data.weight_verts) < 1:
+        indices, _ = tagg.data.get_weights_verts()
+        if len(indices) < 1:
             continue
 
-        vert_idx = list(data.weight_verts.keys())[0]
+        vert_idx = int(indices[0])
         vert_co = lod.verts[vert_idx][0:3]
 
         pivot_points[tagg.name.lower()] = Vector(vert_co)
@@ -55,7 +55,7 @@ def fake_pivot_coords(unknown, pivots):
 
 
 def read_pivots(pivots_path):
-    p3d_data = data_p3d.P3D_MLOD.read_file(pivots_path)
+    p3d_data = data_p3d.P3D_MLOD.read_file(pivots_path, lazy = True)
     memory = p3d_data.find_lod(data_p3d.P3D_LOD_Resolution.MEMORY)
     if not memory:
         return {}
@@ -9,8 +9,10 @@ import os
 import bpy
 import bmesh
 import mathutils
+import numpy as np
 
 from . import data_p3d as p3d
+from . import parse_cache
 from ..utilities import generic as utils
 from ..utilities import lod as lodutils
 from ..utilities import compat as computils
@@ -21,6 +23,35 @@ from ..utilities import data
 from ..utilities.logger import ProcessLogger
 
 
+# Signatures in the custom filter are separated by commas or whitespace,
+# and are matched by their decoded LOD type and resolution.
+def parse_lod_signatures(text):
+    signatures = set()
+    for item in text.replace(",", " ").split():
+        try:
+            signatures.add(p3d.P3D_LOD_Resolution.decode(float(item)))
+        except ValueError:
+            raise p3d.P3D_Error("Invalid LOD signature in filter: %s" % item)
+    
+    return signatures
+
+
+def get_lod_filter(operator):
+    mode = operator.lod_filter
+    LOD = p3d.P3D_LOD_Resolution
+
+    if mode == 'GEOMETRY_MEMORY':
+        return lambda res: res.lod in {LOD.GEOMETRY, LOD.MEMORY}
+    elif mode == 'VISUALS':
+        limit = operator.lod_filter_resolution
+        return lambda res: res.lod == LOD.VISUAL and res.res <= limit
+    elif mode == 'CUSTOM':
+        signatures = parse_lod_signatures(operator.lod_filter_signatures)
+        return lambda res: res.get() in signatures
+    
+    return None
+
+
 def categorize_lods(operator, context, mlod):
     categories = {}
     lods = []
@@ -65,6 +96,24 @@ def create_blender_materials(lookup, absolute):
     return materials
 
 
+# The mesh topology is set directly from the flat LOD arrays, without
+# building the mesh through bmesh or from_pydata.
+def create_mesh(name, lod):
+    loop_verts, loop_start, loop_total = lod.loop_data()
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(lod.vert_coords))
+    mesh.loops.add(len(loop_verts))
+    mesh.polygons.add(len(loop_start))
+
+    mesh.vertices.foreach_set("co", lod.vert_coords.ravel())
+    mesh.loops.foreach_set("vertex_index", loop_verts)
+    computils.mesh_set_polygons(mesh, loop_start, loop_total)
+    mesh.update(calc_edges=True)
+
+    return mesh
+
+
 def process_normals(mesh, lod):
     loop_normals = lod.loop_normals()
     
@@ -75,79 +124,97 @@ def process_normals(mesh, lod):
     return False
 
 
-def process_sharps(bm, lod):
+def process_sharps(mesh, lod):
     data = None
     for tagg in lod.taggs:
         if tagg.name == "#SharpEdges#":
             data = tagg.data
             break
     
-    if not data:
+    if not data or len(data.edges) == 0:
         return
     
-    for edge in bm.edges:
-        edge.smooth = True
+    count_verts = len(mesh.vertices)
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    edges = np.sort(edges.reshape((-1, 2)), axis=1).astype(np.int64)
     
-    for item in data.edges:
-        edge = bm.edges.get([bm.verts[item[0]], bm.verts[item[1]]])
-        if edge:
-            edge.smooth = False
+    sharps = np.sort(np.array(data.edges, dtype=np.int64).reshape((-1, 2)), axis=1)
+    sharps = sharps[sharps[:, 1] < count_verts]
+
+    keys_edges = edges[:, 0] * count_verts + edges[:, 1]
+    keys_sharps = sharps[:, 0] * count_verts + sharps[:, 1]
+    mesh.edges.foreach_set("use_edge_sharp", np.isin(keys_edges, keys_sharps))
 
 
-def process_uvsets(bm, lod):
+def process_uvsets(mesh, lod):
     uvsets = lod.uvsets()
+    count_loops = len(mesh.loops)
+    count_uv = 0
         
     for idx in uvsets:
         uvs = uvsets[idx]
+        if len(uvs) != count_loops:
+            continue
+
         layer_name = "UVSet %d" % idx
-        layer = bm.loops.layers.uv.get(layer_name)
+        layer = mesh.uv_layers.get(layer_name)
+        if not layer:
+            layer = mesh.uv_layers.new(name=layer_name)
+        
         if not layer:
-            layer = bm.loops.layers.uv.new(layer_name) 
+            continue
         
-        for face in bm.faces:
-            for loop in face.loops:
-                loop[layer].uv = uvs[loop.index]
+        layer.data.foreach_set("uv", uvs.ravel())
+        count_uv += 1
     
-    return len(uvsets)
+    return count_uv
 
 
-def process_selections(bm, lod):
-    bm.verts.layers.deform.verify()
-    layer = bm.verts.layers.deform.active
-    
+# Weights are added to the vertex group in batches of vertices
+# with identical weight values.
+def add_group_weights(group, indices, weights):
+    order = np.argsort(weights, kind="stable")
+    values, starts = np.unique(weights[order], return_index=True)
+
+    for value, batch in zip(values.tolist(), np.split(indices[order], starts[1:])):
+        group.add(batch.tolist(), value, 'REPLACE')
+
+
+def process_selections(obj, lod):
     selection_names = []
-    count_selections = 0
     for tagg in lod.taggs:
         if tagg.name[0] == tagg.name[-1] == "#":
             continue
         
-        weights = tagg.data.weight_verts
-        for idx in weights:
-            bm.verts[idx][layer][count_selections] = weights[idx]
-
-        count_selections += 1
+        group = obj.vertex_groups.new(name=tagg.name)
+        indices, weights = tagg.data.get_weights_verts()
+        if len(indices) > 0:
+            add_group_weights(group, indices, weights)
         
         selection_names.append(tagg.name)
     
     return selection_names
 
 
-def process_materials(operator, mesh, bm, lod, materials, materials_lookup):
+def process_materials(operator, mesh, lod, materials, materials_lookup):
     slot_indices = []
     material_indices = []
     if operator.sections == 'PRESERVE':
         slot_indices, material_indices = lod.get_sections(materials_lookup)
     elif operator.sections == 'MERGE':
         slot_indices, material_indices = lod.get_sections_merged(materials_lookup)
-    
-    for i, idx in enumerate(slot_indices):
-        bm.faces[i].material_index = idx
-    
+
+    if len(slot_indices) != len(mesh.polygons):
+        raise p3d.P3D_Error("Could not assign materials: %d faces in LOD, %d polygons in mesh" % (len(slot_indices), len(mesh.polygons)))
+
+    mesh.polygons.foreach_set("material_index", np.array(slot_indices, dtype=np.int32))
+
     for idx in material_indices:
         mesh.materials.append(materials[idx])
 
 
-def process_mass(bm, lod):
+def process_mass(mesh, lod):
     data = None
     for tagg in lod.taggs:
         if tagg.name == "#Mass#":
@@ -156,9 +223,7 @@ def process_mass(bm, lod):
     if not data:
         return
     
-    layer = bm.verts.layers.float.new("a3ob_mass")
-    for vert in bm.verts:
-        vert[layer] = data.masses[vert.index]
+    computils.mesh_set_attribute(mesh, "a3ob_mass", 'FLOAT', 'POINT', data.masses)
 
 
 def process_properties(obj, lod):
@@ -171,12 +236,10 @@ def process_properties(obj, lod):
         new_prop.value = tagg.data.value
 
 
-def process_flag_groups_vertex(obj, bm, lod):
+def process_flag_groups_vertex(obj, mesh, lod):
     groups, values = lod.flag_groups_vertex()
 
-    layer = flagutils.get_layer_flags_vertex(bm)
-    for vert in bm.verts:
-        vert[layer] = values[vert.index]
+    flagutils.set_layer_flags_vertex(mesh, np.array(values, dtype=np.int32))
     
     for i, grp in enumerate(groups):
         new_group = obj.a3ob_properties_object_flags.vertex.add()
@@ -184,12 +247,10 @@ def process_flag_groups_vertex(obj, bm, lod):
         new_group.set_flag(grp)
 
 
-def process_flag_groups_face(obj, bm, lod):
+def process_flag_groups_face(obj, mesh, lod):
     groups, values = lod.flag_groups_face()
 
-    layer = flagutils.get_layer_flags_face(bm)
-    for face in bm.faces:
-        face[layer] = values[face.index]
+    flagutils.set_layer_flags_face(mesh, np.array(values, dtype=np.int32))
     
     for i, grp in enumerate(groups):
         new_group = obj.a3ob_properties_object_flags.face.add()
@@ -310,11 +371,7 @@ def process_lod(operator, logger, lod, materials, materials_lookup, categories,
 
     logger.step("Processing data:")
     
-    mesh = bpy.data.meshes.new(lod_name)
-    
-    mesh.from_pydata(*lod.pydata())
-    mesh.update(calc_edges=True)
-    
+    mesh = create_mesh(lod_name, lod)
     obj = bpy.data.objects.new(lod_name, mesh)
 
     logger.log("Created raw mesh")
@@ -329,62 +386,49 @@ def process_lod(operator, logger, lod, materials, materials_lookup, categories,
         object_props.resolution_float = lod_resolution
 
     if lod_index not in data.lod_shadows:
-        for face in mesh.polygons:
-            face.use_smooth = True
-        
+        mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
         computils.mesh_auto_smooth(mesh)
     
+    # Process TAGGs
+    process_sharps(mesh, lod)
+    logger.log("Marked sharp edges")
+    
     if 'NORMALS' in operator.additional_data and lod_index in data.lod_visuals:
         if process_normals(mesh, lod):
             logger.log("Applied split normals")
         else:
             logger.log("Could not apply split normals")
     
-    # Process TAGGs
-    bm = bmesh.new()
-    bm.from_mesh(mesh)
-    bm.verts.ensure_lookup_table()
-    bm.edges.ensure_lookup_table()
-    bm.faces.ensure_lookup_table()
-    
-    process_sharps(bm, lod)
-    logger.log("Marked sharp edges")
-    
     if 'UV' in operator.additional_data:
-        count_uv = process_uvsets(bm, lod)
+        count_uv = process_uvsets(mesh, lod)
         logger.log("Added UV channels: %d" % count_uv)
     
     selection_names = []
     proxy_lookup = {}
     if 'SELECTIONS' in operator.additional_data:
         proxy_lookup = lod.proxies_to_placeholders()
-        selection_names = process_selections(bm, lod)
+        selection_names = process_selections(obj, lod)
         logger.log("Added vertex groups: %d" % (len(selection_names)))
     
     if 'MATERIALS' in operator.additional_data:
-        process_materials(operator, mesh, bm, lod, materials, materials_lookup)
+        process_materials(operator, mesh, lod, materials, materials_lookup)
         logger.log("Assigned materials")
     
     if lod_index == p3d.P3D_LOD_Resolution.GEOMETRY and 'MASS' in operator.additional_data:
-        process_mass(bm, lod)
+        process_mass(mesh, lod)
         logger.log("Added vertex masses")
     
     process_properties(obj, lod)
     logger.log("Added named properties")
 
     if 'FLAGS' in operator.additional_data:
-        process_flag_groups_vertex(obj, bm, lod)
+        process_flag_groups_vertex(obj, mesh, lod)
         logger.log("Assigned vertex flag groups")
 
-        process_flag_groups_face(obj, bm, lod)
+        process_flag_groups_face(obj, mesh, lod)
         logger.log("Assigned face flag groups")
-        
-    for name in selection_names:
-        obj.vertex_groups.new(name=name)
 
-    bm.normal_update()
-    bm.to_mesh(mesh)
-    bm.free()
+    mesh.update()
 
     collection = categories[lod_links[2]]
     collection.objects.link(obj)
@@ -412,7 +456,21 @@ def process_lod(operator, logger, lod, materials, materials_lookup, categories,
     return obj
 
 
-def read_file(operator, context, file):
+# Models that are imported many times during a session (eg.: proxy models) are
+# kept parsed in memory, so they only have to be read once.
+def read_file_cached(filepath, first_lod_only = False, parallel = False):
+    mlod = parse_cache.proxy_models.get(filepath, first_lod_only)
+    if mlod is None:
+        mlod = p3d.P3D_MLOD.read_file(filepath, first_lod_only, parallel = parallel)
+        parse_cache.proxy_models.put(filepath, mlod, first_lod_only)
+    
+    mlod.source = filepath
+    
+    return mlod
+
+
+# The file is read through its path, so the parse cache and the model cache can be used.
+def read_file(operator, context):
     # If something is left selected in the scene, the proxy separation trips up with the operators.
     for obj in bpy.context.selected_objects:
         obj.select_set(False)
@@ -430,8 +488,19 @@ def read_file(operator, context, file):
     if operator.first_lod_only:
         logger.log("Importing 1st LOD only")
     
+    lod_filter = get_lod_filter(operator)
+    if lod_filter:
+        logger.log("Importing LODs matching filter: %s" % operator.lod_filter)
+    
     time_read_start = time.time()
-    mlod = p3d.P3D_MLOD.read(file, operator.first_lod_only)
+    if operator.parallel_read:
+        logger.log("Reading LODs in parallel")
+    
+    if operator.model_cache and not lod_filter:
+        mlod = read_file_cached(operator.filepath, operator.first_lod_only, operator.parallel_read)
+        logger.log("Model cache: %(hits)d hits, %(misses)d misses, %(entries)d entries, %(size)d bytes" % parse_cache.proxy_models.get_stats())
+    else:
+        mlod = p3d.P3D_MLOD.read_file(operator.filepath, operator.first_lod_only, lod_filter = lod_filter, parallel = operator.parallel_read)
     logger.log("File reading done in %f sec" % (time.time() - time_read_start))
 
     logger.log("File version: %d" % mlod.version)
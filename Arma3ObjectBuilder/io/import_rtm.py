@@ -36,9 +36,9 @@ def create_action(operator, obj):
 
 def build_transform_lookup(rtm_0101):
     transforms = {}
-    for i, frame in enumerate(rtm_0101.frames):
-        for item in frame.transforms:
-            transforms[item.bone.lower(), i] = Matrix(item.matrix)
+    for i, (bones, matrices) in enumerate(zip(rtm_0101.get_frame_bones(), rtm_0101.matrices.tolist())):
+        for bone, matrix in zip(bones, matrices):
+            transforms[bone.lower(), i] = Matrix(matrix)
 
     return transforms
 
@@ -48,11 +48,11 @@ def build_motion_lookup(operator, rtm_0101):
     motion = Vector(rtm_0101.motion).xzy # not sure why it has to be swizzled back to XZY order, but oh well...
     if motion.length == 0 or not operator.apply_motion:
         empty = Vector()
-        for i in range(len(rtm_0101.frames)):
+        for i in range(rtm_0101.count_frames):
             lookup[i] = empty
     else:
-        for i, frame in enumerate(rtm_0101.frames):
-            lookup[i] = motion * frame.phase
+        for i, phase in enumerate(rtm_0101.phases.tolist()):
+            lookup[i] = motion * phase
     
     return lookup
 
@@ -69,10 +69,10 @@ def build_frame_mapping(operator, rtm_0101):
     frames = {}
 
     if operator.mapping_mode == 'DIRECT':
-        frames = {i: i + 1 for i in range(len(rtm_0101.frames))}
+        frames = {i: i + 1 for i in range(rtm_0101.count_frames)}
     else:
-        for i, frame in enumerate(rtm_0101.frames):
-            frames[i] = frame.phase * frame_end + (1 - frame.phase) * frame_start
+        for i, phase in enumerate(rtm_0101.phases.tolist()):
+            frames[i] = phase * frame_end + (1 - phase) * frame_start
     
     if operator.mapping_mode != 'DIRECT' or operator.round_frames:
         frames = {i: round(frames[i]) for i in frames}
@@ -198,7 +198,7 @@ def import_file(operator, context, file):
         logger.log("Bones: %d" % len(rtm_data.bones))
         logger.log("Properties: %d" % len(rtm_data.props))
         logger.log("Phases: %d" % len(rtm_data.phases))
-        logger.log("Frames: %d" % len(rtm_data.frames))
+        logger.log("Frames: %d" % rtm_data.count_frames)
         logger.level_down()
 
         bone_parents = get_bone_hierarchy(obj.data.bones)
@@ -220,7 +220,7 @@ def import_file(operator, context, file):
     logger.level_up()
     logger.log("Motion vector: %s" % str(rtm_0101.motion))
     logger.log("Bones: %d" % len(rtm_0101.bones))
-    logger.log("Frames: %d" % len(rtm_0101.frames))
+    logger.log("Frames: %d" % rtm_0101.count_frames)
     logger.level_down()
     logger.level_down()
 
@@ -240,7 +240,7 @@ def import_file(operator, context, file):
 
     frames = build_frame_mapping(operator, rtm_0101)
     operator.frame_start = frames[0]
-    operator.frame_end = frames[len(rtm_0101.frames) - 1]
+    operator.frame_end = frames[rtm_0101.count_frames - 1]
     logger.log("Built frame mapping")
 
     if operator.mute_constraints:
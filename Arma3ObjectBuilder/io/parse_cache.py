@@ -0,0 +1,289 @@
+# On-disk cache of parsed files.
+# Repeatedly imported files (proxy models, pivot points, reference models) do not need
+# to be parsed again, as long as they did not change. The parsed data is stored in its
+# columnar form as arrays in an NPZ payload file, with a small JSON header beside it
+# that describes the cached source file. The payloads are loaded without unpickling,
+# so a planted cache file cannot execute code.
+# The entries are keyed by the kind of data, and the path, size and modification
+# time of the source file, so a changed source file simply misses the cache.
+# The total size of the cache is bounded, the least recently used entries are evicted
+# when the limit is exceeded.
+# The cache is disabled until it is configured (the add-on sets it up from the preferences,
+# in a directory of the user).
+# Frequently reused files can also be kept in memory for the duration of the session.
+
+
+import os
+import stat
+import json
+import pickle
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+
+CACHE_VERSION = 5
+
+
+directory = None
+limit = 0 # bytes, 0 means disabled
+stats = {"hits": 0, "misses": 0}
+
+
+def configure(path, size_limit):
+    global directory, limit
+
+    directory = path or None
+    limit = max(0, size_limit)
+    if is_enabled():
+        evict()
+
+
+def is_enabled():
+    return directory is not None and limit > 0
+
+
+# The cache directory is created private to the user. An existing directory is only
+# used if it is owned by the user, and other users cannot write to it.
+def prepare_directory():
+    try:
+        os.makedirs(directory, mode = 0o700, exist_ok = True)
+        dirstat = os.stat(directory)
+    except OSError:
+        return False
+    
+    if not hasattr(os, "getuid"):
+        return True
+    
+    return dirstat.st_uid == os.getuid() and not dirstat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def get_source_info(filepath):
+    try:
+        filestat = os.stat(filepath)
+    except OSError:
+        return None
+
+    return {
+        "path": os.path.normcase(os.path.abspath(filepath)),
+        "size": filestat.st_size,
+        "mtime": filestat.st_mtime_ns
+    }
+
+
+def get_key(kind, source):
+    key = "%s|%d|%s|%d|%d" % (kind, CACHE_VERSION, source["path"], source["size"], source["mtime"])
+
+    return hashlib.sha1(key.encode("utf8")).hexdigest()
+
+
+def get_paths(key):
+    return os.path.join(directory, key + ".json"), os.path.join(directory, key + ".npz")
+
+
+def remove_entry(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+# Returns the cached arrays as a dictionary, or None if the file is not cached.
+# The arrays to load can be selected by a function, that receives the opened payload
+# (with the array names in its files attribute) and returns the names of the needed arrays.
+def load(kind, filepath, select = None):
+    if not is_enabled() or not prepare_directory():
+        return None
+
+    source = get_source_info(filepath)
+    if source is None:
+        return None
+
+    path_header, path_payload = get_paths(get_key(kind, source))
+    try:
+        with open(path_header, "r") as file:
+            header = json.load(file)
+
+        if header.get("kind") != kind or header.get("source") != source:
+            raise ValueError("Mismatching cache entry")
+
+        with np.load(path_payload, allow_pickle = False) as payload:
+            names = payload.files if select is None else select(payload)
+            data = {name: payload[name] for name in names}
+
+        # The modification time of the header marks the last use of the entry.
+        os.utime(path_header)
+
+    except FileNotFoundError:
+        stats["misses"] += 1
+        return None
+
+    except Exception:
+        remove_entry(path_header, path_payload)
+        stats["misses"] += 1
+        return None
+
+    stats["hits"] += 1
+
+    return data
+
+
+# The data is a dictionary of arrays (object arrays are not supported).
+def store(kind, filepath, data):
+    if not is_enabled() or not prepare_directory():
+        return False
+
+    source = get_source_info(filepath)
+    if source is None:
+        return False
+
+    path_header, path_payload = get_paths(get_key(kind, source))
+    # The payload is written to a temporary file first, so a failed or concurrent
+    # write cannot leave a truncated entry behind.
+    path_temp = "%s.%d.temp" % (path_payload, os.getpid())
+    try:
+        with open(path_temp, "wb") as file:
+            np.savez(file, **data)
+
+        os.replace(path_temp, path_payload)
+
+        header = {
+            "kind": kind,
+            "version": CACHE_VERSION,
+            "source": source,
+            "payload": os.path.getsize(path_payload)
+        }
+        with open(path_header, "w") as file:
+            json.dump(header, file, indent = 2)
+
+    except Exception:
+        remove_entry(path_header, path_payload, path_temp)
+        return False
+
+    evict()
+
+    return True
+
+
+# Entries are removed in order of last use, until the total payload size fits the limit.
+def evict():
+    if not is_enabled() or not os.path.isdir(directory):
+        return 0
+
+    entries = []
+    total = 0
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".json"):
+            continue
+
+        path_header = entry.path
+        path_payload = path_header[:-5] + ".npz"
+        try:
+            last_used = entry.stat().st_mtime_ns
+            size = os.path.getsize(path_payload)
+        except OSError:
+            remove_entry(path_header, path_payload)
+            continue
+
+        entries.append((last_used, size, path_header, path_payload))
+        total += size
+
+    entries.sort()
+    count_removed = 0
+    for last_used, size, path_header, path_payload in entries:
+        if total <= limit:
+            break
+
+        remove_entry(path_header, path_payload)
+        total -= size
+        count_removed += 1
+
+    return count_removed
+
+
+def clear():
+    if directory is None or not os.path.isdir(directory):
+        return
+
+    for entry in os.scandir(directory):
+        if entry.name.endswith((".json", ".npz", ".temp")):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+# Session level in-memory cache of parsed files.
+# The entries are stored in pickled form, so every lookup returns an independent
+# copy, that can be freely modified by the caller, and the size of the entries is known.
+class MemoryCache():
+    def __init__(self, size_limit):
+        self.limit = size_limit
+        self.size = 0
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def get_key(self, filepath, *args):
+        source = get_source_info(filepath)
+        if source is None:
+            return None
+        
+        return (source["path"], source["size"], source["mtime"], *args)
+    
+    def get(self, filepath, *args):
+        return self.get_item(self.get_key(filepath, *args))
+    
+    def put(self, filepath, data, *args):
+        key = self.get_key(filepath, *args)
+        if key is None:
+            return False
+        
+        return self.put_item(key, data)
+    
+    # Direct access by arbitrary keys, for data that is not read from a file.
+    def get_item(self, key):
+        payload = self.entries.get(key)
+        if payload is None:
+            self.misses += 1
+            return None
+        
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        return pickle.loads(payload)
+    
+    def put_item(self, key, data):
+        payload = pickle.dumps(data, protocol = pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.limit:
+            return False
+
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+
+        self.entries[key] = payload
+        self.size += len(payload)
+
+        while self.size > self.limit:
+            key, payload = self.entries.popitem(last = False)
+            self.size -= len(payload)
+        
+        return True
+    
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+    
+    def get_stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "size": self.size}
+
+
+# Parsed proxy models, shared by the proxy handling tools.
+proxy_models = MemoryCache(128 * 1024 * 1024)
@@ -0,0 +1,89 @@
+# Process pool for the CPU heavy parts of the file handling.
+# The worker processes cannot import the add-on package itself (its initialization
+# requires the Blender API), so the package hierarchy is set up with empty placeholder
+# modules in the workers, and only the required modules of the io subpackage are
+# actually imported there. Only modules that do not depend on the Blender API
+# (like the data_xyz modules) can be used in the workers.
+
+
+import os
+import sys
+import types
+import runpy
+import multiprocessing
+import multiprocessing.spawn
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+
+
+# Name under which this file is run in the worker processes (see create_pool).
+WORKER_RUN_NAME = "__a3ob_worker__"
+
+
+# Package names and directories from the io subpackage up to the top level package.
+def get_packages():
+    names = __name__.split(".")[:-1]
+    path = os.path.dirname(os.path.abspath(__file__))
+    packages = []
+
+    for i in range(len(names), 0, -1):
+        packages.append((".".join(names[:i]), path))
+        path = os.path.dirname(path)
+
+    return packages
+
+
+# Register empty placeholder modules for the packages, unless they are already imported.
+def setup_worker(packages):
+    for name, path in packages:
+        if name in sys.modules:
+            continue
+
+        module = types.ModuleType(name)
+        module.__path__ = [path]
+        sys.modules[name] = module
+
+
+def get_worker_count(count_tasks, limit = 0):
+    count = os.cpu_count() or 1
+    if limit > 0:
+        count = min(count, limit)
+
+    return max(1, min(count, count_tasks))
+
+
+# The workers are started with the interpreter that the multiprocessing module reports.
+# Blender versions before 2.91 report the Blender binary itself (that cannot run the workers).
+def is_available():
+    return not os.path.basename(os.fsdecode(multiprocessing.spawn.get_executable())).lower().startswith("blender")
+
+
+# Stand-in for the process pool, that runs the tasks immediately in the current process.
+class SerialExecutor(Executor):
+    def submit(self, fn, /, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as ex:
+            future.set_exception(ex)
+
+        return future
+
+
+# The spawn start method is used on every platform, as forking the Blender
+# process is not safe. The initializer is pickled by reference, and a worker would
+# resolve it by importing this module (and with that the add-on package), so the
+# workers run this file by its path instead, which calls setup_worker at the end.
+def create_pool(workers):
+    if not is_available():
+        return SerialExecutor()
+
+    return ProcessPoolExecutor(
+        max_workers = workers,
+        mp_context = multiprocessing.get_context("spawn"),
+        initializer = runpy.run_path,
+        initargs = (os.path.abspath(__file__), {"packages": get_packages()}, WORKER_RUN_NAME)
+    )
+
+
+if __name__ == WORKER_RUN_NAME:
+    setup_worker(globals()["packages"])
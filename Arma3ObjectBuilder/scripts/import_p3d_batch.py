@@ -29,6 +29,16 @@ class Settings:
     groupby = 'TYPE'
     # Import 1st LOD only (usually the 1st visual resolution)
     first_lod_only = False
+    # Import only LODs matching the filter: 'ALL', 'GEOMETRY_MEMORY', 'VISUALS' or 'CUSTOM'
+    lod_filter = 'ALL'
+    # Highest resolution of visual LODs to import with the 'VISUALS' filter
+    lod_filter_resolution = 1000
+    # Comma separated LOD signatures to import with the 'CUSTOM' filter (eg.: "1e13, 1e15")
+    lod_filter_signatures = ""
+    # Read the LODs in parallel worker processes (faster for large files with many LODs)
+    parallel_read = False
+    # Keep the parsed models in memory for the rest of the session
+    model_cache = False
     # Allow reading data other than pure mesh data
     additional_data_allowed = True
     # Additional data types to read if allowed
@@ -84,8 +94,7 @@ def main():
     for item in files:
         Settings.filepath = item
         
-        with open(Settings.filepath, "rb") as file:
-                read_file(Settings, bpy.context, file)
+        read_file(Settings, bpy.context)
 
 
 main()
@@ -0,0 +1,126 @@
+#   ---------------------------------------- HEADER ----------------------------------------
+#
+#   Author: MrClock
+#   Add-on: Arma 3 Object Builder
+#
+#   Description:
+#       The script maintains a searchable index of the P3D files in an asset library,
+#       and runs queries on it. The index is stored in an SQLite database file.
+#       Scanning the library only processes the files that changed since the last scan.
+#       The results are printed to the system console.
+#
+#   Usage:
+#       1. set the library folder and index file paths
+#       2. select the command to run, and set the query if necessary
+#       3. run script
+#
+#   ----------------------------------------------------------------------------------------
+
+
+#   --------------------------------------- SETTINGS ---------------------------------------
+
+class Settings:
+    # Root folder of the asset library
+    path_library = r""
+    # Index database file
+    path_index = r""
+    # Command to run:
+    # 'SCAN': update the index with the changed files of the library
+    # 'MATERIAL': models using a material or texture (query: path pattern, eg.: "*\data\metal.rvmat")
+    # 'PROXY': models referencing a proxy (query: path pattern, eg.: "*\proxies\seat*")
+    # 'PROPERTY': models with a named property (query: "key" or "key=value" pattern, eg.: "autocenter=0")
+    # 'SELECTION': models with a selection (query: name pattern, eg.: "damage*")
+    # 'MISSING_LOD': models without a LOD type (query: LOD type, eg.: "GEOMETRY", "MEMORY", "VIEW_GEOMETRY")
+    # 'FAILED': models that could not be read during the scan
+    command = 'SCAN'
+    # Query of the command (patterns are case insensitive, and support the * and ? wildcards)
+    query = r""
+    # Scan the library before running a query command
+    scan_before_query = False
+    # Number of worker processes to scan with (0 -> number of CPU cores)
+    workers = 0
+
+
+#   ---------------------------------------- LOGIC -----------------------------------------
+
+import os
+import time
+import importlib
+
+import bpy
+
+name = None
+for addon in bpy.context.preferences.addons.keys():
+    if addon.endswith("Arma3ObjectBuilder"):
+        name = addon
+        break
+else:
+    raise Exception("Arma 3 Object Builder could not be found")
+
+a3ob_utils = importlib.import_module(addon).utilities
+a3ob_io = importlib.import_module(addon).io
+
+asset_index = a3ob_io.asset_index
+p3d = a3ob_io.data_p3d
+ProcessLogger = a3ob_utils.logger.ProcessLogger
+
+
+def scan(index, logger):
+    time_start = time.time()
+    logger.step("Scanning library: %s" % Settings.path_library)
+    logger.level_up()
+    count_scanned, count_removed, count_failed = index.scan(Settings.path_library, Settings.workers, logger)
+    logger.log("Scanned: %d, removed: %d, failed: %d" % (count_scanned, count_removed, count_failed))
+    logger.level_down()
+    logger.step("Scan finished in %f sec" % (time.time() - time_start))
+
+
+def run_query(index):
+    command = Settings.command
+    query = Settings.query.strip()
+
+    if command == 'MATERIAL':
+        return index.find_material(query)
+    elif command == 'PROXY':
+        return index.find_proxy(query)
+    elif command == 'PROPERTY':
+        key, _, value = query.partition("=")
+        return index.find_property(key.strip(), value.strip() or "*")
+    elif command == 'SELECTION':
+        return index.find_selection(query)
+    elif command == 'MISSING_LOD':
+        lod_type = getattr(p3d.P3D_LOD_Resolution, query.upper(), None)
+        if type(lod_type) is not int:
+            raise ValueError("Unknown LOD type: %s" % query)
+
+        return index.find_missing_lod(lod_type)
+    elif command == 'FAILED':
+        return index.find_failed()
+
+    raise ValueError("Unknown command: %s" % command)
+
+
+def main():
+    logger = ProcessLogger()
+
+    if not Settings.path_index:
+        raise ValueError("The index file path is not set")
+
+    with asset_index.AssetIndex(Settings.path_index) as index:
+        if Settings.command == 'SCAN' or Settings.scan_before_query:
+            scan(index, logger)
+
+        if Settings.command == 'SCAN':
+            return
+
+        results = run_query(index)
+        logger.step("%s query: %s" % (Settings.command, Settings.query))
+        logger.level_up()
+        for path in results:
+            logger.log(path)
+
+        logger.level_down()
+        logger.step("Found %d models" % len(results))
+
+
+main()
@@ -78,6 +78,35 @@ class A3OB_OP_import_p3d(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
         name = "First LOD Only",
         description = "Import only the first LOD found in the file"
     )
+    lod_filter: bpy.props.EnumProperty(
+        name = "LOD Filter",
+        description = "Import only the LODs matching the filter (the rest are skipped without processing)",
+        items = (
+            ('ALL', "All", "Import all LODs"),
+            ('GEOMETRY_MEMORY', "Geometry + Memory", "Import only the Geometry and Memory LODs"),
+            ('VISUALS', "Visuals", "Import only the visual resolution LODs up to the maximum resolution"),
+            ('CUSTOM', "Custom", "Import only the LODs with the listed signatures")
+        ),
+        default = 'ALL'
+    )
+    lod_filter_resolution: bpy.props.IntProperty(
+        name = "Max Resolution",
+        description = "Highest resolution of visual LODs to import",
+        default = 1000,
+        min = 0
+    )
+    lod_filter_signatures: bpy.props.StringProperty(
+        name = "Signatures",
+        description = "Comma separated list of LOD signatures to import (eg.: 1e13, 1e15)"
+    )
+    parallel_read: bpy.props.BoolProperty(
+        name = "Parallel Reading",
+        description = "Read the LODs in parallel worker processes\n(only faster for large files with many LODs)"
+    )
+    model_cache: bpy.props.BoolProperty(
+        name = "Model Cache",
+        description = "Keep the parsed model in memory for the rest of the session\n(useful if the same model is imported repeatedly)"
+    )
     translate_selections: bpy.props.BoolProperty(
         name = "Translate Selections",
         description = "Try to translate czech selection names to english"
@@ -99,18 +128,17 @@ class A3OB_OP_import_p3d(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
         pass
     
     def execute(self, context):        
-        with open(self.filepath, "rb") as file:
-            try:
-                lod_objects = import_p3d.read_file(self, context, file)
-                utils.op_report(self, {'INFO'}, "Successfully imported %d LODs (check the logs in the system console)" % len(lod_objects))
-            except struct.error as ex:
-                utils.op_report(self, {'ERROR'}, "Unexpected EndOfFile (check the system console)")
-                traceback.print_exc()
-            except import_p3d.p3d.P3D_Error as ex:
-                utils.op_report(self, {'ERROR'}, "%s (check the system console)" % ex)
-            except Exception as ex:
-                utils.op_report(self, {'ERROR'}, "%s (check the system console)" % ex)
-                traceback.print_exc()
+        try:
+            lod_objects = import_p3d.read_file(self, context)
+            utils.op_report(self, {'INFO'}, "Successfully imported %d LODs (check the logs in the system console)" % len(lod_objects))
+        except struct.error as ex:
+            utils.op_report(self, {'ERROR'}, "Unexpected EndOfFile (check the system console)")
+            traceback.print_exc()
+        except import_p3d.p3d.P3D_Error as ex:
+            utils.op_report(self, {'ERROR'}, "%s (check the system console)" % ex)
+        except Exception as ex:
+            utils.op_report(self, {'ERROR'}, "%s (check the system console)" % ex)
+            traceback.print_exc()
         
         return {'FINISHED'}
 
@@ -137,6 +165,14 @@ class A3OB_PT_import_p3d_main(bpy.types.Panel):
         operator = sfile.active_operator
         
         layout.prop(operator, "first_lod_only")
+        layout.prop(operator, "lod_filter")
+        if operator.lod_filter == 'VISUALS':
+            layout.prop(operator, "lod_filter_resolution")
+        elif operator.lod_filter == 'CUSTOM':
+            layout.prop(operator, "lod_filter_signatures")
+        
+        layout.prop(operator, "parallel_read")
+        layout.prop(operator, "model_cache")
         layout.prop(operator, "validate_meshes")
 
 
@@ -324,6 +360,10 @@ class A3OB_OP_export_p3d(bpy.types.Operator, bpy_extras.io_utils.ExportHelper):
         description = "Generate Component## selections if none are already defined",
         default = True
     )
+    incremental_export: bpy.props.BoolProperty(
+        name = "Incremental Export",
+        description = "Reuse the LOD data from the previous exports of this session for the LOD objects that did not change since then"
+    )
 
     def draw(self, context):
         pass
@@ -381,6 +421,7 @@ class A3OB_PT_export_p3d_main(bpy.types.Panel):
         operator = sfile.active_operator
 
         layout.prop(operator, "relative_paths")
+        layout.prop(operator, "incremental_export")
 
 
 class A3OB_PT_export_p3d_include(bpy.types.Panel):
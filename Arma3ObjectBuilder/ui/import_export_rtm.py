@@ -3,7 +3,7 @@ import traceback
 import bpy
 import bpy_extras
 
-from ..io import export_rtm, import_rtm
+from ..io import export_rtm, import_rtm, binary_handler
 from ..utilities import generic as utils
 from ..utilities.validator import Validator
 from ..utilities.logger import ProcessLoggerNull
@@ -275,7 +275,7 @@ class A3OB_OP_import_rtm(bpy.types.Operator, bpy_extras.io_utils.ImportHelper):
     
     def execute(self, context):
         count_frames = 0
-        with open(self.filepath, "rb") as file:
+        with binary_handler.MappedReader(self.filepath) as file:
             try:
                 count_frames = import_rtm.import_file(self, context, file)
             except (import_rtm.rtm.RTM_Error, import_rtm.rtm.BMTR_Error) as ex:
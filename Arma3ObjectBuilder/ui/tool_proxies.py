@@ -116,6 +116,11 @@ class A3OB_OT_proxy_extract(bpy.types.Operator):
     validate_meshes: bpy.props.BoolProperty(default=True)
     proxy_action: bpy.props.EnumProperty(items=(('SEPARATE', "", ""),), default='SEPARATE')
     first_lod_only: bpy.props.BoolProperty(default=True)
+    lod_filter: bpy.props.EnumProperty(items=(('ALL', "", ""),), default='ALL')
+    lod_filter_resolution: bpy.props.IntProperty()
+    lod_filter_signatures: bpy.props.StringProperty()
+    parallel_read: bpy.props.BoolProperty()
+    model_cache: bpy.props.BoolProperty(default=True)
     translate_selections: bpy.props.BoolProperty()
     cleanup_empty_selections: bpy.props.BoolProperty()
     sections: bpy.props.EnumProperty(items=(("PRESERVE", "", ""),), default="PRESERVE")
@@ -134,21 +139,20 @@ class A3OB_OT_proxy_extract(bpy.types.Operator):
     def execute(self, context):
         proxy_object = context.active_object
         self.filepath = utils.abspath(proxy_object.a3ob_properties_object_proxy.proxy_path)
-        with open(self.filepath, "rb") as file:
-            try:
-                lod_objects = import_p3d.read_file(self, context, file)
-                imported_object = lod_objects[0]
-                imported_object.matrix_world = proxy_object.matrix_world
-                imported_object.name = os.path.basename(self.filepath)
-                imported_object.data.name = os.path.basename(self.filepath)
-                bpy.data.meshes.remove(proxy_object.data)
-                self.report({'INFO'}, "Successfully extracted proxy (check the logs in the system console)")
-            except struct.error as ex:
-                self.report({'ERROR'}, "Unexpected EndOfFile (check the system console)")
-                traceback.print_exc()
-            except Exception as ex:
-                self.report({'ERROR'}, "%s (check the system console)" % ex)
-                traceback.print_exc()
+        try:
+            lod_objects = import_p3d.read_file(self, context)
+            imported_object = lod_objects[0]
+            imported_object.matrix_world = proxy_object.matrix_world
+            imported_object.name = os.path.basename(self.filepath)
+            imported_object.data.name = os.path.basename(self.filepath)
+            bpy.data.meshes.remove(proxy_object.data)
+            self.report({'INFO'}, "Successfully extracted proxy (check the logs in the system console)")
+        except struct.error as ex:
+            self.report({'ERROR'}, "Unexpected EndOfFile (check the system console)")
+            traceback.print_exc()
+        except Exception as ex:
+            self.report({'ERROR'}, "%s (check the system console)" % ex)
+            traceback.print_exc()
         
         return {'FINISHED'}
 
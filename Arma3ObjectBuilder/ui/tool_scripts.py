@@ -22,7 +22,9 @@ scripts = {
     },
     "misc": {
         "Convert ATBX to A3OB": "convert_atbx_to_a3ob.py",
-        "Convert BMTR to plain RTM": "convert_bmtr_to_rtm.py"
+        "Convert BMTR to plain RTM": "convert_bmtr_to_rtm.py",
+        "Convert RTM to BMTR": "convert_rtm_to_bmtr.py",
+        "P3D library index": "index_p3d_library.py"
     }
 }
 
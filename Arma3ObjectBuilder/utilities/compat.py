@@ -2,6 +2,7 @@
 
 
 import bpy
+import numpy as np
 
 
 bl_version = bpy.app.version
@@ -26,6 +27,64 @@ def mesh_static_normals_iterator(mesh):
         yield i, loop.normal.copy().freeze()
 
 
+def mesh_loop_normals(mesh):
+    mesh.calc_normals_split()
+    normals = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+    mesh.loops.foreach_get("normal", normals)
+
+    return normals.reshape((-1, 3))
+
+
+def mesh_set_polygons(mesh, loop_start, loop_total):
+    mesh.polygons.foreach_set("loop_start", loop_start)
+    mesh.polygons.foreach_set("loop_total", loop_total)
+
+
+def mesh_legacy_layers(mesh, data_type, domain):
+    layers = {
+        ('FLOAT', 'POINT'): mesh.vertex_layers_float,
+        ('INT', 'POINT'): mesh.vertex_layers_int,
+        ('INT', 'FACE'): mesh.polygon_layers_int
+    }
+
+    return layers[(data_type, domain)]
+
+
+def mesh_set_attribute(mesh, name, data_type, domain, values):
+    layer = mesh_legacy_layers(mesh, data_type, domain).new(name=name)
+    layer.data.foreach_set("value", values)
+
+
+# Returns None if the layer does not exist.
+def mesh_get_attribute(mesh, name, data_type, domain):
+    layer = mesh_legacy_layers(mesh, data_type, domain).get(name)
+    if not layer:
+        return None
+    
+    values = np.empty(len(layer.data), dtype=np.float32 if data_type == 'FLOAT' else np.int32)
+    layer.data.foreach_get("value", values)
+
+    return values
+
+
+# Generic mesh attributes were introduced in Blender 2.91.0, and the
+# legacy data layers were later removed.
+if bl_version >= (2, 91, 0):
+    def mesh_set_attribute(mesh, name, data_type, domain, values):
+        layer = mesh.attributes.new(name, data_type, domain)
+        layer.data.foreach_set("value", values)
+    
+    def mesh_get_attribute(mesh, name, data_type, domain):
+        layer = mesh.attributes.get(name)
+        if not layer or layer.data_type != data_type or layer.domain != domain:
+            return None
+        
+        values = np.empty(len(layer.data), dtype=np.float32 if data_type == 'FLOAT' else np.int32)
+        layer.data.foreach_get("value", values)
+
+        return values
+
+
 # Blender 4.0.0 removed the traditional bpy.ops.xyz.xyz(ctx, **kwargs) type operator calling,
 # and since the new temp_override method was only introduced late in the 3.x.x versions,
 # to maintain compatibility with older releases, the operator call has to be version dependent
@@ -40,6 +99,14 @@ if bl_version > (3, 6, 0):
             op(**kwargs)
 
 
+# Polygon sizes are derived from the loop starts since Blender 4.0.0,
+# and the loop_total property became read-only.
+# https://developer.blender.org/docs/release_notes/4.0/python_api/#mesh
+if bl_version >= (4, 0, 0):
+    def mesh_set_polygons(mesh, loop_start, loop_total):
+        mesh.polygons.foreach_set("loop_start", loop_start)
+
+
 # https://developer.blender.org/docs/release_notes/4.1/python_api/#breaking-changes
 if bl_version >= (4, 1, 0):
     def mesh_auto_smooth(mesh):
@@ -48,3 +115,9 @@ if bl_version >= (4, 1, 0):
     def mesh_static_normals_iterator(mesh):
         for i, normal_value in enumerate(mesh.corner_normals):
             yield i, normal_value.vector.copy().freeze()
+    
+    def mesh_loop_normals(mesh):
+        normals = np.empty(len(mesh.corner_normals) * 3, dtype=np.float32)
+        mesh.corner_normals.foreach_get("vector", normals)
+
+        return normals.reshape((-1, 3))
@@ -1,8 +1,11 @@
 # Helper functions to handle vertex and face flag values.
 
 
+import numpy as np
+
 from . import data
 from . import generic as utils
+from . import compat as computils
 
 
 def get_layer_flags_vertex(bm, create = True):
@@ -21,6 +24,31 @@ def get_layer_flags_face(bm, create = True):
     return layer
 
 
+def set_layer_flags_vertex(mesh, values):
+    computils.mesh_set_attribute(mesh, "a3ob_flags_vertex", 'INT', 'POINT', values)
+
+
+def set_layer_flags_face(mesh, values):
+    computils.mesh_set_attribute(mesh, "a3ob_flags_face", 'INT', 'FACE', values)
+
+
+# Flag values of all vertices (or faces) of a mesh, 0 if the layer does not exist.
+def get_values_flags_vertex(mesh):
+    values = computils.mesh_get_attribute(mesh, "a3ob_flags_vertex", 'INT', 'POINT')
+    if values is None:
+        values = np.zeros(len(mesh.vertices), dtype=np.int32)
+    
+    return values
+
+
+def get_values_flags_face(mesh):
+    values = computils.mesh_get_attribute(mesh, "a3ob_flags_face", 'INT', 'FACE')
+    if values is None:
+        values = np.zeros(len(mesh.polygons), dtype=np.int32)
+    
+    return values
+
+
 def clear_layer_flags_vertex(bm):
     layer = bm.verts.layers.int.get("a3ob_flags_vertex")
     if not layer:
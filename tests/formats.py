@@ -0,0 +1,880 @@
+"""
+python -m unittest tests/formats.py
+"""
+
+
+import io
+import os
+import sys
+import types
+import pickle
+import random
+import shutil
+import tempfile
+import importlib
+import unittest
+
+import numpy as np
+
+
+# The file format modules do not depend on Blender, so they are loaded without
+# running the initialization of the add-on package (that requires bpy).
+folder_addon = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Arma3ObjectBuilder")
+for name, path in (("Arma3ObjectBuilder", folder_addon), ("Arma3ObjectBuilder.io", os.path.join(folder_addon, "io"))):
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [path]
+        sys.modules[name] = package
+
+process_pool = importlib.import_module("Arma3ObjectBuilder.io.process_pool")
+parse_cache = importlib.import_module("Arma3ObjectBuilder.io.parse_cache")
+asset_index = importlib.import_module("Arma3ObjectBuilder.io.asset_index")
+binary = importlib.import_module("Arma3ObjectBuilder.io.binary_handler")
+p3d = importlib.import_module("Arma3ObjectBuilder.io.data_p3d")
+rtm = importlib.import_module("Arma3ObjectBuilder.io.data_rtm")
+compression = importlib.import_module("Arma3ObjectBuilder.io.compression")
+
+folder_inputs = os.path.join(os.path.dirname(os.path.abspath(__file__)), "inputs")
+file_sample_p3d = os.path.join(folder_inputs, "p3d", "sample_2_crate.p3d")
+
+
+def write_mlod(mlod):
+    file = io.BytesIO()
+    mlod.write(file)
+
+    return file.getvalue()
+
+
+class BinaryTest(unittest.TestCase):
+    """Test cases of the binary reading helpers"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+    
+    def test_mapped_reader(self):
+        """Read the sample model through the memory mapped reader, and compare to the regular file"""
+
+        with open(file_sample_p3d, "rb") as file, binary.MappedReader(file_sample_p3d) as mapped:
+            for size in (4, 0, 1000, 3, 70000):
+                self.assertEqual(mapped.read(size), file.read(size))
+                self.assertEqual(mapped.tell(), file.tell())
+            
+            self.assertEqual(mapped.seek(-10, 1), file.seek(-10, 1))
+            self.assertEqual(bytes(mapped.read_view(20)), file.read(20))
+            self.assertEqual(mapped.peek(1)[:100], file.read(100))
+            self.assertEqual(mapped.seek(-5, 2), file.seek(-5, 2))
+            self.assertEqual(mapped.read(), file.read())
+            self.assertEqual(mapped.read(10), b"")
+            self.assertEqual(mapped.tell(), os.path.getsize(file_sample_p3d))
+            with self.assertRaises(ValueError):
+                mapped.seek(-1)
+            
+            mapped.seek(0)
+            file.seek(0)
+            self.assertEqual(write_mlod(p3d.P3D_MLOD.read(mapped)), write_mlod(p3d.P3D_MLOD.read(file)))
+        
+        filepath = os.path.join(self.folder, "empty.bin")
+        open(filepath, "wb").close()
+        with binary.MappedReader(filepath) as mapped:
+            self.assertEqual(mapped.read(), b"")
+    
+    def test_mapped_reader_view(self):
+        """Close the memory mapped reader while a view of the data is still alive"""
+
+        mapped = binary.MappedReader(file_sample_p3d)
+        view = mapped.read_view(4)
+        mapped.close()
+
+        self.assertEqual(bytes(view), b"MLOD")
+        view.release()
+
+    def test_read_asciiz(self):
+        """Read strings with and without stream buffering and interning"""
+
+        values = ["", "proxy", "x" * 10000, "ž" * 3000, "proxy"]
+        data = b"".join(value.encode("utf8") + b"\x00" for value in values) + b"unterminated"
+        filepath = os.path.join(self.folder, "strings.bin")
+        with open(filepath, "wb") as file:
+            file.write(data)
+
+        # io.BytesIO has no peek method, the bytes are read one by one from it
+        streams = (io.BufferedReader(io.BytesIO(data), 64), binary.MappedReader(filepath), io.BytesIO(data))
+        for file in streams:
+            self.assertEqual([binary.read_asciiz(file) for value in values], values)
+            self.assertEqual(binary.read_asciiz(file), "unterminated")
+            self.assertEqual(file.read(), b"")
+
+            lookup = {}
+            file.seek(0)
+            interned = [binary.read_asciiz(file, lookup) for value in values]
+            self.assertEqual(interned, values)
+            self.assertIs(interned[1], interned[4])
+            self.assertEqual(len(lookup), 4)
+
+        streams[1].close()
+
+
+class P3DReadTest(unittest.TestCase):
+    """Test cases of the P3D reading modes"""
+
+    def test_parallel(self):
+        """Read the sample model in parallel in worker processes and serially"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+
+        mlod_parallel = p3d.P3D_MLOD.read_parallel(file_sample_p3d, workers = 2)
+        self.assertEqual(write_mlod(mlod_parallel), write_mlod(mlod))
+
+        mlod_parallel = p3d.P3D_MLOD.read_parallel(file_sample_p3d, lod_filter = lambda resolution: resolution.lod != 0)
+        self.assertEqual(mlod_parallel.get_resolutions(), [lod.resolution for lod in mlod.lods if lod.resolution.lod != 0])
+
+    def test_index(self):
+        """Index the LODs of the sample model, and compare to the read LODs"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+            file.seek(0)
+            index = p3d.P3D_MLOD.read_index(file)
+
+            self.assertEqual(len(index), len(mlod.lods))
+            for entry, lod in zip(index, mlod.lods):
+                self.assertEqual(entry.resolution, lod.resolution)
+                self.assertEqual((entry.count_verts, entry.count_normals, entry.count_faces), (len(lod.verts), len(lod.normals), len(lod.faces)))
+                self.assertEqual(entry.taggs, [tagg.name for tagg in lod.taggs if tagg.active])
+
+                file.seek(entry.offset)
+                self.assertEqual(p3d.serialize_lod(p3d.P3D_LOD.read(file)), p3d.serialize_lod(lod))
+                self.assertEqual(file.tell(), entry.offset + entry.length)
+
+        self.assertEqual(index[-1].offset + index[-1].length, os.path.getsize(file_sample_p3d))
+
+    def test_lazy(self):
+        """Read the sample model lazily, and compare to the complete read"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+
+        mlod_lazy = p3d.P3D_MLOD.read_file(file_sample_p3d, lazy = True)
+        self.assertEqual(len(mlod_lazy.lods), len(mlod.lods))
+        self.assertFalse(any(mlod_lazy.lods.is_loaded(i) for i in range(len(mlod.lods))))
+
+        self.assertEqual(p3d.serialize_lod(mlod_lazy.lods[-1]), p3d.serialize_lod(mlod.lods[-1]))
+        self.assertEqual([mlod_lazy.lods.is_loaded(i) for i in range(len(mlod.lods))], [False] * (len(mlod.lods) - 1) + [True])
+        self.assertIs(mlod_lazy.lods[-1], mlod_lazy.lods[len(mlod.lods) - 1])
+
+        self.assertEqual([p3d.serialize_lod(lod) for lod in mlod_lazy.lods[1:3]], [p3d.serialize_lod(lod) for lod in mlod.lods[1:3]])
+        self.assertEqual(write_mlod(mlod_lazy), write_mlod(mlod))
+
+    def test_lod_filter(self):
+        """Read the sample model with LOD filters, and compare to the complete read"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+
+        filters = (
+            lambda resolution: True,
+            lambda resolution: False,
+            lambda resolution: resolution.lod == p3d.P3D_LOD_Resolution.VISUAL,
+            lambda resolution: resolution.lod in (p3d.P3D_LOD_Resolution.GEOMETRY, p3d.P3D_LOD_Resolution.MEMORY)
+        )
+        for lod_filter in filters:
+            expected = [p3d.serialize_lod(lod) for lod in mlod.lods if lod_filter(lod.resolution)]
+            with open(file_sample_p3d, "rb") as file:
+                self.assertEqual([p3d.serialize_lod(lod) for lod in p3d.P3D_MLOD.read(file, lod_filter = lod_filter).lods], expected)
+
+            mlod_filtered = p3d.P3D_MLOD.read_file(file_sample_p3d, lod_filter = lod_filter)
+            self.assertEqual([p3d.serialize_lod(lod) for lod in mlod_filtered.lods], expected)
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod_filtered = p3d.P3D_MLOD.read(file, True, lambda resolution: resolution.lod != p3d.P3D_LOD_Resolution.VISUAL)
+            self.assertEqual(mlod_filtered.lods, [])
+
+    def test_serial_executor(self):
+        """Run tasks in the serial stand-in of the process pool"""
+
+        with process_pool.SerialExecutor() as pool:
+            self.assertEqual(list(pool.map(abs, [-1, 2, -3])), [1, 2, 3])
+            with self.assertRaises(ZeroDivisionError):
+                pool.submit(divmod, 1, 0).result()
+
+    def test_setup_worker(self):
+        """Set up placeholder packages"""
+
+        name = "a3ob_test_package"
+        path = os.path.join(folder_inputs, "p3d")
+        process_pool.setup_worker([(name, path), ("Arma3ObjectBuilder", path)])
+        try:
+            self.assertEqual(sys.modules[name].__path__, [path])
+            self.assertNotEqual(sys.modules["Arma3ObjectBuilder"].__path__, [path])
+        finally:
+            del sys.modules[name]
+
+
+class ParseCacheTest(unittest.TestCase):
+    """Test cases of the on-disk parse cache"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.folder_cache = os.path.join(self.folder, "cache")
+        self.file_p3d = os.path.join(self.folder, "sample.p3d")
+        shutil.copyfile(file_sample_p3d, self.file_p3d)
+        parse_cache.configure(self.folder_cache, 64 * 1024 * 1024)
+    
+    def tearDown(self):
+        parse_cache.configure(None, 0)
+        shutil.rmtree(self.folder)
+
+    def test_roundtrip(self):
+        """Read the sample model through the cache, and compare to the direct read"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+        
+        hits = parse_cache.stats["hits"]
+        self.assertEqual(write_mlod(p3d.P3D_MLOD.read_file(self.file_p3d)), write_mlod(mlod))
+        self.assertEqual(parse_cache.stats["hits"], hits)
+        self.assertEqual(write_mlod(p3d.P3D_MLOD.read_file(self.file_p3d)), write_mlod(mlod))
+        self.assertEqual(parse_cache.stats["hits"], hits + 1)
+
+        # A changed source file misses the cache
+        os.utime(self.file_p3d, ns=(0, 0))
+        p3d.P3D_MLOD.read_file(self.file_p3d)
+        self.assertEqual(parse_cache.stats["hits"], hits + 1)
+    
+    def test_select(self):
+        """Read some LODs of the sample model from the cache, and compare to the direct read"""
+
+        p3d.P3D_MLOD.read_file(self.file_p3d)
+        for first_lod_only, lod_filter in ((True, None), (False, lambda resolution: resolution.lod != 0), (True, lambda resolution: resolution.lod != 0)):
+            with open(file_sample_p3d, "rb") as file:
+                mlod = p3d.P3D_MLOD.read(file, first_lod_only, lod_filter)
+            
+            hits = parse_cache.stats["hits"]
+            mlod_cached = p3d.P3D_MLOD.read_file(self.file_p3d, first_lod_only, lod_filter = lod_filter)
+            self.assertEqual(parse_cache.stats["hits"], hits + 1)
+            self.assertEqual([p3d.serialize_lod(lod) for lod in mlod_cached.lods], [p3d.serialize_lod(lod) for lod in mlod.lods])
+
+    def test_eviction(self):
+        """Store entries over the size limit"""
+
+        data = {"data": np.zeros(1024 * 1024, dtype=np.uint8)}
+        paths = [os.path.join(self.folder, "file_%d" % i) for i in range(3)]
+        for i, path in enumerate(paths):
+            with open(path, "wb") as file:
+                file.write(b"%d" % i)
+            
+            self.assertTrue(parse_cache.store("TEST", path, data))
+        
+        # The first entry was used last
+        for i, path in enumerate(paths):
+            path_header = parse_cache.get_paths(parse_cache.get_key("TEST", parse_cache.get_source_info(path)))[0]
+            os.utime(path_header, ns=(10 - i, 10 - i))
+        
+        parse_cache.configure(self.folder_cache, int(1.5 * 1024 * 1024))
+
+        self.assertIsNone(parse_cache.load("TEST", paths[1]))
+        self.assertIsNone(parse_cache.load("TEST", paths[2]))
+        np.testing.assert_array_equal(parse_cache.load("TEST", paths[0])["data"], data["data"])
+
+    def test_corrupt(self):
+        """Load a corrupted entry"""
+
+        parse_cache.store("TEST", self.file_p3d, {"data": np.arange(10)})
+        path_header, path_payload = parse_cache.get_paths(parse_cache.get_key("TEST", parse_cache.get_source_info(self.file_p3d)))
+        with open(path_payload, "wb") as file:
+            file.write(b"corrupt")
+        
+        self.assertIsNone(parse_cache.load("TEST", self.file_p3d))
+        self.assertFalse(os.path.exists(path_header))
+    
+    @unittest.skipUnless(hasattr(os, "getuid"), "POSIX permissions")
+    def test_directory(self):
+        """Use a cache directory that other users can write to"""
+
+        os.makedirs(self.folder_cache)
+        os.chmod(self.folder_cache, 0o777)
+        self.assertFalse(parse_cache.store("TEST", self.file_p3d, {"data": np.arange(10)}))
+        self.assertEqual(os.listdir(self.folder_cache), [])
+
+
+class MemoryCacheTest(unittest.TestCase):
+    """Test cases of the in-memory cache"""
+
+    def test_lru(self):
+        """Store entries over the size limit, and evict the least recently used"""
+
+        entry = bytes(1000)
+        cache = parse_cache.MemoryCache(3500)
+        for key in "abc":
+            self.assertTrue(cache.put_item(key, entry))
+
+        self.assertEqual(cache.get_item("a"), entry)
+        self.assertTrue(cache.put_item("d", entry))
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get_item("b"))
+        self.assertEqual([cache.get_item(key) is not None for key in "acd"], [True] * 3)
+
+        # Entries are copies, changes to the returned data do not affect the cache
+        cache.put_item("list", [1, 2])
+        cache.get_item("list").append(3)
+        self.assertEqual(cache.get_item("list"), [1, 2])
+
+        self.assertFalse(cache.put_item("large", bytes(4000)))
+        self.assertIsNone(cache.get_item("large"))
+        self.assertLessEqual(cache.size, cache.limit)
+
+        stats = cache.get_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (6, 2))
+        cache.clear()
+        self.assertEqual(cache.get_stats(), {"hits": 0, "misses": 0, "entries": 0, "size": 0})
+
+    def test_files(self):
+        """Store entries by source file, and miss after the file is changed"""
+
+        folder = tempfile.mkdtemp()
+        try:
+            filepath = os.path.join(folder, "sample.p3d")
+            shutil.copyfile(file_sample_p3d, filepath)
+            with open(filepath, "rb") as file:
+                mlod = p3d.P3D_MLOD.read(file)
+
+            cache = parse_cache.MemoryCache(64 * 1024 * 1024)
+            self.assertTrue(cache.put(filepath, mlod, "all"))
+            self.assertIsNone(cache.get(filepath, "first"))
+            self.assertEqual(write_mlod(cache.get(filepath, "all")), write_mlod(mlod))
+
+            os.utime(filepath, ns=(0, 0))
+            self.assertIsNone(cache.get(filepath, "all"))
+            self.assertFalse(cache.put(os.path.join(folder, "missing.p3d"), mlod))
+        finally:
+            shutil.rmtree(folder)
+
+
+class AssetIndexTest(unittest.TestCase):
+    """Test cases of the P3D library index"""
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.folder_library = os.path.join(self.folder, "library")
+        os.makedirs(os.path.join(self.folder_library, "sub"))
+        self.files = [os.path.join(self.folder_library, "crate.p3d"), os.path.join(self.folder_library, "sub", "crate_2.P3D")]
+        for path in self.files:
+            shutil.copyfile(file_sample_p3d, path)
+        
+        with open(os.path.join(self.folder_library, "readme.txt"), "w") as file:
+            file.write("not a model")
+        
+        self.index = asset_index.AssetIndex(os.path.join(self.folder, "index.sqlite"))
+    
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.folder)
+    
+    def test_scan_file(self):
+        """Scan the metadata of the sample model, and compare to the read model"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+        
+        result = asset_index.scan_file(file_sample_p3d)
+        self.assertEqual(result["version"], mlod.version)
+        self.assertEqual(result["lods"], [(i, float(lod.resolution), *lod.resolution.get(), len(lod.verts), len(lod.faces)) for i, lod in enumerate(mlod.lods)])
+        self.assertEqual(result["materials"], [(i, *pair) for i, lod in enumerate(mlod.lods) for pair in lod.materials if any(pair)])
+        self.assertEqual(result["properties"], [(i, tagg.data.key, tagg.data.value) for i, lod in enumerate(mlod.lods) for tagg in lod.taggs if tagg.name == "#Property#"])
+        self.assertEqual(result["selections"], [(i, tagg.name) for i, lod in enumerate(mlod.lods) for tagg in lod.taggs if tagg.is_selection()])
+
+    def test_scan(self):
+        """Scan -> rescan a library with changed, removed and broken files"""
+
+        root = self.folder_library
+        self.assertEqual(self.index.scan(root, 1), (2, 0, 0))
+        self.assertEqual(self.index.get_changes(root), ([], []))
+        self.assertEqual(self.index.scan(root, 1), (0, 0, 0))
+        self.assertEqual(len(self.index.find_lod(0)), 2)
+        self.assertEqual(self.index.find_missing_lod(0), [])
+
+        with open(file_sample_p3d, "rb") as file:
+            lods = p3d.P3D_MLOD.read(file).lods
+        
+        material = next(pair[1] for lod in lods for pair in lod.materials if pair[1])
+        self.assertEqual(len(self.index.find_material("*" + os.path.basename(material).upper())), 2)
+        selection = next(tagg.name for tagg in lods[0].taggs if tagg.is_selection())
+        self.assertEqual(len(self.index.find_selection(selection)), 2)
+
+        os.utime(self.files[0], ns=(0, 0))
+        os.remove(self.files[1])
+        with open(os.path.join(root, "broken.p3d"), "wb") as file:
+            file.write(b"MLOD")
+        
+        changed, removed = self.index.get_changes(root)
+        self.assertEqual(sorted([path for path, stamp in changed]), sorted([self.index.normalize_path(path) for path in (self.files[0], os.path.join(root, "broken.p3d"))]))
+        self.assertEqual(len(removed), 1)
+        self.assertEqual(self.index.scan(root, 1), (2, 1, 1))
+        self.assertEqual(self.index.find_failed(), [self.index.normalize_path(os.path.join(root, "broken.p3d"))])
+        self.assertEqual(self.index.find_lod(0), [self.index.normalize_path(self.files[0])])
+
+
+class P3DWriteTest(unittest.TestCase):
+    """Test cases of the streamed P3D writing"""
+
+    def test_writer(self):
+        """Stream the LODs of the sample model out of signature order -> read"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+
+        lods = mlod.lods[::-1]
+        signatures = [float(lod.resolution) for lod in lods]
+        self.assertNotEqual(signatures, sorted(signatures))
+
+        file = io.BytesIO()
+        file.write(b"prefix")
+        writer = p3d.P3D_MLOD_Writer(file)
+        for lod in lods:
+            writer.add(p3d.serialize_lod(lod))
+        
+        self.assertEqual(writer.finish(), len(lods))
+        self.assertEqual(file.tell(), len(file.getvalue()))
+
+        file.seek(6)
+        mlod_read = p3d.P3D_MLOD.read(file)
+        self.assertEqual(mlod_read.get_resolutions(), [lod.resolution for lod in lods])
+        self.assertEqual([p3d.serialize_lod(lod) for lod in mlod_read.lods], [p3d.serialize_lod(lod) for lod in lods])
+
+    def test_writer_empty(self):
+        """Finish writing without LODs"""
+
+        writer = p3d.P3D_MLOD_Writer(io.BytesIO())
+        with self.assertRaises(p3d.P3D_Error):
+            writer.finish()
+
+
+class P3DLODTest(unittest.TestCase):
+    """Test cases of the array storage of the LOD data"""
+
+    # Vertex records, normal vectors and face records of the LOD at the index entry.
+    def get_lod_sections(self, data, entry):
+        file = io.BytesIO(data)
+        file.seek(entry.offset + 28)
+        start = file.tell()
+        file.seek(entry.count_verts * p3d.P3D_LOD.DTYPE_VERT.itemsize, 1)
+        verts = data[start:file.tell()]
+        normals = np.frombuffer(file.read(entry.count_normals * 12), dtype="<f4")
+        start = file.tell()
+        faces = data[start:p3d.P3D_LOD.skip_faces(file, entry.count_faces)]
+
+        return verts, normals, faces
+
+    def test_sections(self):
+        """Read -> write the sample model, and compare the vertex, normal and face sections"""
+
+        with open(file_sample_p3d, "rb") as file:
+            data = file.read()
+            file.seek(0)
+            index = p3d.P3D_MLOD.read_index(file)
+            file.seek(0)
+            mlod = p3d.P3D_MLOD.read(file)
+
+        output = write_mlod(mlod)
+        self.assertEqual(len(output), len(data))
+        self.assertEqual(write_mlod(p3d.P3D_MLOD.read(io.BytesIO(output))), output)
+
+        with io.BytesIO(output) as file:
+            index_output = p3d.P3D_MLOD.read_index(file)
+
+        for entry, entry_output in zip(index, index_output):
+            self.assertEqual((entry.offset, entry.length), (entry_output.offset, entry_output.length))
+
+            # The normals are renormalized when written
+            for source, written in zip(self.get_lod_sections(data, entry), self.get_lod_sections(output, entry_output)):
+                if isinstance(source, np.ndarray):
+                    self.assertTrue(np.allclose(source, written, atol=1e-6))
+                else:
+                    self.assertEqual(source, written)
+
+    def test_views(self):
+        """Assign the dictionary views of the read LODs to new LODs -> write"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+
+        for lod in mlod.lods:
+            lod_new = p3d.P3D_LOD()
+            lod_new.resolution = lod.resolution
+            lod_new.flags = lod.flags
+            lod_new.taggs = lod.taggs
+            lod_new.verts = dict(lod.verts)
+            lod_new.normals = dict(lod.normals)
+            lod_new.faces = dict(lod.faces)
+
+            self.assertEqual(lod_new.vert_coords.dtype, np.float32)
+            self.assertEqual(lod_new.face_verts.shape, (len(lod.faces), 4))
+            self.assertEqual(p3d.serialize_lod(lod_new), p3d.serialize_lod(lod))
+
+
+class P3DSlotsTest(unittest.TestCase):
+    """Test cases of the slotted P3D data classes"""
+
+    def test_pickle(self):
+        """Pickle -> unpickle the LODs and the LOD index of the sample model"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+            file.seek(0)
+            index = p3d.P3D_MLOD.read_index(file, True)
+
+        for lod in mlod.lods:
+            self.assertFalse(hasattr(lod.resolution, "__dict__"))
+            for tagg in lod.taggs:
+                self.assertFalse(hasattr(tagg, "__dict__"))
+                self.assertFalse(hasattr(tagg.data, "__dict__"))
+
+            self.assertEqual(p3d.serialize_lod(pickle.loads(pickle.dumps(lod))), p3d.serialize_lod(lod))
+
+        for entry in index:
+            self.assertFalse(hasattr(entry, "__dict__"))
+            entry_copy = pickle.loads(pickle.dumps(entry))
+            for name in p3d.P3D_LOD_Index.__slots__:
+                self.assertEqual(getattr(entry_copy, name), getattr(entry, name))
+
+
+class P3DResolutionTest(unittest.TestCase):
+    """Test cases of the LOD signature encoding"""
+
+    def test_roundtrip(self):
+        """Encode -> store as 32-bit float -> decode every LOD type"""
+
+        resolution = p3d.P3D_LOD_Resolution
+        for lod in resolution.INDEX_MAP_INVERSE:
+            if lod == resolution.UNKNOWN:
+                continue
+            elif lod == resolution.VISUAL:
+                values = (0, 1, 5, 20, 49, 100, 999)
+            elif lod in resolution.RESOLUTION_POS:
+                values = (0, 1, 5, 20, 49)
+            else:
+                values = (0, )
+
+            for res in values:
+                signature = np.float32(resolution.encode(lod, res)).item()
+                self.assertEqual(resolution.decode_signature(signature), (lod, res))
+                self.assertEqual(resolution.from_float(signature), resolution(lod, res))
+
+    def test_sample(self):
+        """Decode the signatures of the sample model, and encode them again"""
+
+        with open(file_sample_p3d, "rb") as file:
+            index = p3d.P3D_MLOD.read_index(file)
+
+        for entry in index:
+            self.assertEqual(np.float32(float(entry.resolution)).item(), entry.resolution.source)
+
+        self.assertEqual([entry.resolution.lod for entry in index][:3], [0, 0, 4])
+
+    def test_unknown(self):
+        """Decode signatures that are not assigned to any LOD type"""
+
+        resolution = p3d.P3D_LOD_Resolution
+        for signature in (5e3, 3.5e5, 7e17, 1.5e20):
+            self.assertEqual(resolution.decode_signature(signature)[0], resolution.UNKNOWN)
+
+    def test_memoization(self):
+        """Decode the same signatures repeatedly"""
+
+        resolution = p3d.P3D_LOD_Resolution
+        decoded = resolution.decode(1e15)
+        self.assertIs(resolution.decode(1e15), decoded)
+        self.assertEqual(decoded, (resolution.MEMORY, 0))
+
+        limit = resolution.DECODED_LIMIT
+        resolution.DECODED_LIMIT = 4
+        try:
+            for i in range(10):
+                self.assertEqual(resolution.decode(float(i)), (resolution.VISUAL, i))
+                self.assertLessEqual(len(resolution.DECODED), 4)
+        finally:
+            resolution.DECODED_LIMIT = limit
+            resolution.DECODED.clear()
+
+
+class P3DFaceTest(unittest.TestCase):
+    """Test cases of the indexed P3D face table"""
+
+    def test_faces_roundtrip(self):
+        """Write -> read -> skip the face section of every LOD of the sample model"""
+
+        with open(file_sample_p3d, "rb") as file:
+            mlod = p3d.P3D_MLOD.read(file)
+
+        for lod in mlod.lods:
+            file = io.BytesIO()
+            lod.write_faces(file)
+            size = file.tell()
+            file.write(b"trailing data")
+
+            file.seek(0)
+            reader = io.BufferedReader(file)
+            lod_read = p3d.P3D_LOD()
+            lod_read.read_faces(reader, len(lod.face_sides))
+            self.assertEqual(reader.tell(), size)
+            self.assertEqual(lod_read.materials, lod.materials)
+            for name in ("face_sides", "face_verts", "face_normals", "face_uvs", "face_flags", "face_materials"):
+                np.testing.assert_array_equal(getattr(lod_read, name), getattr(lod, name), name)
+
+            reader.seek(0)
+            self.assertEqual(p3d.P3D_LOD.skip_faces(reader, len(lod.face_sides)), size)
+
+    def test_faces_view(self):
+        """Assign the dictionary view of the faces to a new LOD"""
+
+        with open(file_sample_p3d, "rb") as file:
+            lod = p3d.P3D_MLOD.read(file).lods[0]
+
+        lod_copy = p3d.P3D_LOD()
+        lod_copy.faces = lod.faces
+
+        self.assertEqual(dict(lod_copy.faces), dict(lod.faces))
+        np.testing.assert_array_equal(lod_copy.face_uvs, lod.face_uvs)
+
+    def test_faces_eof(self):
+        """Read a truncated face section"""
+
+        with open(file_sample_p3d, "rb") as file:
+            lod = p3d.P3D_MLOD.read(file).lods[0]
+        
+        file = io.BytesIO()
+        lod.write_faces(file)
+        file = io.BytesIO(file.getvalue()[:-1])
+        with self.assertRaises(p3d.P3D_Error):
+            p3d.P3D_LOD.skip_faces(file, len(lod.face_sides))
+
+
+class P3DSelectionTest(unittest.TestCase):
+    """Test cases of the array backed P3D selection data"""
+
+    def test_weights_fresh(self):
+        """Assign weights to a selection without set counts"""
+
+        selection = p3d.P3D_TAGG_DataSelection()
+        selection.weight_verts = {3: 1.0, 1: 0.5}
+        selection.weight_faces = {0: 1.0}
+
+        self.assertEqual(selection.count_verts, 4)
+        self.assertEqual(selection.count_faces, 1)
+        self.assertEqual(dict(selection.weight_verts), {1: selection.WEIGHTS[128], 3: 1.0})
+        self.assertEqual(dict(selection.weight_faces), {0: 1.0})
+
+    def test_weights_counts(self):
+        """Assign weights to a selection with set counts"""
+
+        selection = p3d.P3D_TAGG_DataSelection()
+        selection.count_verts = 10
+        selection.count_faces = 5
+        selection.weight_verts = {2: 1.0}
+        selection.weight_faces = {}
+
+        self.assertEqual(selection.count_verts, 10)
+        self.assertEqual(selection.count_faces, 5)
+        self.assertEqual(dict(selection.weight_verts), {2: 1.0})
+        self.assertEqual(dict(selection.weight_faces), {})
+
+
+class LZOTest(unittest.TestCase):
+    """Test cases of the LZO1X compression"""
+
+    def roundtrip(self, data):
+        compressed = compression.lzo1x_compress(data)
+        file = io.BytesIO(compressed + b"trailing data")
+        consumed, output = compression.lzo1x_decompress(file, len(data))
+
+        self.assertEqual(bytes(output), data)
+        self.assertEqual(consumed, len(compressed))
+        self.assertEqual(file.tell(), len(compressed))
+
+        return compressed
+
+    def test_roundtrip_random(self):
+        """Compress -> decompress random data"""
+
+        rng = random.Random(1)
+        for size in (4, 17, 255, 1024, 100000):
+            self.roundtrip(bytes(rng.getrandbits(8) for i in range(size)))
+
+    def test_roundtrip_repetitive(self):
+        """Compress -> decompress repetitive data, and check that it is compressed"""
+
+        rng = random.Random(2)
+        samples = (
+            bytes(50000),
+            b"abc" * 10000,
+            bytes(range(256)) * 100,
+            b"".join(rng.choice((b"bone", b"pelvis", b"spine", b"\x00" * 7)) for i in range(20000))
+        )
+        for data in samples:
+            compressed = self.roundtrip(data)
+            self.assertLess(len(compressed), len(data) // 4)
+
+    def test_roundtrip_small(self):
+        """Compress -> decompress empty and 1-3 byte inputs"""
+
+        for data in (b"", b"a", b"ab", b"abc", b"\x00\x00\x00"):
+            self.roundtrip(data)
+
+    def test_truncated(self):
+        """Decompress a truncated stream"""
+
+        compressed = compression.lzo1x_compress(b"abcd" * 1000)
+        with self.assertRaises(compression.LZO_Error):
+            compression.lzo1x_decompress(io.BytesIO(compressed[:-3]), 4000)
+
+    def test_output_buffer(self):
+        """Decompress into a slice of a larger buffer"""
+
+        data = b"bone" * 500 + bytes(range(256))
+        compressed = compression.lzo1x_compress(data)
+        buffer = bytearray(len(data) + 10)
+        with memoryview(buffer) as view:
+            compression.lzo1x_decompress_buffer(compressed, len(data), view[5:-5])
+
+        self.assertEqual(bytes(buffer[5:-5]), data)
+        self.assertEqual(bytes(buffer[:5] + buffer[-5:]), bytes(10))
+
+    def test_corrupted(self):
+        """Decompress corrupted streams, and compare to the checked decoder"""
+
+        rng = random.Random(4)
+        data = b"".join(rng.choice((b"bone", b"pelvis", b"spine", b"\x00" * 7)) for i in range(500))
+        compressed = compression.lzo1x_compress(data)
+        for i in range(200):
+            corrupted = bytearray(compressed)
+            corrupted[rng.randrange(len(corrupted))] = rng.getrandbits(8)
+            expected = len(data) + rng.choice((0, -5, 7))
+
+            results = []
+            for decoder in (compression.lzo1x_decompress_buffer, compression.lzo1x_decompress_checked):
+                try:
+                    consumed, output = decoder(bytes(corrupted), expected)
+                    results.append((consumed, bytes(output)))
+                except compression.LZO_Error as ex:
+                    results.append(str(ex))
+
+            self.assertEqual(results[0], results[1])
+
+
+class RTMTest(unittest.TestCase):
+    """Test cases of the RTM and BMTR animation formats"""
+
+    def create_rtm(self, count_frames, count_bones, seed = 3):
+        rng = np.random.default_rng(seed)
+        rotations, triangular = np.linalg.qr(rng.normal(size=(count_frames, count_bones, 3, 3)))
+        rotations *= np.sign(np.diagonal(triangular, axis1=-2, axis2=-1))[..., None, :]
+        rotations[np.linalg.det(rotations) < 0, :, 0] *= -1
+
+        matrices = np.zeros((count_frames, count_bones, 4, 4))
+        matrices[..., :3, :3] = rotations
+        matrices[..., :3, 3] = rng.uniform(-1, 1, size=(count_frames, count_bones, 3))
+        matrices[..., 3, 3] = 1
+
+        rtm_data = rtm.RTM_File()
+        rtm_data.props = rtm.RTM_MDAT()
+        rtm_data.props.items = [(0.5, "sound", "step")]
+        rtm_data.anim.motion = (0, 0, 1.5)
+        rtm_data.anim.bones = ["Bone%d" % i for i in range(count_bones)]
+        rtm_data.anim.phases = np.linspace(0, 1, count_frames, dtype=np.float32)
+        rtm_data.anim.matrices = matrices.astype(np.float32)
+
+        bone_parents = {"bone0": ""}
+        for i in range(1, count_bones):
+            bone_parents["bone%d" % i] = "bone%d" % rng.integers(i)
+
+        return rtm_data, bone_parents
+
+    def test_rtm_roundtrip(self):
+        """Write -> read plain RTM"""
+
+        rtm_data, bone_parents = self.create_rtm(20, 10)
+        file = io.BytesIO()
+        rtm_data.write(file)
+        file.seek(0)
+        rtm_read = rtm.RTM_File.read(io.BufferedReader(file))
+
+        self.assertEqual(rtm_read.anim.bones, rtm_data.anim.bones)
+        self.assertEqual(rtm_read.props.items, rtm_data.props.items)
+        np.testing.assert_array_equal(rtm_read.anim.phases, rtm_data.anim.phases)
+        np.testing.assert_array_equal(rtm_read.anim.matrices, rtm_data.anim.matrices)
+
+    def test_rtm_frames(self):
+        """Get the frame objects of plain RTM -> assign them back, and store as arrays -> load"""
+
+        rtm_data, bone_parents = self.create_rtm(6, 4)
+        frames = rtm_data.anim.frames
+        self.assertEqual([frame.phase for frame in frames], rtm_data.anim.phases.tolist())
+        self.assertEqual([transform.bone for transform in frames[-1].transforms], rtm_data.anim.bones)
+
+        rtm_assigned = rtm.RTM_File()
+        rtm_assigned.anim.bones = rtm_data.anim.bones
+        rtm_assigned.anim.frames = frames
+        np.testing.assert_array_equal(rtm_assigned.anim.matrices, rtm_data.anim.matrices)
+        np.testing.assert_array_equal(rtm_assigned.anim.phases, rtm_data.anim.phases)
+
+        rtm_loaded = rtm.RTM_File.from_arrays(rtm_data.get_arrays())
+        self.assertEqual(rtm_loaded.anim.bones, rtm_data.anim.bones)
+        self.assertEqual(rtm_loaded.props.items, rtm_data.props.items)
+        np.testing.assert_array_equal(rtm_loaded.anim.matrices, rtm_data.anim.matrices)
+
+    def test_bmtr_frames(self):
+        """Convert BMTR to plain RTM frame by frame and in bulk, and compare the matrices"""
+
+        rtm_data, bone_parents = self.create_rtm(8, 6)
+        bmtr = rtm.BMTR_File.from_rtm(rtm_data, bone_parents)
+        rtm_bulk = bmtr.as_rtm(bone_parents)
+
+        for i, frame in enumerate(bmtr.frames):
+            frame_rtm = frame.as_rtm(float(bmtr.phases[i]), rtm_bulk.anim.bones, bone_parents)
+            matrices = [transform.matrix for transform in frame_rtm.transforms]
+            np.testing.assert_allclose(matrices, rtm_bulk.anim.matrices[i], atol=1e-5)
+
+        identity = rtm.bmtr_to_matrices(np.array([0, 0, 0, 1]), np.zeros(3))
+        np.testing.assert_array_equal(identity, np.identity(4))
+
+        rotations = rtm_bulk.anim.matrices[..., :3, :3]
+        np.testing.assert_allclose(rotations @ np.swapaxes(rotations, -1, -2), np.broadcast_to(np.identity(3), rotations.shape), atol=1e-3)
+
+    def test_bmtr_roundtrip(self):
+        """Convert plain RTM to BMTR -> write -> read -> convert back, and compare the matrices"""
+
+        # The frame and phase blocks are over the compression threshold in the first case only.
+        for count_frames, count_bones in ((300, 80), (5, 3)):
+            rtm_data, bone_parents = self.create_rtm(count_frames, count_bones)
+            for version in (4, 5):
+                bmtr = rtm.BMTR_File.from_rtm(rtm_data, bone_parents, version)
+                file = io.BytesIO()
+                bmtr.write(file)
+                file.seek(0)
+                bmtr_read = rtm.BMTR_File.read(file)
+
+                self.assertEqual(bmtr_read.version, version)
+                self.assertEqual(bmtr_read.bones, rtm_data.anim.bones)
+                self.assertEqual(bmtr_read.transforms.tobytes(), bmtr.transforms.tobytes())
+                if version > 4:
+                    self.assertEqual([prop.as_rtm() for prop in bmtr_read.props], rtm_data.props.items)
+
+                rtm_read = bmtr_read.as_rtm(bone_parents)
+                np.testing.assert_array_equal(rtm_read.anim.phases, rtm_data.anim.phases)
+                np.testing.assert_allclose(rtm_read.anim.matrices, rtm_data.anim.matrices, atol=0.01)
+
+    def test_bmtr_unknown_bone(self):
+        """Convert plain RTM with a frame referencing a bone that is not in the bone list"""
+
+        rtm_data, bone_parents = self.create_rtm(2, 3)
+        rtm_data.anim.frame_bones = rtm_data.anim.encode_bones([["Bone0", "Bone1", "Bone2"], ["Bone0", "Bone1", "Other"]], (2, 3))
+        with self.assertRaises(rtm.BMTR_Error):
+            rtm.BMTR_File.from_rtm(rtm_data, bone_parents)
+
+
+if __name__ == "__main__":
+    unittest.main()